@@ -1,736 +1,1588 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
-from flask_socketio import SocketIO, emit
-import flask_socketio
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-import eventlet
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'secret!'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-socketio = SocketIO(app, async_mode='eventlet')
-
-# DB Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    room = db.Column(db.String(50))
-    is_ready = db.Column(db.Boolean, default=False)
-
-class GameState(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(50), unique=True)
-    value = db.Column(db.Float)
-
-class RoomStatus(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    room_name = db.Column(db.String(50), unique=True)
-    is_completed = db.Column(db.Boolean, default=False)
-    is_locked = db.Column(db.Boolean, default=True)
-    assigned_player = db.Column(db.String(80))
-
-class GameInfo(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(50), unique=True)
-    value = db.Column(db.String(200))
-
-# NOUVEAU: Modèle pour les messages de chat
-class ChatMessage(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), nullable=False)
-    message = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'message': self.message,
-            'timestamp': self.timestamp.isoformat()
-        }
-
-# Create tables
-with app.app_context():
-    db.create_all()
-    
-    # États initiaux du jeu
-    initial_states = {
-        'energy_level': 50.0,
-        'water_pollution': 30.0,
-        'air_co2': 40.0,
-        'air_o2': 60.0,
-        'flora_health': 60.0
-    }
-    for key, value in initial_states.items():
-        if not GameState.query.filter_by(key=key).first():
-            db.session.add(GameState(key=key, value=value))
-    
-    # Initialiser les statuts des salles
-    rooms = ['Energie','Eau', 'Air', 'Flore']
-    for i, room in enumerate(rooms):
-        if not RoomStatus.query.filter_by(room_name=room).first():
-            db.session.add(RoomStatus(
-                room_name=room,
-                is_completed=False,
-                is_locked=(i != 0)
-            ))
-    
-    # Initialiser les infos du jeu
-    if not GameInfo.query.filter_by(key='game_started').first():
-        db.session.add(GameInfo(key='game_started', value='false'))
-    if not GameInfo.query.filter_by(key='game_end_time').first():
-        db.session.add(GameInfo(key='game_end_time', value=''))
-    
-    db.session.commit()
-
-# Global timer
-timer_greenlet = None
-
-def start_timer():
-    """Timer global qui met à jour la BDD"""
-    with app.app_context():
-        game_end_time = datetime.now() + timedelta(minutes=10)
-        game_info = GameInfo.query.filter_by(key='game_end_time').first()
-        game_info.value = game_end_time.isoformat()
-        db.session.commit()
-        
-        while datetime.now() < game_end_time:
-            eventlet.sleep(1)
-        
-        check_victory()
-
-def check_victory():
-    """Vérifie les conditions de victoire et met à jour la BDD"""
-    with app.app_context():
-        states = {gs.key: gs.value for gs in GameState.query.all()}
-        all_completed = all(rs.is_completed for rs in RoomStatus.query.all())
-        
-        if all_completed and all(v >= 50 for v in states.values()):
-            game_info = GameInfo.query.filter_by(key='game_result').first()
-            if not game_info:
-                game_info = GameInfo(key='game_result', value='victory')
-                db.session.add(game_info)
-            else:
-                game_info.value = 'victory'
-            db.session.commit()
-        else:
-            game_info = GameInfo.query.filter_by(key='game_result').first()
-            if not game_info:
-                game_info = GameInfo(key='game_result', value='defeat')
-                db.session.add(game_info)
-            else:
-                game_info.value = 'defeat'
-            db.session.commit()
-
-def unlock_next_room(completed_room):
-    """Débloque la salle suivante après qu'une salle soit complétée"""
-    room_order = ['Energie', 'Eau', 'Air', 'Flore']
-    try:
-        current_index = room_order.index(completed_room)
-        if current_index < len(room_order) - 1:
-            next_room_name = room_order[current_index + 1]
-            next_room = RoomStatus.query.filter_by(room_name=next_room_name).first()
-            if next_room:
-                next_room.is_locked = False
-                db.session.commit()
-    except ValueError:
-        pass
-
-# ==================== ROUTES HTTP ====================
-
-@app.route('/')
-def index():
-    if 'username' not in session:
-        return redirect(url_for('login'))
-    return redirect(url_for('lobby'))
-
-@app.route('/lobby')
-def lobby():
-    if 'username' not in session:
-        return redirect(url_for('login'))
-    
-    with app.app_context():
-        users = User.query.all()
-        rooms = RoomStatus.query.all()
-        return render_template('lobby.html', 
-                             username=session['username'],
-                             users=users,
-                             rooms=rooms)
-
-@app.route('/game')
-def game():
-    if 'username' not in session:
-        return redirect(url_for('login'))
-    
-    with app.app_context():
-        user = User.query.filter_by(username=session['username']).first()
-        if not user or not user.room:
-            return redirect(url_for('lobby'))
-        
-        room = user.room
-        session['room'] = room
-        
-        room_status = RoomStatus.query.filter_by(room_name=room).first()
-        game_started_info = GameInfo.query.filter_by(key='game_started').first()
-        game_started = game_started_info and game_started_info.value == 'true'
-        
-        if game_started and room_status.is_locked:
-            return redirect(url_for('lobby'))
-        
-        if room == 'Energie':
-            return render_template('energy.html', username=session['username'])
-        elif room == 'Eau':
-            return render_template('water.html', username=session['username'])
-        elif room == 'Air':
-            return render_template('air.html', username=session['username'])
-        elif room == 'Flore':
-            return render_template('flora.html', username=session['username'])
-        else:
-            return redirect(url_for('lobby'))
-
-# ==================== API POLLING ====================
-
-@app.route('/api/poll_status')
-def poll_status():
-    """API REST pour que le client consulte la BDD toutes les 1s"""
-    if 'username' not in session:
-        return jsonify({'error': 'Not logged in'}), 401
-    
-    with app.app_context():
-        users = User.query.all()
-        rooms = RoomStatus.query.all()
-        states = GameState.query.all()
-        game_started_info = GameInfo.query.filter_by(key='game_started').first()
-        game_end_time_info = GameInfo.query.filter_by(key='game_end_time').first()
-        game_result_info = GameInfo.query.filter_by(key='game_result').first()
-        
-        current_user = User.query.filter_by(username=session['username']).first()
-        
-        can_access_game = False
-        if current_user and current_user.room and current_user.is_ready:
-            room_status = RoomStatus.query.filter_by(room_name=current_user.room).first()
-            if room_status and not room_status.is_locked:
-                can_access_game = True
-        
-        remaining_time = 0
-        if game_end_time_info and game_end_time_info.value:
-            try:
-                end_time = datetime.fromisoformat(game_end_time_info.value)
-                remaining_time = max(0, int((end_time - datetime.now()).total_seconds()))
-            except:
-                pass
-        
-        return jsonify({
-            'players': [
-                {
-                    'username': u.username,
-                    'room': u.room,
-                    'is_ready': u.is_ready
-                } for u in users
-            ],
-            'rooms': [
-                {
-                    'name': r.room_name,
-                    'is_locked': r.is_locked,
-                    'is_completed': r.is_completed,
-                    'assigned_player': r.assigned_player
-                } for r in rooms
-            ],
-            'game_states': {
-                gs.key: gs.value for gs in states
-            },
-            'game_started': game_started_info.value if game_started_info else 'false',
-            'remaining_time': remaining_time,
-            'can_access_game': can_access_game,
-            'game_result': game_result_info.value if game_result_info else None
-        })
-
-# NOUVEAU: API pour récupérer les messages
-@app.route('/api/chat/messages')
-def get_chat_messages():
-    """Récupère les messages depuis un certain ID"""
-    if 'username' not in session:
-        return jsonify({'error': 'Not logged in'}), 401
-    
-    # Paramètre optionnel: dernier ID connu par le client
-    last_id = request.args.get('last_id', 0, type=int)
-    
-    with app.app_context():
-        # Récupérer uniquement les nouveaux messages
-        messages = ChatMessage.query.filter(ChatMessage.id > last_id).order_by(ChatMessage.timestamp.asc()).all()
-        
-        return jsonify({
-            'messages': [msg.to_dict() for msg in messages]
-        })
-
-# NOUVEAU: API pour envoyer un message
-@app.route('/api/chat/send', methods=['POST'])
-def send_chat_message():
-    """Enregistre un nouveau message dans la BDD"""
-    if 'username' not in session:
-        return jsonify({'error': 'Not logged in'}), 401
-    
-    data = request.get_json()
-    message_text = data.get('message', '').strip()
-    
-    if not message_text:
-        return jsonify({'error': 'Message vide'}), 400
-    
-    if len(message_text) > 500:
-        return jsonify({'error': 'Message trop long'}), 400
-    
-    with app.app_context():
-        new_message = ChatMessage(
-            username=session['username'],
-            message=message_text
-        )
-        db.session.add(new_message)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': new_message.to_dict()
-        })
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form['username']
-        with app.app_context():
-            user = User.query.filter_by(username=username).first()
-            if user:
-                return render_template('login.html', 
-                                     error=True,
-                                     error_message='''<p>Ce nom d'utilisateur est déjà pris!</p>''',
-                                     username=username)
-            
-            player_count = User.query.count()
-            if player_count >= 4:
-                return render_template('login.html',
-                                     error=True,
-                                     error_message='''<p>Partie complète! Maximum 4 joueurs.</p>
-                                                    <a href="/">Retour</a>''')
-            
-            new_user = User(username=username)
-            db.session.add(new_user)
-            db.session.commit()
-            session['username'] = username
-            return redirect(url_for('lobby'))
-    
-    return render_template('login.html', error=False)
-
-@app.route('/logout')
-def logout():
-    username = session.get('username')
-    if username:
-        with app.app_context():
-            user = User.query.filter_by(username=username).first()
-            if user and user.room:
-                room_status = RoomStatus.query.filter_by(room_name=user.room).first()
-                if room_status and room_status.assigned_player == username:
-                    room_status.assigned_player = None
-                    db.session.commit()
-    
-    session.pop('username', None)
-    session.pop('room', None)
-    return redirect(url_for('login'))
-
-# NOUVEAU: Route pour réinitialiser complètement le jeu
-@app.route('/reset_game', methods=['POST'])
-def reset_game():
-    """Réinitialise complètement le jeu et redirige tous les joueurs vers le lobby"""
-    if 'username' not in session:
-        return jsonify({'error': 'Not logged in'}), 401
-    
-    with app.app_context():
-        # 1. Supprimer tous les messages de chat
-        ChatMessage.query.delete()
-        
-        # 2. Réinitialiser tous les utilisateurs (déconnexion et remise à zéro)
-        User.query.delete()
-        
-        # 3. Réinitialiser les états du jeu
-        GameState.query.delete()
-        initial_states = {
-            'energy_level': 50.0,
-            'water_pollution': 30.0,
-            'air_co2': 40.0,
-            'air_o2': 60.0,
-            'flora_health': 60.0
-        }
-        for key, value in initial_states.items():
-            db.session.add(GameState(key=key, value=value))
-        
-        # 4. Réinitialiser les statuts des salles
-        RoomStatus.query.delete()
-        rooms = ['Energie', 'Eau', 'Air', 'Flore']
-        for i, room in enumerate(rooms):
-            db.session.add(RoomStatus(
-                room_name=room,
-                is_completed=False,
-                is_locked=(i != 0)
-            ))
-        
-        # 5. Réinitialiser les infos du jeu
-        GameInfo.query.delete()
-        db.session.add(GameInfo(key='game_started', value='false'))
-        db.session.add(GameInfo(key='game_end_time', value=''))
-        
-        db.session.commit()
-        
-        # 6. Émettre un événement pour forcer tous les clients à se reconnecter
-        # Note: On utilise 'room' au lieu de 'broadcast' pour Flask-SocketIO
-        socketio.emit('game_reset', {
-            'message': 'Le jeu a été réinitialisé. Redirection vers la page de connexion...'
-        }, namespace='/')
-        
-        # 7. Supprimer la session de l'utilisateur actuel
-        session.clear()
-        
-        return jsonify({'success': True, 'redirect': '/login'})
-    
-
-# AJOUT 1: Nouvelle route pour la page du code final
-@app.route('/final_code')
-def final_code():
-    if 'username' not in session:
-        return redirect(url_for('login'))
-    
-    with app.app_context():
-        return render_template('final_code.html', username=session['username'])
-
-# AJOUT 2: Nouvelle route pour la page de victoire
-@app.route('/victory')
-def victory():
-    if 'username' not in session:
-        return redirect(url_for('login'))
-    
-    with app.app_context():
-        return render_template('victory.html', username=session['username'])
-
-# AJOUT 3: API pour valider le code final
-# MODIFICATION: API pour valider le code final avec broadcast
-@app.route('/api/validate_final_code', methods=['POST'])
-def validate_final_code():
-    """Valide le code secret final et notifie tous les joueurs"""
-    if 'username' not in session:
-        return jsonify({'error': 'Not logged in'}), 401
-    
-    data = request.get_json()
-    code = data.get('code', '').strip().upper()
-    
-    CORRECT_CODE = 'EPSI WORKSHOPS 2025'  # Le code secret
-    
-    with app.app_context():
-        if code == CORRECT_CODE:
-            # Marquer la partie comme gagnée
-            game_result_info = GameInfo.query.filter_by(key='game_result').first()
-            if not game_result_info:
-                game_result_info = GameInfo(key='game_result', value='victory')
-                db.session.add(game_result_info)
-            else:
-                game_result_info.value = 'victory'
-            
-            # Enregistrer qui a validé le code
-            code_validator_info = GameInfo.query.filter_by(key='code_validator').first()
-            if not code_validator_info:
-                code_validator_info = GameInfo(key='code_validator', value=session['username'])
-                db.session.add(code_validator_info)
-            else:
-                code_validator_info.value = session['username']
-            
-            db.session.commit()
-            
-            # Ajouter un message dans le chat
-            victory_message = ChatMessage(
-                username='Système',
-                message=f'🎉🏆 {session["username"]} a validé le code secret ! VICTOIRE TOTALE ! 🏆🎉'
-            )
-            db.session.add(victory_message)
-            db.session.commit()
-            
-            # IMPORTANT: Émettre l'événement de victoire à tous les joueurs via SocketIO
-            socketio.emit('victory_achieved', {
-                'validator': session['username'],
-                'message': f'{session["username"]} a trouvé le code secret !'
-            }, namespace='/')
-            
-            return jsonify({'success': True, 'message': 'Code correct!', 'redirect': '/victory'})
-        else:
-            return jsonify({'success': False, 'message': 'Code incorrect'})
-        
-# ==================== SOCKETIO EVENTS (Actions uniquement) ====================
-
-@socketio.on('select_room')
-def handle_select_room(data):
-    with app.app_context():
-        room_name = data['room']
-        username = session.get('username')
-        user = User.query.filter_by(username=username).first()
-        room_status = RoomStatus.query.filter_by(room_name=room_name).first()
-        
-        if not user or not room_status:
-            emit('error', {'message': 'Utilisateur ou salle invalide'})
-            return
-        
-        if room_status.assigned_player and room_status.assigned_player != username:
-            emit('error', {'message': 'Salle déjà occupée par ' + room_status.assigned_player})
-            return
-        
-        if user.room and user.room != room_name:
-            old_room_status = RoomStatus.query.filter_by(room_name=user.room).first()
-            if old_room_status and old_room_status.assigned_player == username:
-                old_room_status.assigned_player = None
-        
-        user.room = room_name
-        user.is_ready = False
-        room_status.assigned_player = username
-        db.session.commit()
-        
-        emit('room_selected', {'room': room_name})
-
-@socketio.on('player_ready')
-def handle_player_ready():
-    global timer_greenlet
-    
-    with app.app_context():
-        username = session.get('username')
-        user = User.query.filter_by(username=username).first()
-        
-        if not user:
-            emit('error', {'message': 'Utilisateur non trouvé'})
-            return
-        
-        if not user.room:
-            emit('error', {'message': 'Vous devez d\'abord sélectionner une salle'})
-            return
-        
-        room_status = RoomStatus.query.filter_by(room_name=user.room).first()
-        if not room_status:
-            emit('error', {'message': 'Salle invalide'})
-            return
-        
-        user.is_ready = True
-        db.session.commit()
-        
-        game_started_info = GameInfo.query.filter_by(key='game_started').first()
-        game_started = game_started_info and game_started_info.value == 'true'
-        
-        if not game_started:
-            all_users = User.query.all()
-            ready_users = [u for u in all_users if u.is_ready and u.room]
-            if len(ready_users) >= 2:
-                game_started_info.value = 'true'
-                db.session.commit()
-                
-                if timer_greenlet is None:
-                    timer_greenlet = eventlet.spawn(start_timer)
-
-@socketio.on('action')
-def handle_action(data):
-    with app.app_context():
-        room = session.get('room')
-        username = session.get('username')
-        
-        if not room:
-            emit('error', {'message': 'Vous devez d\'abord sélectionner une salle'})
-            return
-        
-        room_status = RoomStatus.query.filter_by(room_name=room).first()
-        if not room_status:
-            emit('error', {'message': 'Salle invalide'})
-            return
-        
-        game_started_info = GameInfo.query.filter_by(key='game_started').first()
-        game_started = game_started_info and game_started_info.value == 'true'
-        
-        if game_started and room_status.is_locked:
-            emit('error', {'message': 'Salle verrouillée.'})
-            return
-        
-        user = User.query.filter_by(username=username).first()
-        if not user or user.room != room:
-            emit('error', {'message': 'Vous n\'êtes pas dans cette salle'})
-            return
-        
-        if room_status.assigned_player != username:
-            emit('error', {'message': 'Cette salle est occupée par un autre joueur'})
-            return
-        
-        # Traitement des actions par salle
-        if room == 'Energie':
-            if data['action'] == 'connect_cables':
-                correct = data.get('correct', False)
-                gs = GameState.query.filter_by(key='energy_level').first()
-                if correct:
-                    gs.value = min(100, gs.value + 10)
-                    emit('feedback', {'message': 'Réseau stable!'})
-                    air_gs = GameState.query.filter_by(key='air_co2').first()
-                    air_gs.value = max(0, air_gs.value - 5)
-                    
-                    if gs.value >= 60:
-                        room_status.is_completed = True
-                        # Ajout du message spécifique pour la salle Énergie
-                        message_text = f"🎉 Bravo !⚡ L'énigme de la salle Énergie a été résolue🔋 Le réseau électrique est stabilisé ⚙️"
-                        new_message = ChatMessage(
-                            username='Système',
-                            message=message_text
-                        )
-                        db.session.add(new_message)
-
-
-                        message_indice = ChatMessage(
-                            username='Système',
-                            message=" 💡 Indice 1 : — À l’EPSI, ce n’est pas qu’une salle de classe 🏫 — c’est un espace où l’on apprend 📚, crée 💻, expérimente 🔬 et collabore 🤝."
-                        )
-                        db.session.add(message_indice)
-
-                        db.session.commit()
-                        
-                
-                        emit('puzzle_completed', {'room': room})
-                        unlock_next_room(room)
-                else:
-                    gs.value = max(0, gs.value - 5)
-                    emit('feedback', {'message': 'Connexion incorrecte.'})
-        
-        elif room == 'Eau':
-            gs = GameState.query.filter_by(key='water_pollution').first()
-            
-            if data['action'] == 'sort_waste':
-                correct = data.get('correct', False)
-                if correct:
-                    gs.value = max(0, gs.value - 5)
-                    emit('feedback', {'message': 'Bon tri ! Pureté augmentée.'})
-                else:
-                    gs.value = min(100, gs.value + 3)
-                    emit('feedback', {'message': 'Mauvais tri. Pollution accrue.'})
-            
-            elif data['action'] == 'adjust_ph':
-                ph = data.get('value')
-                if ph is not None:
-                    emit('feedback', {'message': f'pH ajusté à {ph:.1f}'})
-            
-            elif data['action'] == 'adjust_o2':
-                o2 = data.get('value')
-                if o2 is not None:
-                    emit('feedback', {'message': f'O₂ ajusté à {o2:.1f} mg/L'})
-            
-            elif data['action'] == 'validate_chemical':
-                ph = data.get('ph')
-                o2 = data.get('o2')
-                if ph is None or o2 is None:
-                    emit('error', {'message': 'Valeurs manquantes'})
-                    return
-                ph_correct = abs(ph - 7.0) < 0.5
-                o2_correct = abs(o2 - 8.0) < 0.5
-                correct = ph_correct and o2_correct
-                if correct:
-                    gs.value = max(0, gs.value - 20)
-                    emit('feedback', {'message': 'Équilibre chimique atteint !'})
-                    flora_gs = GameState.query.filter_by(key='flora_health').first()
-                    flora_gs.value = min(100, flora_gs.value + 10)
-                    air_gs = GameState.query.filter_by(key='air_o2').first()
-                    air_gs.value = min(100, air_gs.value + 5)
-                else:
-                    gs.value = min(100, gs.value + 5)
-                    message = 'Déséquilibre: '
-                    if not ph_correct:
-                        message += 'pH incorrect '
-                    if not o2_correct:
-                        message += 'O₂ incorrect'
-                    emit('feedback', {'message': message})
-            
-            elif data['action'] == 'complete_water':
-                if gs.value <= 10:
-                    room_status.is_completed = True
-                    
-                    message_text = f"🌊🎉 Bravo ! L'énigme de la salle Eau a été résolue ! 💧 L’eau est maintenant purifiée. 💦✨"
-                    new_message = ChatMessage(
-                        username='Système',
-                        message=message_text
-                    )
-                    db.session.add(new_message)
-
-                    message_indice = ChatMessage(
-                            username='Système',
-                            message=" 💡 Indice 2 : 🎯 Chaque année, ces défis d’innovation 💡 rassemblent les étudiants 👩‍💻👨‍💻 autour de projets concrets 🔧, dans un esprit d’équipe 🤝 et de passion pour le code 🧠💻"
-                        )
-                    db.session.add(message_indice)
-
-                    db.session.commit()
-                    emit('puzzle_completed', {'room': room})
-                    unlock_next_room(room)
-                else:
-                    emit('error', {'message': 'Pollution encore trop élevée'})
-        
-        elif room == 'Air':
-            if data['action'] == 'identify_pollution_source':
-                source = data.get('source')
-                correct = data.get('correct', False)
-                attempts = data.get('attempts', 1)
-                
-                co2_gs = GameState.query.filter_by(key='air_co2').first()
-                o2_gs = GameState.query.filter_by(key='air_o2').first()
-                
-                if correct:
-                    co2_gs.value = max(0, co2_gs.value - 30)
-                    o2_gs.value = min(100, o2_gs.value + 20)
-                    emit('feedback', {'message': '✅ Source identifiée ! Filtres activés.'})
-                    
-                    flora_gs = GameState.query.filter_by(key='flora_health').first()
-                    flora_gs.value = min(100, flora_gs.value + 15)
-                    
-                    if co2_gs.value <= 30 and o2_gs.value >= 70:
-                        room_status.is_completed = True
-                        message_text = f"🎯🎉 Bravo ! 🌬️ L'énigme de la salle Air a été résolue ! 🍃 La qualité de l'air est maintenant rétablie 🌿✨"
-                        new_message = ChatMessage(
-                            username='Système',
-                            message=message_text
-                        )
-                        db.session.add(new_message)
-
-                        message_indice = ChatMessage(
-                            username='Système',
-                            message=" 💡 Indice 3 : ✨ Et cette fois, tout se joue dans une année symbolique 🗓️ : celle où la créativité 🎨 et la technologie 🤖 se rencontrent — 2025 🚀"
-                        )
-                        db.session.add(message_indice)
-
-                        # AJOUT: Message de redirection
-                        redirect_message = ChatMessage(
-                            username='Système',
-                            message="🔐 Tous les joueurs sont redirigés vers la validation du CODE FINAL ! Utilisez vos 3 indices pour le trouver ! 🔑"
-                        )
-                        db.session.add(redirect_message)
-
-                        db.session.commit()
-                        emit('puzzle_completed', {'room': room}, broadcast=True)
-                        
-                        # AJOUT: Rediriger tous les joueurs
-                        emit('redirect_to_final', {}, broadcast=True)
-        
-        elif room == 'Flore':
-            if data['action'] == 'select_plant':
-                plant = data.get('plant')
-                gs = GameState.query.filter_by(key='flora_health').first()
-                if plant in ['oxygen_plant', 'purifying_plant']:
-                    gs.value = min(100, gs.value + 10)
-                    emit('feedback', {'message': f'Plante {plant} choisie!'})
-                    air_gs = GameState.query.filter_by(key='air_o2').first()
-                    air_gs.value = min(100, air_gs.value + 5)
-                    
-                    if gs.value >= 80:
-                        room_status.is_completed = True
-                        db.session.commit()
-                        emit('puzzle_completed', {'room': room})
-                        
-                        all_completed = all(rs.is_completed for rs in RoomStatus.query.all())
-                        if all_completed:
-                            check_victory()
-        
-        db.session.commit()
-
-if __name__ == '__main__':
-    socketio.run(app, debug=True)
\ No newline at end of file
+import os
+# Résolveur DNS vert d'eventlet (dnspython, ~170 ms à l'import) inutile ici: seule l'adresse
+# du broker est résolue, une fois par connexion. EVENTLET_NO_GREENDNS=no pour le rétablir.
+os.environ.setdefault('EVENTLET_NO_GREENDNS', 'yes')
+from flask import Flask, render_template, request, session, redirect, url_for, jsonify, stream_with_context
+from flask_socketio import emit, join_room
+import flask_socketio
+from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import atexit
+import gc
+import hmac
+import json
+import math
+import eventlet
+import greenlet
+
+from state_store import StateStore, LiveGame, RoomState, GAUGE_THRESHOLD
+from chat_buffer import ChatHub, ChatWriter
+from scheduler import DeadlineScheduler
+from broker import BusManager, create_bus
+from puzzle_rules import RULES as PUZZLE_RULES, compile_rules
+import persistence
+from assets import AssetPipeline
+from render_cache import SkeletonCache
+from presence import PresenceTracker
+from identity import Identity, IdentityCache
+from archive import Archiver
+from dashboard import DashboardAggregator
+from ratelimit import RateLimiter, load_limits
+from event_log import EventLog, apply_event
+import metrics
+from metrics import InstrumentedSocketIO
+
+app = Flask(__name__)
+app.config['SECRET_KEY'] = 'secret!'
+# sqlite:///database.db = instance/database.db; surchargeable (ex. BDD jetable de bench.py,
+# ou postgresql://... : cf. persistence.py pour la copie des données existantes)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', persistence.DEFAULT_DATABASE_URL)
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = persistence.engine_options(
+    app.config['SQLALCHEMY_DATABASE_URI'], app.config['DATABASE_POOL_SIZE'], app.config['SQLITE_BUSY_TIMEOUT_MS'])
+app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Intervalle (secondes) d'écriture différée de l'état en mémoire vers la BDD
+app.config['STATE_FLUSH_INTERVAL'] = float(os.environ.get('STATE_FLUSH_INTERVAL', 1.0))
+# Déchargement (secondes sans accès) des parties inactives, et des parties terminées
+app.config['STATE_IDLE_TIMEOUT'] = float(os.environ.get('STATE_IDLE_TIMEOUT', 600))
+app.config['STATE_FINISHED_TIMEOUT'] = float(os.environ.get('STATE_FINISHED_TIMEOUT', 60))
+# Nombre de messages gardés en mémoire par partie, et attente max d'un long-poll du chat
+app.config['CHAT_BUFFER_SIZE'] = int(os.environ.get('CHAT_BUFFER_SIZE', 200))
+app.config['CHAT_LONG_POLL_TIMEOUT'] = float(os.environ.get('CHAT_LONG_POLL_TIMEOUT', 25))
+# Fenêtre (secondes) de regroupement des insertions de messages en une transaction
+app.config['CHAT_COMMIT_WINDOW'] = float(os.environ.get('CHAT_COMMIT_WINDOW', 0.005))
+# Multi-workers: file de messages partagée (redis://... ou broker://hôte:port, cf. broker.py)
+# et partitionnement des parties entre WORKER_COUNT workers
+app.config['MESSAGE_QUEUE'] = os.environ.get('MESSAGE_QUEUE')
+app.config['WORKER_COUNT'] = int(os.environ.get('WORKER_COUNT', 1))
+app.config['WORKER_INDEX'] = int(os.environ.get('WORKER_INDEX', 0))
+if app.config['WORKER_COUNT'] > 1 and not app.config['MESSAGE_QUEUE']:
+    # Sans file de messages, les workers ne peuvent ni se notifier ni relayer les émissions
+    raise RuntimeError('WORKER_COUNT > 1 exige MESSAGE_QUEUE (broker://hôte:port ou redis://...)')
+# Journal d'événements (un segment par worker), fenêtre de fsync groupé et période des snapshots
+app.config['EVENT_LOG_DIR'] = os.environ.get('EVENT_LOG_DIR', os.path.join(app.instance_path, 'events'))
+app.config['EVENT_LOG_FSYNC_INTERVAL'] = float(os.environ.get('EVENT_LOG_FSYNC_INTERVAL', 0.05))
+app.config['EVENT_LOG_SNAPSHOT_INTERVAL'] = float(os.environ.get('EVENT_LOG_SNAPSHOT_INTERVAL', 300))
+# Présence: un joueur sans signe de vie (socket, heartbeat) depuis ce délai est supprimé
+app.config['PRESENCE_GRACE_PERIOD'] = float(os.environ.get('PRESENCE_GRACE_PERIOD', 60))
+app.config['PRESENCE_SWEEP_INTERVAL'] = float(os.environ.get('PRESENCE_SWEEP_INTERVAL', 5))
+# Cache des joueurs (lignes User) par id: nombre d'entrées et durée de vie de chacune
+app.config['IDENTITY_CACHE_SIZE'] = int(os.environ.get('IDENTITY_CACHE_SIZE', 4096))
+app.config['IDENTITY_CACHE_TTL'] = float(os.environ.get('IDENTITY_CACHE_TTL', 300))
+# Limites de débit par joueur / partie (cf. ratelimit.py pour le format de RATE_LIMITS)
+app.config['RATE_LIMITS'] = load_limits(os.environ.get('RATE_LIMITS'))
+# Archives des parties remplacées par un reset, et rythme de leur purge (lots, pause entre lots)
+app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+app.config['ARCHIVE_PAUSE'] = float(os.environ.get('ARCHIVE_PAUSE', 0.05))
+app.config['ARCHIVE_DELAY'] = float(os.environ.get('ARCHIVE_DELAY', 5))
+# Jeton exigé par /api/export/... et /metrics (désactivés s'il n'est pas défini)
+app.config['EXPORT_TOKEN'] = os.environ.get('EXPORT_TOKEN')
+# Période (secondes) de recalcul du nombre de greenlets (parcours complet du ramasse-miettes)
+app.config['GREENLET_SAMPLE_INTERVAL'] = float(os.environ.get('GREENLET_SAMPLE_INTERVAL', 60))
+# Tableau de bord des animateurs (/operator): jeton d'accès (désactivé sans) et période d'envoi
+app.config['OPERATOR_TOKEN'] = os.environ.get('OPERATOR_TOKEN')
+app.config['DASHBOARD_INTERVAL'] = float(os.environ.get('DASHBOARD_INTERVAL', 0.5))
+db = SQLAlchemy(app)
+# Fichiers statiques empreintés et précompressés (python assets.py), servis sur /assets/
+asset_pipeline = AssetPipeline(app)
+# Pages des salles pré-rendues (seul le nom du joueur varie)
+page_cache = SkeletonCache(app)
+# Journal d'événements: relu avant toute écriture (recover_event_log), réappliqué au démarrage
+event_log = EventLog(app.config['EVENT_LOG_DIR'], f"w{app.config['WORKER_INDEX']}",
+                     fsync_interval=app.config['EVENT_LOG_FSYNC_INTERVAL'],
+                     snapshot_interval=app.config['EVENT_LOG_SNAPSHOT_INTERVAL'])
+recovered_log = None
+atexit.register(event_log.close)
+# Mesures (/metrics): enregistré avant les autres before_request pour chronométrer aussi les 421
+metrics.instrument_app(app)
+with app.app_context():
+    persistence.configure_engine(db.engine, app.config['SQLITE_BUSY_TIMEOUT_MS'])
+    metrics.instrument_engine(db.engine)
+
+def create_socketio(app):
+    message_queue = app.config['MESSAGE_QUEUE']
+    if message_queue:
+        # URL non supportée: ValueError dès le démarrage (cf. broker.create_bus)
+        return InstrumentedSocketIO(app, async_mode='eventlet', client_manager=BusManager(message_queue))
+    return InstrumentedSocketIO(app, async_mode='eventlet')
+
+socketio = create_socketio(app)
+
+DEFAULT_GAME_CODE = 'default'
+# Code d'une partie retirée par un reset: préfixe suivi de son id (jamais saisi au login)
+RETIRED_CODE_PREFIX = '#'
+MAX_PLAYERS_PER_GAME = 4
+# Nombre max d'actions d'un événement 'actions' (lot)
+MAX_ACTION_BATCH = 50
+GAME_DURATION = timedelta(minutes=10)
+
+# DB Models
+# Chaque partie (Game) possède ses propres joueurs, jauges, salles et messages
+class Game(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(50), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class User(db.Model):
+    __table_args__ = (db.UniqueConstraint('game_id', 'username'),)
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False, index=True)
+    username = db.Column(db.String(80), nullable=False)
+    room = db.Column(db.String(50))
+    is_ready = db.Column(db.Boolean, default=False)
+
+class GameState(db.Model):
+    __table_args__ = (db.UniqueConstraint('game_id', 'key'),)
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False, index=True)
+    key = db.Column(db.String(50))
+    value = db.Column(db.Float)
+
+class RoomStatus(db.Model):
+    __table_args__ = (db.UniqueConstraint('game_id', 'room_name'),)
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False, index=True)
+    room_name = db.Column(db.String(50))
+    is_completed = db.Column(db.Boolean, default=False)
+    is_locked = db.Column(db.Boolean, default=True)
+    assigned_player = db.Column(db.String(80))
+
+class GameInfo(db.Model):
+    # Index (key, game_id): recherche d'une clé sur toutes les parties (rearm_timers)
+    __table_args__ = (db.UniqueConstraint('game_id', 'key'),
+                      db.Index('ix_game_info_key_game_id', 'key', 'game_id'))
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False, index=True)
+    key = db.Column(db.String(50))
+    value = db.Column(db.String(200))
+
+# NOUVEAU: Modèle pour les messages de chat
+class ChatMessage(db.Model):
+    # Index (game_id, id): derniers messages d'une partie et lecture après `last_id`
+    __table_args__ = (db.Index('ix_chat_message_game_id_id', 'game_id', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
+    username = db.Column(db.String(80), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'message': self.message,
+            'timestamp': self.timestamp.isoformat()
+        }
+
+# États initiaux du jeu
+INITIAL_STATES = {
+    'energy_level': 50.0,
+    'water_pollution': 30.0,
+    'air_co2': 40.0,
+    'air_o2': 60.0,
+    'flora_health': 60.0
+}
+ROOMS = ['Energie', 'Eau', 'Air', 'Flore']
+NEXT_ROOM = dict(zip(ROOMS, ROOMS[1:]))
+
+LEGACY_TABLES = ['user', 'game_state', 'room_status', 'game_info', 'chat_message']
+
+def initial_values():
+    """État de départ d'une partie, au format des événements `seed` du journal"""
+    return {
+        'states': dict(INITIAL_STATES),
+        'rooms': {room: [False, i != 0, None] for i, room in enumerate(ROOMS)},
+        'info': {'game_started': 'false', 'game_end_time': ''}
+    }
+
+def seed_game(game_id, session=None):
+    """Crée les jauges, salles et infos d'une partie qui vient d'être créée (sans commit)
+
+    Retourne l'état initial, à journaliser (`seed`) une fois la transaction validée.
+    """
+    session = db.session if session is None else session
+    seed = initial_values()
+    session.add_all([GameState(game_id=game_id, key=key, value=value)
+                     for key, value in seed['states'].items()])
+    session.add_all([RoomStatus(game_id=game_id, room_name=room,
+                                is_completed=is_completed, is_locked=is_locked)
+                     for room, (is_completed, is_locked, _) in seed['rooms'].items()])
+    session.add_all([GameInfo(game_id=game_id, key=key, value=value)
+                     for key, value in seed['info'].items()])
+    return seed
+
+def get_or_create_game(code):
+    """Retourne la partie identifiée par `code`, en la créant si besoin (sûr entre processus)"""
+    game = Game.query.filter_by(code=code).first()
+    if game:
+        return game
+    try:
+        game = Game(code=code)
+        db.session.add(game)
+        db.session.flush()
+        seed = seed_game(game.id)
+        db.session.commit()
+    except IntegrityError:
+        # Créée au même moment par un autre processus (code unique)
+        db.session.rollback()
+        return Game.query.filter_by(code=code).one()
+    event_log.append(game.id, 'seed', seed)
+    return game
+
+def migrate_legacy_schema(session):
+    """Migre une base mono-partie (sans colonne game_id) vers la partie par défaut (sans commit)"""
+    connection = session.connection()
+    inspector = inspect(connection)
+    if 'game_state' not in inspector.get_table_names():
+        return
+    if 'game_id' in [c['name'] for c in inspector.get_columns('game_state')]:
+        return
+    
+    legacy_columns = {}
+    for table in LEGACY_TABLES:
+        legacy_columns[table] = [c['name'] for c in inspector.get_columns(table)]
+        session.execute(text(f'ALTER TABLE "{table}" RENAME TO "{table}_legacy"'))
+    
+    db.metadata.create_all(connection)
+    game = Game(code=DEFAULT_GAME_CODE)
+    session.add(game)
+    session.flush()
+    
+    for table in LEGACY_TABLES:
+        columns = ', '.join(f'"{c}"' for c in legacy_columns[table] if c != 'id')
+        session.execute(text(
+            f'INSERT INTO "{table}" (game_id, {columns}) '
+            f'SELECT :game_id, {columns} FROM "{table}_legacy" ORDER BY id'
+        ), {'game_id': game.id})
+        session.execute(text(f'DROP TABLE "{table}_legacy"'))
+
+# ==================== GÉNÉRATIONS DE PARTIES ====================
+# Un reset ne supprime rien dans la requête: la partie est remplacée par une nouvelle
+# génération (nouvel id, même code) et l'ancienne est archivée puis purgée (archive.py).
+
+with app.app_context():
+    archiver = Archiver(db.engine, db.metadata, app.config['ARCHIVE_DIR'], delay=app.config['ARCHIVE_DELAY'],
+                        batch_size=app.config['ARCHIVE_BATCH_SIZE'], pause=app.config['ARCHIVE_PAUSE'])
+# Ids des parties retirées, chargés par start_worker puis complétés à chaque reset
+retired_games = set()
+
+def retire_game(game):
+    """Remplace une partie par une nouvelle génération; retourne la nouvelle partie"""
+    code = game.code
+    game.code = f'{RETIRED_CODE_PREFIX}{game.id}'
+    db.session.flush()
+    new_game = Game(code=code)
+    db.session.add(new_game)
+    db.session.flush()
+    seed = seed_game(new_game.id)
+    db.session.commit()
+    event_log.append(new_game.id, 'seed', seed)
+    retired_games.add(game.id)
+    archiver.submit(game.id)
+    return new_game
+
+# ==================== ÉTAT EN MÉMOIRE ====================
+
+def load_live_game(game_id):
+    """Charge l'état d'une partie depuis la BDD"""
+    with app.app_context():
+        states = {gs.key: gs.value for gs in GameState.query.filter_by(game_id=game_id)}
+        rooms = {
+            rs.room_name: RoomState(rs.room_name, bool(rs.is_completed),
+                                    bool(rs.is_locked), rs.assigned_player)
+            for rs in RoomStatus.query.filter_by(game_id=game_id).order_by(RoomStatus.id)
+        }
+        info = {gi.key: gi.value for gi in GameInfo.query.filter_by(game_id=game_id)}
+        return LiveGame(game_id, states, rooms, info)
+
+def flush_live_games(batch):
+    """Persiste en une transaction les modifications de plusieurs parties"""
+    state_rows, room_rows = [], []
+    with app.app_context():
+        for game_id, states, rooms, info in batch:
+            state_rows += [{'gid': game_id, 'k': key, 'v': value} for key, value in states.items()]
+            room_rows += [{'gid': game_id, 'name': name, 'completed': completed,
+                           'locked': locked, 'player': player}
+                          for name, (completed, locked, player) in rooms.items()]
+            for key, value in info.items():
+                updated = GameInfo.query.filter_by(game_id=game_id, key=key).update({'value': value})
+                if not updated:
+                    db.session.add(GameInfo(game_id=game_id, key=key, value=value))
+        
+        if state_rows:
+            db.session.execute(text(
+                'UPDATE game_state SET value = :v WHERE game_id = :gid AND "key" = :k'
+            ), state_rows)
+        if room_rows:
+            db.session.execute(text(
+                'UPDATE room_status SET is_completed = :completed, is_locked = :locked, '
+                'assigned_player = :player WHERE game_id = :gid AND room_name = :name'
+            ), room_rows)
+        # Le journal d'abord: après un crash, sa relecture ne doit pas ramener la BDD en arrière
+        event_log.sync()
+        db.session.commit()
+
+def live_game_pinned(game_id):
+    """Une partie dont des joueurs sont encore présents reste en mémoire"""
+    return bool(presence.players(game_id))
+
+def unload_live_game(game_id):
+    """Partie déchargée (terminée ou inactive, état déjà en BDD): tampon de chat libéré, retirée du tableau de bord"""
+    chat_hub.evict(game_id)
+    dashboard.mark(game_id)
+
+store = StateStore(load_live_game, flush_live_games, app.config['STATE_FLUSH_INTERVAL'],
+                   idle_timeout=app.config['STATE_IDLE_TIMEOUT'],
+                   finished_timeout=app.config['STATE_FINISHED_TIMEOUT'],
+                   pinned=live_game_pinned, on_evict=unload_live_game)
+atexit.register(store.stop)
+
+def live_game_values(live):
+    return {
+        'states': dict(live.states),
+        'rooms': {name: [rs.is_completed, rs.is_locked, rs.assigned_player] for name, rs in live.rooms.items()},
+        'info': dict(live.info)
+    }
+
+def snapshot_live_games():
+    return {game_id: live_game_values(live) for game_id, live in store.games.items()}
+
+event_log.snapshotter = snapshot_live_games
+
+def recover_live_games(snapshot, events):
+    """Au démarrage: réapplique le dernier snapshot et les événements suivants du journal
+
+    Les événements portent des valeurs absolues: rejouer ce qui était déjà
+    persisté en BDD est sans effet.
+    """
+    games = dict(snapshot['games'])
+    for seq, ts, game_id, kind, data in events:
+        games[game_id] = apply_event(games.get(game_id), kind, data)
+    
+    with app.app_context():
+        for game_id, values in games.items():
+            if (values is None or game_id in retired_games or not owns_game(game_id)
+                    or db.session.get(Game, game_id) is None):
+                continue
+            live = store.get(game_id)
+            for key, value in values['states'].items():
+                if key in live.states and live.states[key] != value:
+                    live.set_state(key, value)
+            for name, (is_completed, is_locked, player) in values['rooms'].items():
+                room = live.get_room(name)
+                if room and (room.is_completed, room.is_locked, room.assigned_player) != (is_completed, is_locked, player):
+                    live.update_room(name, is_completed=is_completed, is_locked=is_locked, assigned_player=player)
+            for key, value in values['info'].items():
+                if live.get_info(key) != value:
+                    live.set_info(key, value)
+            live.take_changes()
+    store.flush()
+
+def game_channel(game_id):
+    """Nom de la room Socket.IO regroupant les joueurs d'une partie"""
+    return f'game:{game_id}'
+
+# ==================== WORKERS ====================
+# Chaque partie appartient à un seul worker (game_id % WORKER_COUNT), seul détenteur de son
+# état en mémoire. Le balanceur route de façon collante sur le cookie `game_worker`.
+
+def game_worker(game_id):
+    return game_id % app.config['WORKER_COUNT']
+
+def owns_game(game_id):
+    return game_worker(game_id) == app.config['WORKER_INDEX']
+
+def worker_channel(index):
+    return f'worker:{index}'
+
+control_bus = None
+if app.config['MESSAGE_QUEUE'] and app.config['WORKER_COUNT'] > 1:
+    control_bus = create_bus(app.config['MESSAGE_QUEUE'])
+
+def notify_players_changed(game_id, joined=None):
+    """Signale un changement de joueurs (dont l'arrivée de `joined`) au worker propriétaire de la partie"""
+    if owns_game(game_id):
+        if joined:
+            presence.join(game_id, joined)
+        store.get(game_id).mark_players_changed()
+        publish_state(game_id)
+    else:
+        control_bus.publish(worker_channel(game_worker(game_id)),
+                            {'op': 'players_changed', 'game_id': game_id, 'joined': joined})
+
+def control_loop():
+    """Traite les notifications des autres workers pour les parties de ce worker"""
+    for _, message in control_bus.listen([worker_channel(app.config['WORKER_INDEX'])]):
+        try:
+            if message['op'] == 'players_changed' and owns_game(message['game_id']):
+                notify_players_changed(message['game_id'], message.get('joined'))
+            elif message['op'] == 'dashboard_full':
+                dashboard.mark_all(list(store.games))
+        except Exception as exc:
+            print(f'Erreur notification worker: {exc}')
+
+
+# ==================== PRÉSENCE DES JOUEURS ====================
+# Les sockets d'une partie sont tous sur son worker, qui tient la présence de ses joueurs
+# en mémoire (presence.py). Un joueur parti est supprimé et sa salle libérée.
+
+def evict_player(player):
+    """Supprime un joueur sans signe de vie depuis le délai de grâce"""
+    game_id, username = player.game_id, player.username
+    with app.app_context():
+        User.query.filter_by(game_id=game_id, username=username).delete()
+        db.session.commit()
+        identities.invalidate_game(game_id, username)
+        live = store.get(game_id)
+        for room_status in live.rooms.values():
+            if room_status.assigned_player == username:
+                live.update_room(room_status.room_name, assigned_player=None)
+        event_log.append(game_id, 'evict', {'user': username})
+        live.mark_players_changed()
+        publish_state(game_id)
+    # Socket zombie (plus de heartbeat): fermé, la page se reconnectera et sera refusée
+    for sid in player.sids:
+        socketio.server.disconnect(sid, namespace='/')
+
+presence = PresenceTracker(evict_player, grace=app.config['PRESENCE_GRACE_PERIOD'],
+                           sweep_interval=app.config['PRESENCE_SWEEP_INTERVAL'])
+
+def track_players():
+    """Au démarrage: reprend les joueurs des parties de ce worker, qui ont le délai de grâce pour revenir"""
+    with app.app_context():
+        users = User.query.filter(User.game_id % app.config['WORKER_COUNT'] == app.config['WORKER_INDEX'])
+        for user in users.order_by(User.id):
+            if user.game_id in retired_games:
+                continue
+            presence.join(user.game_id, user.username, user.room, bool(user.is_ready))
+
+# ==================== IDENTITÉ DES JOUEURS ====================
+# La session porte l'id du joueur (user_id); sa ligne User est servie par un cache
+# mémoire (identity.py), mis à jour par les écritures de ce worker.
+
+def load_identity(user_id):
+    """Ligne User du joueur, None s'il n'existe plus ou si sa partie est retirée"""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        if user is None or user.game_id in retired_games:
+            return None
+        return Identity(user.id, user.game_id, user.username, user.room, bool(user.is_ready))
+
+identities = IdentityCache(load_identity, max_size=app.config['IDENTITY_CACHE_SIZE'],
+                           ttl=app.config['IDENTITY_CACHE_TTL'])
+
+def session_user_id():
+    """Id du joueur de la session; une session ouverte avant son ajout est complétée une fois"""
+    user_id = session.get('user_id')
+    if user_id is None and session.get('game_id') is not None and session.get('username'):
+        with app.app_context():
+            user = User.query.filter_by(game_id=session['game_id'], username=session['username']).first()
+        if user is None:
+            return None
+        user_id = session['user_id'] = user.id
+    return user_id
+
+def current_user():
+    """Identité du joueur de la session (cache mémoire), ou None"""
+    user = identities.get(session_user_id())
+    if user is None or user.game_id != session.get('game_id'):
+        return None
+    return user
+
+def save_user(user, **fields):
+    """Écrit la salle / l'état prêt du joueur en BDD (commit), puis dans le cache"""
+    User.query.filter_by(id=user.user_id).update(fields)
+    db.session.commit()
+    identities.update(user.user_id, **fields)
+
+# ==================== CHAT EN MÉMOIRE ====================
+
+def load_recent_chat(game_id, limit):
+    """Derniers messages d'une partie, du plus ancien au plus récent"""
+    with app.app_context():
+        messages = ChatMessage.query.filter_by(game_id=game_id) \
+            .order_by(ChatMessage.id.desc()).limit(limit).all()
+        return [msg.to_dict() for msg in reversed(messages)]
+
+chat_hub = ChatHub(load_recent_chat, app.config['CHAT_BUFFER_SIZE'])
+
+def insert_chat_batch(batch):
+    """Insère en une transaction les messages de plusieurs demandes `(game_id, entries)`"""
+    with app.app_context():
+        groups = [[ChatMessage(game_id=game_id, username=username, message=text)
+                   for username, text in entries]
+                  for game_id, entries in batch]
+        for messages in groups:
+            db.session.add_all(messages)
+        # Ids et horodatages connus dès le flush: les dicts sont construits avant le commit,
+        # qui expire les objets (les relire coûterait un SELECT par message)
+        db.session.flush()
+        payloads = [[msg.to_dict() for msg in messages] for messages in groups]
+        db.session.commit()
+        return payloads
+
+def broadcast_chat_messages(game_id, payloads):
+    """Après commit: alimente le tampon (réveille les long-polls) et pousse via Socket.IO"""
+    # Un tampon pas encore chargé lira ces messages en BDD au premier accès
+    buffer = chat_hub.peek(game_id)
+    for payload in payloads:
+        if buffer is not None:
+            buffer.append(payload)
+        socketio.emit('chat_message', payload, to=game_channel(game_id), namespace='/')
+
+chat_writer = ChatWriter(insert_chat_batch, broadcast_chat_messages,
+                         window=app.config['CHAT_COMMIT_WINDOW'])
+
+def post_chat_messages(game_id, entries):
+    """Enregistre des messages `(username, texte)` via l'écriture groupée; retourne leurs dicts"""
+    messages = chat_writer.submit(game_id, entries)
+    for message in messages:
+        event_log.append(game_id, 'chat', {'id': message['id'], 'user': message['username'],
+                                           'text': message['message']})
+    return messages
+
+# ==================== TIMERS DES PARTIES ====================
+
+# Un seul greenlet gère les échéances de toutes les parties; à l'expiration, check_victory(game_id)
+def expire_game_timer(game_id):
+    # Partie déjà terminée (échéance armée avant le résultat): rien à faire
+    if store.get(game_id).get_info('game_result'):
+        return
+    event_log.append(game_id, 'timer_expired', {})
+    check_victory(game_id)
+
+scheduler = DeadlineScheduler(expire_game_timer)
+
+def start_timer(game_id):
+    """Démarre le compte à rebours d'une partie; l'échéance est persistée (game_end_time)"""
+    game_end_time = datetime.now() + GAME_DURATION
+    store.get(game_id).set_info('game_end_time', game_end_time.isoformat())
+    store.flush()
+    scheduler.schedule(game_id, game_end_time.timestamp())
+    publish_state(game_id)
+
+def cancel_timer(game_id):
+    return scheduler.cancel(game_id)
+
+def finish_game(live, result):
+    """Fixe le résultat (définitif) de la partie et désarme son échéance"""
+    live.set_info('game_result', result)
+    cancel_timer(live.game_id)
+
+def rearm_timers():
+    """Au démarrage: réarme les échéances persistées des parties non terminées"""
+    with app.app_context():
+        finished = db.session.query(GameInfo.game_id).filter(GameInfo.key == 'game_result')
+        pending = GameInfo.query.filter(
+            GameInfo.key == 'game_end_time',
+            GameInfo.value != '',
+            GameInfo.game_id.not_in(finished)
+        )
+        for game_info in pending:
+            if not owns_game(game_info.game_id) or game_info.game_id in retired_games:
+                continue
+            try:
+                scheduler.schedule(game_info.game_id, datetime.fromisoformat(game_info.value).timestamp())
+            except ValueError:
+                pass
+
+def check_victory(game_id):
+    """Vérifie les conditions de victoire (compteurs de LiveGame) et met à jour l'état de la partie"""
+    live = store.get(game_id)
+    if live.get_info('game_result'):
+        return
+    
+    if live.all_rooms_completed and live.gauges_ok:
+        finish_game(live, 'victory')
+    else:
+        finish_game(live, 'defeat')
+    publish_state(game_id)
+
+def unlock_next_room(game_id, completed_room):
+    """Débloque la salle suivante après qu'une salle soit complétée"""
+    next_room_name = NEXT_ROOM.get(completed_room)
+    if next_room_name:
+        live = store.get(game_id)
+        if live.get_room(next_room_name):
+            live.update_room(next_room_name, is_locked=False)
+
+# ==================== RÈGLES DES ÉNIGMES ====================
+
+# Table (salle, action) de puzzle_rules.py, compilée une fois au démarrage
+PUZZLE_DISPATCH = compile_rules(PUZZLE_RULES, INITIAL_STATES)
+
+def complete_room(game_id, room, completion, sid):
+    """Applique les effets de complétion déclarés par la règle (`sid`: socket du joueur)"""
+    live = store.get(game_id)
+    live.update_room(room, is_completed=True)
+    if completion.get('chat'):
+        post_chat_messages(game_id, [('Système', text) for text in completion['chat']])
+    if completion.get('broadcast'):
+        socketio.emit('puzzle_completed', {'room': room}, to=game_channel(game_id), namespace='/')
+    else:
+        socketio.emit('puzzle_completed', {'room': room}, to=sid, namespace='/')
+    if completion.get('unlock_next'):
+        unlock_next_room(game_id, room)
+    if completion.get('redirect_to_final'):
+        socketio.emit('redirect_to_final', {}, to=game_channel(game_id), namespace='/')
+    if completion.get('check_victory') and live.all_rooms_completed:
+        check_victory(game_id)
+
+# ==================== FLUX D'ÉTAT (Socket.IO) ====================
+
+def players_payload(game_id):
+    return [player.to_dict() for player in presence.players(game_id)]
+
+def room_payload(room_status):
+    return {
+        'name': room_status.room_name,
+        'is_locked': room_status.is_locked,
+        'is_completed': room_status.is_completed,
+        'assigned_player': room_status.assigned_player
+    }
+
+def remaining_seconds(live):
+    game_end_time = live.get_info('game_end_time')
+    if game_end_time:
+        try:
+            end_time = datetime.fromisoformat(game_end_time)
+            return max(0, int((end_time - datetime.now()).total_seconds()))
+        except ValueError:
+            pass
+    return 0
+
+def state_snapshot(game_id):
+    """État complet (partagé par tous les joueurs) d'une partie"""
+    live = store.get(game_id)
+    return {
+        'epoch': live.epoch,
+        'version': live.version,
+        'players': players_payload(game_id),
+        'rooms': [room_payload(r) for r in live.rooms.values()],
+        'game_states': dict(live.states),
+        'game_started': live.get_info('game_started', 'false'),
+        'remaining_time': remaining_seconds(live),
+        'game_result': live.get_info('game_result')
+    }
+
+def poll_snapshot(game_id):
+    """Partie commune de /api/poll_status, pré-sérialisée et gardée jusqu'à la prochaine écriture
+
+    Retourne `(write_seq, corps JSON sans l'accolade finale, joueurs par nom)`.
+    """
+    live = store.get(game_id)
+    cached = live.snapshot_cache
+    if cached is None or cached[0] != live.write_seq:
+        players = players_payload(game_id)
+        shared = {
+            'players': players,
+            'rooms': [room_payload(r) for r in live.rooms.values()],
+            'game_states': live.states,
+            'game_started': live.get_info('game_started', 'false'),
+            'game_result': live.get_info('game_result')
+        }
+        body = json.dumps(shared, separators=(',', ':')).encode()[:-1]
+        cached = (live.write_seq, body, {p['username']: p for p in players})
+        live.snapshot_cache = cached
+    return cached
+
+def publish_state(game_id):
+    """Pousse aux joueurs de la partie uniquement les champs modifiés, avec un numéro de version"""
+    live = store.get(game_id)
+    states, rooms, info, players_changed = live.take_changes()
+    if not (states or rooms or info or players_changed):
+        return
+    dashboard.mark(game_id)
+    
+    if states or rooms or info:
+        event_log.append(game_id, 'state', {
+            'states': {key: live.states[key] for key in states},
+            'rooms': {name: [live.rooms[name].is_completed, live.rooms[name].is_locked,
+                             live.rooms[name].assigned_player] for name in rooms},
+            'info': {key: live.info.get(key) for key in info}
+        })
+    
+    delta = {}
+    if states:
+        delta['game_states'] = {key: live.states[key] for key in states}
+    if rooms:
+        delta['rooms'] = [room_payload(live.rooms[name]) for name in rooms]
+    if 'game_started' in info:
+        delta['game_started'] = live.get_info('game_started')
+    if 'game_result' in info:
+        delta['game_result'] = live.get_info('game_result')
+    if 'game_end_time' in info:
+        delta['remaining_time'] = remaining_seconds(live)
+    if players_changed:
+        delta['players'] = players_payload(game_id)
+    
+    socketio.emit('state_delta', live.record_delta(delta), to=game_channel(game_id), namespace='/')
+
+def lobby_page(game_id, username):
+    """Page de lobby d'un joueur, gardée jusqu'au prochain changement de joueurs ou de salles"""
+    live = store.get(game_id)
+    cached = live.lobby_cache
+    if cached is None or cached[0] != live.lobby_seq:
+        cached = live.lobby_cache = (live.lobby_seq, {})
+    html = cached[1].get(username)
+    if html is None:
+        _, _, players = poll_snapshot(game_id)
+        html = render_template('lobby.html',
+                               username=username,
+                               users=list(players.values()),
+                               rooms=list(live.rooms.values()))
+        cached[1][username] = html
+    return html
+
+# ==================== LIMITATION DE DÉBIT ====================
+# Seaux à jetons par joueur et par partie (ratelimit.py), vérifiés avant tout accès BDD
+
+rate_limiter = RateLimiter(app.config['RATE_LIMITS'])
+rate_limited = metrics.registry.add(metrics.Counter(
+    'rate_limited_total', 'Requêtes et événements refusés ou coalescés (limitation de débit)',
+    ('limit', 'scope', 'outcome')))
+
+def throttle(name, game_id, username, kind=None):
+    """Consomme un jeton; retourne None si autorisé, sinon le refus (compté dans /metrics)"""
+    refused = rate_limiter.check(name, game_id, username, kind)
+    if refused is not None:
+        rate_limited.inc((refused.limit, refused.scope, 'coalesced' if refused.coalesce else 'dropped'))
+    return refused
+
+def rate_limit_message(refused):
+    return f'Trop de requêtes, réessayez dans {math.ceil(refused.retry_after)} s'
+
+def rate_limited_response(refused):
+    response = jsonify({'error': rate_limit_message(refused), 'retry_after': round(refused.retry_after, 2)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(refused.retry_after))
+    return response
+
+def limited_call(name, kind, game_id, username, sid, fn, *args):
+    """Lance `fn(*args)` si le débit le permet; sinon coalesce l'appel ou signale le refus
+
+    Un appel coalescé est rejoué hors requête: `fn` doit répondre via `socketio.emit(to=sid)`.
+    """
+    refused = throttle(name, game_id, username, kind)
+    if refused is None:
+        return fn(*args)
+    if refused.coalesce:
+        rate_limiter.defer((name, kind, sid), refused.retry_after,
+                           limited_call, name, kind, game_id, username, sid, fn, *args)
+    elif refused.notify:
+        socketio.emit('error', {'message': rate_limit_message(refused), 'rate_limited': True,
+                                'retry_after': round(refused.retry_after, 2)}, to=sid, namespace='/')
+
+# ==================== ROUTES HTTP ====================
+
+def is_logged_in():
+    # Une session restée sur une génération remplacée par un reset, ou dont le joueur
+    # a été évincé (absence prolongée), doit se reconnecter
+    return ('username' in session and 'game_id' in session and session['game_id'] not in retired_games
+            and current_user() is not None)
+
+# Routes servies par n'importe quel worker (aucun accès à l'état en mémoire)
+ANY_WORKER_ENDPOINTS = {'index', 'login', 'static', 'asset', 'metrics_endpoint', 'export_data', 'operator'}
+
+@app.before_request
+def check_game_worker():
+    """Requête arrivée sur un worker qui ne possède pas la partie: 421 et cookie de routage"""
+    if app.config['WORKER_COUNT'] == 1 or request.endpoint in ANY_WORKER_ENDPOINTS:
+        return None
+    game_id = session.get('game_id')
+    if game_id is None or owns_game(game_id):
+        return None
+    response = jsonify({'error': 'Misdirected request', 'worker': game_worker(game_id)})
+    response.status_code = 421
+    response.set_cookie('game_worker', str(game_worker(game_id)))
+    return response
+
+@app.route('/')
+def index():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    return redirect(url_for('lobby'))
+
+@app.route('/lobby')
+def lobby():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    with app.app_context():
+        return lobby_page(session['game_id'], session['username'])
+
+@app.route('/game')
+def game():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    with app.app_context():
+        game_id = session['game_id']
+        user = current_user()
+        if not user or not user.room:
+            return redirect(url_for('lobby'))
+        
+        room = user.room
+        session['room'] = room
+        
+        live = store.get(game_id)
+        room_status = live.get_room(room)
+        game_started = live.get_info('game_started') == 'true'
+        
+        if game_started and room_status.is_locked:
+            return redirect(url_for('lobby'))
+        
+        if room == 'Energie':
+            return page_cache.render('energy.html', username=session['username'])
+        elif room == 'Eau':
+            return page_cache.render('water.html', username=session['username'])
+        elif room == 'Air':
+            return page_cache.render('air.html', username=session['username'])
+        elif room == 'Flore':
+            return page_cache.render('flora.html', username=session['username'])
+        else:
+            return redirect(url_for('lobby'))
+
+# ==================== API POLLING ====================
+
+@app.route('/api/poll_status')
+def poll_status():
+    """API REST de polling: état partagé en cache, ETag et 304 si rien n'a changé"""
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    with app.app_context():
+        game_id = session['game_id']
+        live = store.get(game_id)
+        write_seq, body, players = poll_snapshot(game_id)
+        
+        current_user = players.get(session['username'])
+        
+        can_access_game = False
+        if current_user and current_user['room'] and current_user['is_ready']:
+            room_status = live.get_room(current_user['room'])
+            if room_status and not room_status.is_locked:
+                can_access_game = True
+        
+        # Seuls les champs propres au joueur sont sérialisés à chaque requête
+        remaining_time = remaining_seconds(live)
+        tail = f',"remaining_time":{remaining_time},"can_access_game":{json.dumps(can_access_game)}}}'
+        
+        response = app.response_class(body + tail.encode(), mimetype='application/json')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.set_etag(f'{live.epoch}-{write_seq}-{remaining_time}-{int(can_access_game)}')
+        return response.make_conditional(request)
+
+# NOUVEAU: API pour récupérer les messages
+@app.route('/api/chat/messages')
+def get_chat_messages():
+    """Récupère les messages depuis un certain ID"""
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    # Paramètres optionnels: dernier ID connu par le client, attente max (long-poll)
+    last_id = request.args.get('last_id', 0, type=int)
+    wait = min(request.args.get('wait', 0, type=float), app.config['CHAT_LONG_POLL_TIMEOUT'])
+    game_id = session['game_id']
+    
+    # Récupérer uniquement les nouveaux messages depuis le tampon en mémoire
+    buffer = chat_hub.get(game_id)
+    messages, covered = buffer.read_since(last_id)
+    if not messages and wait > 0:
+        buffer.wait(wait)
+        # Partie réinitialisée pendant l'attente: son tampon a été libéré, on n'en recrée pas
+        if game_id in retired_games:
+            return jsonify({'error': 'Game reset'}), 410
+        messages, covered = buffer.read_since(last_id)
+    
+    # Historique plus ancien que le tampon: lecture en BDD
+    if not covered:
+        with app.app_context():
+            older = ChatMessage.query.filter(
+                ChatMessage.game_id == game_id,
+                ChatMessage.id > last_id,
+                ChatMessage.id < buffer.oldest_id
+            ).order_by(ChatMessage.id.asc()).all()
+            messages = [msg.to_dict() for msg in older] + messages
+    
+    return jsonify({
+        'messages': messages
+    })
+
+# NOUVEAU: API pour envoyer un message
+@app.route('/api/chat/send', methods=['POST'])
+def send_chat_message():
+    """Enregistre un nouveau message dans la BDD"""
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    data = request.get_json()
+    message_text = data.get('message', '').strip()
+    
+    if not message_text:
+        return jsonify({'error': 'Message vide'}), 400
+    
+    if len(message_text) > 500:
+        return jsonify({'error': 'Message trop long'}), 400
+    
+    refused = throttle('chat', session['game_id'], session['username'])
+    if refused is not None:
+        return rate_limited_response(refused)
+    
+    new_message = post_chat_messages(session['game_id'], [(session['username'], message_text)])[0]
+    
+    return jsonify({
+        'success': True,
+        'message': new_message
+    })
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form['username']
+        game_code = request.form.get('game', '').strip().lstrip(RETIRED_CODE_PREFIX)[:50] or DEFAULT_GAME_CODE
+        with app.app_context():
+            game = get_or_create_game(game_code)
+            user = User.query.filter_by(game_id=game.id, username=username).first()
+            if user:
+                return render_template('login.html', 
+                                     error=True,
+                                     error_message='''<p>Ce nom d'utilisateur est déjà pris!</p>''',
+                                     username=username,
+                                     game_code=game_code)
+            
+            player_count = User.query.filter_by(game_id=game.id).count()
+            if player_count >= MAX_PLAYERS_PER_GAME:
+                return render_template('login.html',
+                                     error=True,
+                                     error_message=f'''<p>Partie complète! Maximum {MAX_PLAYERS_PER_GAME} joueurs.</p>
+                                                    <a href="/">Retour</a>''',
+                                     game_code=game_code)
+            
+            new_user = User(game_id=game.id, username=username)
+            db.session.add(new_user)
+            db.session.commit()
+            identities.put(Identity(new_user.id, game.id, username))
+            session['username'] = username
+            session['game_id'] = game.id
+            session['user_id'] = new_user.id
+            event_log.append(game.id, 'login', {'user': username})
+            notify_players_changed(game.id, joined=username)
+            response = redirect(url_for('lobby'))
+            response.set_cookie('game_worker', str(game_worker(game.id)))
+            return response
+    
+    return render_template('login.html', error=False)
+
+@app.route('/logout')
+def logout():
+    username = session.get('username')
+    game_id = session.get('game_id')
+    if username and game_id:
+        event_log.append(game_id, 'logout', {'user': username})
+        with app.app_context():
+            user = current_user()
+            if user and user.room:
+                live = store.get(game_id)
+                room_status = live.get_room(user.room)
+                if room_status and room_status.assigned_player == username:
+                    live.update_room(user.room, assigned_player=None)
+                    publish_state(game_id)
+    
+    session.pop('username', None)
+    session.pop('game_id', None)
+    session.pop('user_id', None)
+    session.pop('room', None)
+    return redirect(url_for('login'))
+
+# NOUVEAU: Route pour réinitialiser complètement le jeu
+@app.route('/reset_game', methods=['POST'])
+def reset_game():
+    """Réinitialise la partie (nouvelle génération) et redirige ses joueurs vers la connexion"""
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    with app.app_context():
+        game_id = session['game_id']
+        
+        # 1. État en attente écrit en BDD: il fera partie de l'archive
+        store.flush()
+        
+        # 2. Nouvelle génération (même code, état initial); l'ancienne est archivée puis purgée en arrière-plan
+        new_game = retire_game(db.session.get(Game, game_id))
+        event_log.append(game_id, 'reset', {'user': session['username'], 'next_game_id': new_game.id})
+        
+        # 3-5. Oublier l'ancienne génération en mémoire (état, chat, présence, timer)
+        store.evict(game_id)
+        chat_hub.evict(game_id)
+        presence.drop_game(game_id)
+        identities.invalidate_game(game_id)
+        cancel_timer(game_id)
+        dashboard.mark(game_id)
+        
+        # 6. Émettre un événement pour forcer les clients de la partie à se reconnecter
+        socketio.emit('game_reset', {
+            'message': 'Le jeu a été réinitialisé. Redirection vers la page de connexion...'
+        }, to=game_channel(game_id), namespace='/')
+        
+        # 7. Supprimer la session de l'utilisateur actuel
+        session.clear()
+        
+        return jsonify({'success': True, 'redirect': '/login'})
+    
+
+# AJOUT 1: Nouvelle route pour la page du code final
+@app.route('/final_code')
+def final_code():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    with app.app_context():
+        return render_template('final_code.html', username=session['username'])
+
+# AJOUT 2: Nouvelle route pour la page de victoire
+@app.route('/victory')
+def victory():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    with app.app_context():
+        return render_template('victory.html', username=session['username'])
+
+# AJOUT 3: API pour valider le code final
+# MODIFICATION: API pour valider le code final avec broadcast
+@app.route('/api/validate_final_code', methods=['POST'])
+def validate_final_code():
+    """Valide le code secret final et notifie tous les joueurs"""
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    refused = throttle('validate_final_code', session['game_id'], session['username'])
+    if refused is not None:
+        return rate_limited_response(refused)
+    
+    data = request.get_json()
+    code = data.get('code', '').strip().upper()
+    
+    CORRECT_CODE = 'EPSI WORKSHOPS 2025'  # Le code secret
+    
+    with app.app_context():
+        game_id = session['game_id']
+        event_log.append(game_id, 'final_code', {'user': session['username'], 'code': code,
+                                                 'correct': code == CORRECT_CODE})
+        if code == CORRECT_CODE:
+            live = store.get(game_id)
+            # Marquer la partie comme gagnée (l'échéance est désarmée)
+            finish_game(live, 'victory')
+            
+            # Enregistrer qui a validé le code
+            live.set_info('code_validator', session['username'])
+            publish_state(game_id)
+            
+            # Ajouter un message dans le chat
+            post_chat_messages(game_id, [
+                ('Système', f'🎉🏆 {session["username"]} a validé le code secret ! VICTOIRE TOTALE ! 🏆🎉')
+            ])
+            
+            # IMPORTANT: Émettre l'événement de victoire à tous les joueurs de la partie via SocketIO
+            socketio.emit('victory_achieved', {
+                'validator': session['username'],
+                'message': f'{session["username"]} a trouvé le code secret !'
+            }, to=game_channel(game_id), namespace='/')
+            
+            return jsonify({'success': True, 'message': 'Code correct!', 'redirect': '/victory'})
+        else:
+            return jsonify({'success': False, 'message': 'Code incorrect'})
+        
+# ==================== MÉTRIQUES ====================
+
+def count_greenlets():
+    # Parcourt tous les objets suivis par le ramasse-miettes: échantillonné, jamais à chaque lecture
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, greenlet.greenlet))
+
+metrics.registry.add(metrics.Gauge(
+    'socketio_connected_clients', 'Sockets connectés à ce worker',
+    lambda: len(socketio.server.manager.rooms.get('/', {}).get(None, ()))))
+metrics.registry.add(metrics.Gauge('games_active', 'Parties chargées en mémoire', lambda: len(store.games)))
+metrics.registry.add(metrics.Gauge('players_present', 'Joueurs suivis par la présence', lambda: len(presence)))
+metrics.registry.add(metrics.Gauge('identity_cache_entries', 'Joueurs en cache (lignes User)', lambda: len(identities)))
+metrics.registry.add(metrics.Gauge('dashboard_games_pending', 'Parties à renvoyer au tableau de bord', lambda: len(dashboard)))
+metrics.registry.add(metrics.Gauge('games_pending_archive', 'Parties retirées en attente d\'archivage', lambda: len(archiver)))
+metrics.registry.add(metrics.Gauge('game_timers_scheduled', 'Échéances de parties armées', lambda: len(scheduler)))
+metrics.registry.add(metrics.SampledGauge(
+    'greenlets', f'Greenlets vivants (recalculé toutes les {app.config["GREENLET_SAMPLE_INTERVAL"]:g} s)',
+    count_greenlets, interval=app.config['GREENLET_SAMPLE_INTERVAL']))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques de ce worker au format texte Prometheus (même jeton que les exports)"""
+    if not token_allowed(app.config['EXPORT_TOKEN'], request_token()):
+        return jsonify({'error': 'Forbidden'}), 403
+    return app.response_class(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# ==================== EXPORTS ====================
+
+def token_allowed(expected, provided):
+    """Jeton d'accès valide; la fonction est désactivée si aucun jeton n'est configuré"""
+    return bool(expected) and isinstance(provided, str) and hmac.compare_digest(provided, expected)
+
+def request_token():
+    """Jeton fourni en en-tête `Authorization: Bearer ...` ou en paramètre `token`"""
+    return request.headers.get('Authorization', '').removeprefix('Bearer ') or request.args.get('token', '')
+
+@app.route('/api/export/<dataset>')
+def export_data(dataset):
+    """Export en flux (NDJSON ou CSV) d'un jeu de données, cf. export.py"""
+    import export  # chargé au premier export seulement
+    if not token_allowed(app.config['EXPORT_TOKEN'], request_token()):
+        return jsonify({'error': 'Forbidden'}), 403
+    if dataset not in export.COLUMNS:
+        return jsonify({'error': 'Jeu de données inconnu'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return jsonify({'error': 'Format inconnu'}), 400
+    try:
+        # getlist(type=int) ignorerait `?game=x`: l'export porterait alors sur toutes les parties
+        game_ids = export.parse_game_ids(request.args.getlist('game'))
+    except ValueError:
+        return jsonify({'error': 'Partie invalide'}), 400
+    try:
+        filters = export.Filters(game_ids,
+                                 export.parse_datetime(request.args.get('since')),
+                                 export.parse_datetime(request.args.get('until')))
+    except ValueError:
+        return jsonify({'error': 'Date invalide'}), 400
+    
+    # Le contexte de requête (et la session BDD) reste actif pendant tout le flux
+    rows = export.Exporter(db.session, db.metadata, app.config['EVENT_LOG_DIR'],
+                           app.config['ARCHIVE_DIR']).rows(dataset, filters)
+    response = app.response_class(stream_with_context(export.encode(dataset, fmt, rows)),
+                                  content_type=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={dataset}.{fmt}'
+    return response
+
+# ==================== TABLEAU DE BORD DES ANIMATEURS ====================
+# Une page (/operator) pour suivre toutes les parties. Chaque worker résume ses parties
+# modifiées à cadence fixe (dashboard.py) et les diffuse sur le namespace /operator,
+# relayé à tous les workers par la file de messages.
+
+OPERATOR_NAMESPACE = '/operator'
+# Codes des parties résumées (lus en BDD une fois par partie)
+dashboard_codes = {}
+
+def dashboard_summaries(game_ids):
+    """Résumé de chaque partie pour le tableau de bord; None si elle a été retirée ou déchargée"""
+    missing = [game_id for game_id in game_ids if game_id not in dashboard_codes]
+    if missing:
+        with app.app_context():
+            dashboard_codes.update(db.session.query(Game.id, Game.code).filter(Game.id.in_(missing)))
+    summaries = {}
+    for game_id in game_ids:
+        live = store.games.get(game_id)
+        if live is None or game_id in retired_games:
+            dashboard_codes.pop(game_id, None)
+            summaries[game_id] = None
+            continue
+        summaries[game_id] = {
+            'game_id': game_id,
+            'code': dashboard_codes.get(game_id),
+            'game_states': dict(live.states),
+            'rooms': [room_payload(r) for r in live.rooms.values()],
+            'players': len(presence.players(game_id)),
+            'game_started': live.get_info('game_started', 'false'),
+            'remaining_time': remaining_seconds(live),
+            'game_result': live.get_info('game_result')
+        }
+    return summaries
+
+def send_dashboard_update(payload):
+    socketio.emit('games_update', payload, namespace=OPERATOR_NAMESPACE)
+
+dashboard = DashboardAggregator(dashboard_summaries, send_dashboard_update,
+                                interval=app.config['DASHBOARD_INTERVAL'])
+
+def request_full_dashboard():
+    """Renvoi de toutes les parties en mémoire, par ce worker et par les autres"""
+    dashboard.mark_all(list(store.games))
+    if control_bus is not None:
+        for index in range(app.config['WORKER_COUNT']):
+            if index != app.config['WORKER_INDEX']:
+                control_bus.publish(worker_channel(index), {'op': 'dashboard_full'})
+
+@app.route('/operator')
+def operator():
+    if not token_allowed(app.config['OPERATOR_TOKEN'], request.args.get('token', '')):
+        return jsonify({'error': 'Forbidden'}), 403
+    return render_template('operator.html', token=request.args['token'], rooms=ROOMS,
+                           gauges=list(INITIAL_STATES), gauge_threshold=GAUGE_THRESHOLD)
+
+@socketio.on('connect', namespace=OPERATOR_NAMESPACE)
+def handle_operator_connect(auth=None):
+    """Animateur: jeton OPERATOR_TOKEN requis; reçoit toutes les parties au prochain envoi"""
+    start_worker()
+    token = auth.get('token') if isinstance(auth, dict) else None
+    if not token_allowed(app.config['OPERATOR_TOKEN'], token):
+        return False
+    request_full_dashboard()
+
+# ==================== SOCKETIO EVENTS (Actions uniquement) ====================
+
+@socketio.on('connect')
+def handle_connect():
+    """Abonne le socket à la room de sa partie (broadcasts ciblés) et enregistre sa présence"""
+    start_worker()
+    game_id = session.get('game_id')
+    username = session.get('username')
+    if game_id is None or game_id in retired_games or not owns_game(game_id):
+        return False
+    player = presence.get(game_id, username)
+    if player is None:
+        # Connexion arrivée avant la notification du login (autre worker), ou joueur évincé
+        user = current_user()
+        if user is None:
+            return False
+        player = presence.join(game_id, username, user.room, bool(user.is_ready))
+        store.get(game_id).mark_players_changed()
+        publish_state(game_id)
+    presence.connect(request.sid, player)
+    join_room(game_channel(game_id))
+
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    presence.disconnect(request.sid)
+
+@socketio.on('heartbeat')
+def handle_heartbeat():
+    """Signe de vie périodique de la page (state_feed.js)"""
+    presence.heartbeat(request.sid)
+
+@socketio.on('sync_state')
+def handle_sync_state(data=None):
+    game_id = session.get('game_id')
+    if game_id is None:
+        return
+    limited_call('sync_state', None, game_id, session.get('username'), request.sid,
+                 sync_state, game_id, data or {}, request.sid)
+
+def sync_state(game_id, data, sid):
+    """Rattrapage: renvoie les deltas manqués depuis la version du client, ou un état complet"""
+    with app.app_context():
+        live = store.get(game_id)
+        deltas = None
+        if isinstance(data.get('version'), int):
+            deltas = live.deltas_since(data.get('epoch'), data['version'])
+        if deltas is None:
+            payload = {'snapshot': state_snapshot(game_id), 'deltas': []}
+        else:
+            payload = {'snapshot': None, 'deltas': deltas}
+        socketio.emit('state_sync', payload, to=sid, namespace='/')
+
+@socketio.on('select_room')
+def handle_select_room(data):
+    limited_call('select_room', None, session.get('game_id'), session.get('username'), request.sid,
+                 select_room, data)
+
+def select_room(data):
+    with app.app_context():
+        room_name = data['room']
+        username = session.get('username')
+        game_id = session.get('game_id')
+        user = current_user()
+        live = store.get(game_id)
+        room_status = live.get_room(room_name)
+        
+        if not user or not room_status:
+            emit('error', {'message': 'Utilisateur ou salle invalide'})
+            return
+        
+        if room_status.assigned_player and room_status.assigned_player != username:
+            emit('error', {'message': 'Salle déjà occupée par ' + room_status.assigned_player})
+            return
+        
+        if user.room and user.room != room_name:
+            old_room_status = live.get_room(user.room)
+            if old_room_status and old_room_status.assigned_player == username:
+                live.update_room(user.room, assigned_player=None)
+        
+        save_user(user, room=room_name, is_ready=False)
+        presence.update(game_id, username, room=room_name, is_ready=False)
+        live.update_room(room_name, assigned_player=username)
+        event_log.append(game_id, 'select_room', {'user': username, 'room': room_name})
+        live.mark_players_changed()
+        publish_state(game_id)
+        
+        emit('room_selected', {'room': room_name})
+
+@socketio.on('player_ready')
+def handle_player_ready():
+    limited_call('player_ready', None, session.get('game_id'), session.get('username'), request.sid,
+                 player_ready)
+
+def player_ready():
+    with app.app_context():
+        username = session.get('username')
+        game_id = session.get('game_id')
+        user = current_user()
+        
+        if not user:
+            emit('error', {'message': 'Utilisateur non trouvé'})
+            return
+        
+        if not user.room:
+            emit('error', {'message': 'Vous devez d\'abord sélectionner une salle'})
+            return
+        
+        live = store.get(game_id)
+        if not live.get_room(user.room):
+            emit('error', {'message': 'Salle invalide'})
+            return
+        
+        save_user(user, is_ready=True)
+        presence.update(game_id, username, is_ready=True)
+        live.mark_players_changed()
+        event_log.append(game_id, 'ready', {'user': username})
+        
+        game_started = live.get_info('game_started') == 'true'
+        
+        if not game_started:
+            if presence.ready_count(game_id) >= 2:
+                live.set_info('game_started', 'true')
+                
+                if not scheduler.is_scheduled(game_id):
+                    start_timer(game_id)
+        
+        publish_state(game_id)
+
+@socketio.on('action')
+def handle_action(data):
+    game_id, username = session.get('game_id'), session.get('username')
+    limited_call('action', data.get('action'), game_id, username, request.sid,
+                 run_action, game_id, session.get('room'), session_user_id(), username, data, request.sid)
+
+def authorize_action(game_id, room, user_id):
+    """Vérifie (en mémoire) que le joueur peut agir dans sa salle; retourne `(partie, message d'erreur)`"""
+    if not room:
+        return None, 'Vous devez d\'abord sélectionner une salle'
+    
+    live = store.get(game_id)
+    room_status = live.get_room(room)
+    if not room_status:
+        return None, 'Salle invalide'
+    
+    game_started = live.get_info('game_started') == 'true'
+    
+    if game_started and room_status.is_locked:
+        return None, 'Salle verrouillée.'
+    
+    user = identities.get(user_id)
+    if not user or user.game_id != game_id or user.room != room:
+        return None, 'Vous n\'êtes pas dans cette salle'
+    
+    if room_status.assigned_player != user.username:
+        return None, 'Cette salle est occupée par un autre joueur'
+    return live, None
+
+def apply_action(live, room, username, data):
+    """Applique la règle d'une action autorisée (sans la complétion); retourne son `Outcome` ou None"""
+    rule = PUZZLE_DISPATCH.get((room, data.get('action')))
+    if rule is None:
+        return None
+    outcome = rule(live, data)
+    event_log.append(live.game_id, 'action', {
+        'user': username, 'room': room, 'data': data,
+        'outcome': {'feedback': outcome.feedback, 'error': outcome.error, 'completed': outcome.completed}
+    })
+    return outcome
+
+def run_action(game_id, room, user_id, username, data, sid):
+    """Applique une action de joueur; les réponses vont au socket `sid` (appel éventuellement différé)"""
+    def reply(event, payload):
+        socketio.emit(event, payload, to=sid, namespace='/')
+    
+    with app.app_context():
+        live, error = authorize_action(game_id, room, user_id)
+        if error:
+            reply('error', {'message': error})
+            return
+        
+        outcome = apply_action(live, room, username, data)
+        if outcome is None:
+            return
+        if outcome.error:
+            reply('error', {'message': outcome.error})
+            return
+        
+        if outcome.feedback:
+            reply('feedback', {'message': outcome.feedback})
+        if outcome.completed:
+            complete_room(game_id, room, outcome.completion, sid)
+        
+        publish_state(game_id)
+
+def aggregate_messages(messages):
+    """Un seul message pour un lot: répétitions comptées, ordre d'apparition conservé"""
+    counts = {}
+    for message in messages:
+        counts[message] = counts.get(message, 0) + 1
+    return ' / '.join(m if n == 1 else f'{m} (×{n})' for m, n in counts.items())
+
+@socketio.on('actions')
+def handle_actions(data):
+    """Lot d'actions (clics rapprochés, cf. sendAction): une autorisation, un seul delta d'état
+
+    Les actions sont appliquées dans l'ordre, chacune soumise à la limite de débit
+    (un réglage `coalesce` refusé est rejoué plus tard, comme via limited_call) et
+    isolée: une action en erreur n'interrompt pas le lot, et l'état modifié est
+    toujours publié. Retourne (ack) les résultats par action; un seul 'feedback' et
+    un seul 'error' agrégés sont envoyés au joueur.
+    """
+    actions = data.get('actions') if isinstance(data, dict) else None
+    if not isinstance(actions, list) or not actions or len(actions) > MAX_ACTION_BATCH:
+        emit('error', {'message': f'Lot d\'actions invalide (1 à {MAX_ACTION_BATCH})'})
+        return
+    game_id, room, username = session.get('game_id'), session.get('room'), session.get('username')
+    user_id = session_user_id()
+    
+    with app.app_context():
+        live, error = authorize_action(game_id, room, user_id)
+        if error:
+            emit('error', {'message': error})
+            return {'results': [{'error': error}] * len(actions)}
+        
+        results = []
+        try:
+            for action in actions:
+                if not isinstance(action, dict):
+                    results.append({'error': 'Action invalide'})
+                    continue
+                kind = action.get('action')
+                refused = throttle('action', game_id, username, kind)
+                if refused is not None and refused.coalesce:
+                    rate_limiter.defer(('action', kind, request.sid), refused.retry_after,
+                                       limited_call, 'action', kind, game_id, username, request.sid,
+                                       run_action, game_id, room, user_id, username, action, request.sid)
+                    results.append({'action': kind, 'deferred': True})
+                    continue
+                if refused is not None:
+                    results.append({'action': kind, 'error': rate_limit_message(refused)})
+                    continue
+                try:
+                    outcome = apply_action(live, room, username, action)
+                    if outcome is not None and outcome.completed and not outcome.error:
+                        complete_room(game_id, room, outcome.completion, request.sid)
+                except (KeyError, TypeError, ValueError):
+                    # Données d'action mal formées (valeur non numérique...): refusée, le lot continue
+                    results.append({'action': kind, 'error': 'Action invalide'})
+                    continue
+                except Exception:
+                    app.logger.exception('Erreur action %r de %s (partie %s)', kind, username, game_id)
+                    results.append({'action': kind, 'error': 'Erreur interne'})
+                    continue
+                results.append({'action': kind,
+                                'feedback': outcome and outcome.feedback,
+                                'error': outcome and outcome.error,
+                                'completed': bool(outcome and outcome.completed)})
+        finally:
+            # Actions déjà appliquées: publiées même si le lot s'interrompt
+            publish_state(game_id)
+        
+        feedback = aggregate_messages(r['feedback'] for r in results if r.get('feedback'))
+        errors = aggregate_messages(r['error'] for r in results if r.get('error'))
+        if feedback:
+            emit('feedback', {'message': feedback})
+        if errors:
+            emit('error', {'message': errors})
+        return {'results': results, 'feedback': feedback, 'error': errors}
+
+# ==================== DÉMARRAGE ====================
+# L'import ne fait aucune E/S et ne lance aucun greenlet. Le schéma et la partie par défaut
+# sont créés une fois par `init_db` (flask --app app init-db, avant de lancer les workers);
+# l'état de chaque worker est restauré et ses tâches de fond démarrées par `start_worker`,
+# appelé par init_app_state ou au plus tard à la première requête.
+
+def recover_event_log():
+    """Relit le journal de ce worker (une seule fois, avant toute écriture)"""
+    global recovered_log
+    if recovered_log is None:
+        recovered_log = event_log.recover()
+    return recovered_log
+
+def init_db():
+    """Migration, schéma, index et partie par défaut; idempotent, sûr entre processus
+
+    Tout se fait dans une seule transaction (DDL transactionnel sous SQLite et
+    PostgreSQL): une initialisation interrompue ne laisse rien, la suivante repart de zéro.
+    """
+    recover_event_log()
+    seed = None
+    with app.app_context():
+        with persistence.schema_transaction(db.engine) as connection, Session(bind=connection) as session:
+            migrate_legacy_schema(session)
+            db.metadata.create_all(connection)
+            persistence.ensure_indexes(db.metadata, connection)
+            game = session.query(Game).filter_by(code=DEFAULT_GAME_CODE).first()
+            if game is None:
+                game = Game(code=DEFAULT_GAME_CODE)
+                session.add(game)
+                session.flush()
+                seed = seed_game(game.id, session)
+            session.flush()
+            game_id = game.id
+    if seed is not None:
+        event_log.append(game_id, 'seed', seed)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Crée ou met à jour le schéma de la BDD et la partie par défaut"""
+    init_db()
+    print('BDD prête')
+
+worker_started = False
+
+def start_worker():
+    """Restaure l'état de ce worker: journal, timers, joueurs, archivages en attente (une fois)"""
+    global worker_started
+    if worker_started:
+        return
+    worker_started = True
+    with app.app_context():
+        # Base jamais initialisée (dev, tests): init_db ici plutôt qu'une erreur
+        if not inspect(db.engine).has_table('game'):
+            init_db()
+        retired_games.update(game.id for game in Game.query.filter(Game.code.startswith(RETIRED_CODE_PREFIX)))
+    page_cache.precompile()
+    recover_live_games(*recover_event_log())
+    store.start()
+    rearm_timers()
+    track_players()
+    for retired_id in sorted(retired_games):
+        if owns_game(retired_id):
+            archiver.submit(retired_id)
+    if control_bus is not None:
+        eventlet.spawn(control_loop)
+    if app.config['OPERATOR_TOKEN']:
+        dashboard.start()
+
+@app.before_request
+def ensure_worker_started():
+    start_worker()
+
+def init_app_state(init_database=False):
+    """Point d'entrée des serveurs: restaure l'état de ce worker et retourne l'app du module
+
+    Ce n'est pas une fabrique: app, BDD, Socket.IO et état en mémoire sont des
+    singletons du module, et chaque appel retourne la même instance.
+    """
+    if init_database:
+        init_db()
+    start_worker()
+    return app
+
+if __name__ == '__main__':
+    socketio.run(init_app_state(init_database=True), port=int(os.environ.get('PORT', 5000)), debug=True)
\ No newline at end of file
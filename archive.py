@@ -0,0 +1,150 @@
+"""Archivage et purge en arrière-plan des parties retirées (générations remplacées par un reset)
+
+Un reset crée une nouvelle partie (nouvel id, même code) et retire l'ancienne:
+ses lignes sont écrites dans `<dossier>/game-<id>.ndjson.gz` (une ligne
+`{"table": ..., "row": ...}` par ligne de BDD), puis supprimées par petits lots
+avec une pause entre chaque, pour ne pas retarder les écritures des parties
+en cours. Un archivage interrompu reprend au démarrage suivant: une archive
+complète n'est jamais réécrite.
+
+Les archives sont conservées sans limite de durée: les exports `games` et
+`chat` (export.py) les relisent pour couvrir aussi les générations purgées.
+"""
+import gzip
+import json
+import os
+import re
+from collections import deque
+
+import eventlet
+from eventlet import tpool
+from eventlet.event import Event
+from sqlalchemy import select
+
+import persistence
+
+# Tables filles d'abord (ordre de purge); la ligne `game` est supprimée en dernier
+CHILD_TABLES = ('chat_message', 'user', 'game_state', 'room_status', 'game_info')
+ARCHIVE_PATTERN = re.compile(r'^game-(?P<game_id>\d+)\.ndjson\.gz$')
+
+
+def archive_path(directory, game_id):
+    return os.path.join(directory, f'game-{game_id}.ndjson.gz')
+
+
+def list_archives(directory):
+    """`[(game_id, chemin)]` des archives complètes, triées par partie"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    archives = []
+    for name in names:
+        match = ARCHIVE_PATTERN.match(name)
+        if match:
+            archives.append((int(match.group('game_id')), os.path.join(directory, name)))
+    return sorted(archives)
+
+
+def read_archive(path):
+    """`(table, ligne)` d'une archive, dans l'ordre d'écriture: `game`, puis les tables filles
+
+    Les dates y sont des chaînes (`str(datetime)`).
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            yield entry['table'], entry['row']
+
+
+class Archiver:
+    """Greenlet unique traitant les parties retirées une par une"""
+
+    def __init__(self, engine, metadata, directory, delay=5.0, batch_size=500, pause=0.05,
+                 vacuum_pages=1000):
+        self.engine = engine
+        self.tables = metadata.tables
+        self.directory = directory
+        # Laisse aux écritures en vol (chat groupé, flush d'état) le temps d'aboutir
+        self.delay = delay
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self._queue = deque()
+        self._wakeup = Event()
+        self._greenlet = None
+
+    def submit(self, game_id):
+        if game_id not in self._queue:
+            self._queue.append(game_id)
+        if self._greenlet is None:
+            self._greenlet = eventlet.spawn(self._run)
+        elif not self._wakeup.ready():
+            self._wakeup.send()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _run(self):
+        while True:
+            if not self._queue:
+                self._wakeup = Event()
+                self._wakeup.wait()
+                continue
+            game_id = self._queue[0]
+            eventlet.sleep(self.delay)
+            try:
+                self.archive(game_id)
+                self.purge(game_id)
+            except Exception as exc:
+                print(f'Erreur archivage partie {game_id}: {exc}')
+            self._queue.popleft()
+
+    def _batches(self, connection, table, column, game_id):
+        """Lignes d'une partie par lots (pagination sur l'id)"""
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                select(table).where(column == game_id, table.c.id > last_id)
+                .order_by(table.c.id).limit(self.batch_size)
+            ).mappings().all()
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]['id']
+            eventlet.sleep(self.pause)
+
+    def archive(self, game_id):
+        """Écrit l'archive compressée de la partie (sans effet si elle existe déjà)"""
+        path = archive_path(self.directory, game_id)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        game = self.tables['game']
+        sources = [(game, game.c.id)] + [(self.tables[name], self.tables[name].c.game_id)
+                                         for name in reversed(CHILD_TABLES)]
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            for table, column in sources:
+                with self.engine.connect() as connection:
+                    for rows in self._batches(connection, table, column, game_id):
+                        lines = ''.join(json.dumps({'table': table.name, 'row': dict(row)},
+                                                   default=str, ensure_ascii=False) + '\n'
+                                        for row in rows)
+                        # Compression hors du hub eventlet
+                        tpool.execute(f.write, lines)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def purge(self, game_id):
+        """Supprime les lignes de la partie par lots, puis rend l'espace libéré (SQLite)"""
+        game = self.tables['game']
+        targets = [(self.tables[name], self.tables[name].c.game_id) for name in CHILD_TABLES]
+        for table, column in targets + [(game, game.c.id)]:
+            while True:
+                ids = select(table.c.id).where(column == game_id).limit(self.batch_size)
+                with self.engine.begin() as connection:
+                    deleted = connection.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+                if deleted < self.batch_size:
+                    break
+                eventlet.sleep(self.pause)
+        persistence.incremental_vacuum(self.engine, self.vacuum_pages)
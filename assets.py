@@ -0,0 +1,190 @@
+"""Pipeline des fichiers statiques: empreintes de contenu, précompression et variantes d'images
+
+    python assets.py            # construit static/build/ et son manifest.json
+
+Chaque fichier de static/ est copié sous un nom contenant son empreinte
+(`style.3f9c1a2b4d.css`), servi sur /assets/ avec un cache immuable d'un an.
+À côté de chaque fichier peuvent exister des variantes:
+
+- `.br` / `.gz` pour les fichiers texte (brotli si le module est installé),
+  choisies selon Accept-Encoding;
+- `.webp` pour les images (Pillow, optionnel), choisie selon Accept; l'image
+  elle-même est réencodée si cela la rend plus légère.
+
+Les références `/static/<nom>` des CSS/JS sont réécrites vers les noms
+empreintés. Les requêtes Range (audio) sont gérées par send_file. Sans build,
+`asset_url` retombe sur /static/ pour que l'app reste utilisable en dev.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import abort, request, send_file, url_for
+
+BUILD_DIRNAME = 'build'
+MANIFEST_NAME = 'manifest.json'
+TEXT_EXTENSIONS = {'.css', '.js', '.html', '.svg', '.json', '.txt'}
+IMAGE_FORMATS = {'.png': 'PNG', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Variantes d'encodage par ordre de préférence
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(filename, data):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{content_hash(data)}{ext}'
+
+
+def compress_variants(data):
+    """Versions compressées `{suffixe: octets}`, seulement si elles sont plus petites"""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data)}
+
+
+def image_variants(data, ext):
+    """`(image optimisée, webp ou None)`; l'original est gardé sans Pillow ou s'il est plus léger"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, None
+    import io
+    image = Image.open(io.BytesIO(data))
+    image.load()
+
+    optimised = io.BytesIO()
+    if IMAGE_FORMATS[ext] == 'JPEG':
+        image.convert('RGB').save(optimised, 'JPEG', quality=82, optimize=True, progressive=True)
+    else:
+        image.save(optimised, 'PNG', optimize=True)
+    optimised = optimised.getvalue()
+
+    webp = io.BytesIO()
+    image.save(webp, 'WEBP', quality=80, method=6)
+    webp = webp.getvalue()
+
+    best = optimised if len(optimised) < len(data) else data
+    return best, webp if len(webp) < len(best) else None
+
+
+def rewrite_references(text, manifest):
+    """Remplace `/static/<nom>` par `/assets/<nom empreinté>` pour les fichiers connus"""
+    def replace(match):
+        name = match.group(1)
+        return f'/assets/{manifest[name]}' if name in manifest else match.group(0)
+    return re.sub(r'/static/([\w.-]+)', replace, text)
+
+
+def build(static_dir):
+    """Construit static/build/: fichiers empreintés, variantes et manifest `{nom: nom empreinté}`"""
+    out_dir = os.path.join(static_dir, BUILD_DIRNAME)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    names = sorted(n for n in os.listdir(static_dir) if os.path.isfile(os.path.join(static_dir, n)))
+    # Les fichiers binaires d'abord: les CSS/JS qui les référencent sont réécrits ensuite
+    names.sort(key=lambda n: os.path.splitext(n)[1].lower() in TEXT_EXTENSIONS)
+
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(name)[1].lower()
+        variants = {}
+        if ext in TEXT_EXTENSIONS:
+            data = rewrite_references(data.decode('utf-8'), manifest).encode('utf-8')
+            variants = compress_variants(data)
+        elif ext in IMAGE_FORMATS:
+            data, webp = image_variants(data, ext)
+            if webp:
+                variants['.webp'] = webp
+
+        target = hashed_name(name, data)
+        with open(os.path.join(out_dir, target), 'wb') as f:
+            f.write(data)
+        for suffix, body in variants.items():
+            with open(os.path.join(out_dir, target + suffix), 'wb') as f:
+                f.write(body)
+        manifest[name] = target
+
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetPipeline:
+    """Sert static/build/ sur /assets/ et fournit `asset_url` aux templates"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.files = set()
+        self.build_dir = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.build_dir = os.path.join(app.static_folder, BUILD_DIRNAME)
+        self.load()
+        app.add_url_rule('/assets/<path:filename>', 'asset', self.serve)
+        app.context_processor(lambda: {'asset_url': self.url})
+
+    def load(self):
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_NAME)) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        self.files = set(self.manifest.values())
+
+    def url(self, filename):
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('asset', filename=hashed)
+
+    def serve(self, filename):
+        if filename not in self.files:
+            abort(404)
+        path = os.path.join(self.build_dir, filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        vary = None
+
+        if os.path.splitext(filename)[1].lower() in TEXT_EXTENSIONS:
+            vary = 'Accept-Encoding'
+            for name, suffix in ENCODINGS:
+                if request.accept_encodings[name] and os.path.exists(path + suffix):
+                    path, encoding = path + suffix, name
+                    break
+        elif os.path.splitext(filename)[1].lower() in IMAGE_FORMATS:
+            vary = 'Accept'
+            if 'image/webp' in request.headers.get('Accept', '') and os.path.exists(path + '.webp'):
+                path, mimetype = path + '.webp', 'image/webp'
+
+        # conditional=True: ETag/304 et requêtes Range (206) pour l'audio
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if vary:
+            response.headers['Vary'] = vary
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        return response
+
+
+if __name__ == '__main__':
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for name, target in sorted(build(static_dir).items()):
+        print(f'{name} -> {target}')
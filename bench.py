@@ -0,0 +1,342 @@
+"""Banc de charge en processus: simule des parties complètes avec les clients de test
+
+    python bench.py --games 20 --players 4 --json resultats.json
+
+Chaque joueur scripté enchaîne /login -> select_room -> player_ready -> attente
+du déblocage de sa salle -> actions de la salle -> chat; le joueur de la salle
+Air valide le code final. En parallèle, chaque joueur interroge
+/api/poll_status (avec ETag) et /api/chat/messages au rythme des pages.
+
+Le rapport donne, par route et par événement, p50/p95/p99 (ms), le débit et le
+nombre de requêtes SQL par opération (les écritures groupées du chat et de
+l'état sont comptées en arrière-plan). La BDD et le journal d'événements sont
+temporaires (DATABASE_URL, EVENT_LOG_DIR), jamais ceux de instance/; la limitation
+de débit est désactivée par défaut.
+
+Démarrage à froid d'un worker (import, init_app_state, première requête), chaque
+mesure dans un nouveau processus:
+
+    python bench.py --startup 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import eventlet
+
+ROOM_SCRIPTS = {
+    'Energie': [
+        {'action': 'connect_cables', 'correct': False},
+        {'action': 'connect_cables', 'correct': True},
+        {'action': 'connect_cables', 'correct': True},
+    ],
+    'Eau': [
+        {'action': 'sort_waste', 'correct': True},
+        {'action': 'sort_waste', 'correct': False},
+        {'action': 'sort_waste', 'correct': True},
+        {'action': 'adjust_ph', 'value': 7.0},
+        {'action': 'adjust_o2', 'value': 8.0},
+        {'action': 'validate_chemical', 'ph': 7.0, 'o2': 8.0},
+        {'action': 'complete_water'},
+    ],
+    'Air': [
+        {'action': 'identify_pollution_source', 'correct': False},
+        {'action': 'identify_pollution_source', 'correct': True},
+    ],
+    'Flore': [
+        {'action': 'select_plant', 'plant': 'oxygen_plant'},
+        {'action': 'select_plant', 'plant': 'purifying_plant'},
+    ],
+}
+FINAL_CODE = 'EPSI WORKSHOPS 2025'
+BACKGROUND = 'arrière-plan'
+# Période des heartbeats de présence, comme state_feed.js
+HEARTBEAT_INTERVAL = 15.0
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Durées par opération et requêtes SQL attribuées au greenlet qui les exécute"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.sql = defaultdict(int)
+        self.current = {}
+
+    def on_sql(self, *args):
+        self.sql[self.current.get(eventlet.getcurrent(), BACKGROUND)] += 1
+
+    def timed(self, name, fn, *args, **kwargs):
+        greenlet = eventlet.getcurrent()
+        self.current[greenlet] = name
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.samples[name].append((time.perf_counter() - start) * 1000)
+            del self.current[greenlet]
+
+    def report(self, duration):
+        operations = {}
+        for name, values in sorted(self.samples.items()):
+            values = sorted(values)
+            operations[name] = {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50), 3),
+                'p95_ms': round(percentile(values, 95), 3),
+                'p99_ms': round(percentile(values, 99), 3),
+                'max_ms': round(values[-1], 3),
+                'sql_per_op': round(self.sql[name] / len(values), 2),
+            }
+        total = sum(len(v) for v in self.samples.values())
+        return {
+            'duration_s': round(duration, 3),
+            'operations_total': total,
+            'throughput_ops_s': round(total / duration, 1) if duration else 0.0,
+            'sql_total': sum(self.sql.values()),
+            'sql_background': self.sql[BACKGROUND],
+            'operations': operations,
+        }
+
+
+class Player:
+    def __init__(self, bench, game_code, username, room, validates):
+        self.bench = bench
+        self.game_code = game_code
+        self.username = username
+        self.room = room
+        self.validates = validates
+        self.http = bench.app.test_client()
+        self.socket = None
+        self.etag = None
+        self.status = None
+        self.last_chat_id = 0
+        self.done = False
+
+    def connect(self):
+        if self.socket is not None:
+            self.socket.disconnect()
+        self.socket = self.bench.timed('socket connect', self.bench.socketio.test_client,
+                                       self.bench.app, flask_test_client=self.http)
+
+    def emit(self, event, *args):
+        self.bench.timed(f'event {event}', self.socket.emit, event, *args)
+        self.socket.get_received()
+
+    def get(self, name, url, **kwargs):
+        return self.bench.timed(f'GET {name}', self.http.get, url, **kwargs)
+
+    def post(self, name, url, **kwargs):
+        return self.bench.timed(f'POST {name}', self.http.post, url, **kwargs)
+
+    def poll_status(self):
+        headers = {'If-None-Match': self.etag} if self.etag else {}
+        response = self.get('/api/poll_status', '/api/poll_status', headers=headers)
+        if response.status_code == 200:
+            self.etag = response.headers.get('ETag')
+            self.status = response.get_json()
+        return self.status
+
+    def poll_chat(self):
+        response = self.get('/api/chat/messages', f'/api/chat/messages?last_id={self.last_chat_id}')
+        messages = response.get_json().get('messages', [])
+        if messages:
+            self.last_chat_id = messages[-1]['id']
+
+    def pollers(self, args):
+        """Boucles de la page (état, chat et heartbeat), jusqu'à la fin du script"""
+        next_chat = next_heartbeat = 0.0
+        while not self.done:
+            self.poll_status()
+            if time.monotonic() >= next_chat:
+                self.poll_chat()
+                next_chat = time.monotonic() + args.chat_poll_interval
+            if time.monotonic() >= next_heartbeat and self.socket.is_connected():
+                self.emit('heartbeat')
+                next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+            eventlet.sleep(args.poll_interval)
+
+    def wait_for_access(self, args):
+        """'play' quand la salle est débloquée, 'final' si la partie passe au code final"""
+        deadline = time.monotonic() + args.unlock_timeout
+        while time.monotonic() < deadline:
+            status = self.poll_status()
+            if status and status.get('can_access_game'):
+                return 'play'
+            if status and any(r['name'] == 'Air' and r['is_completed'] for r in status['rooms']):
+                return 'final'
+            eventlet.sleep(args.poll_interval)
+        return None
+
+    def play(self, args):
+        response = self.post('/login', '/login', data={'username': self.username, 'game': self.game_code})
+        if response.status_code != 302:
+            raise RuntimeError(f'Login refusé pour {self.username}')
+        self.connect()
+        poller = eventlet.spawn(self.pollers, args)
+        try:
+            self.get('/lobby', '/lobby')
+            self.emit('select_room', {'room': self.room})
+            self.emit('player_ready')
+            access = self.wait_for_access(args)
+            if access is None:
+                self.bench.stalled += 1
+                return
+            if access == 'play':
+                # La page de la salle ouvre sa propre connexion Socket.IO
+                self.get('/game', '/game')
+                self.connect()
+                for data in ROOM_SCRIPTS[self.room] * args.rounds:
+                    self.emit('action', data)
+                    eventlet.sleep(args.think_time)
+            for index in range(args.chat):
+                self.post('/api/chat/send', '/api/chat/send',
+                          json={'message': f'{self.username}: message {index}'})
+                eventlet.sleep(args.think_time)
+            if self.validates:
+                self.post('/api/validate_final_code', '/api/validate_final_code', json={'code': FINAL_CODE})
+        finally:
+            self.done = True
+            poller.wait()
+            self.socket.disconnect()
+
+
+class Bench:
+    def __init__(self, args):
+        workdir = tempfile.mkdtemp()
+        os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(workdir, 'bench.db'))
+        os.environ.setdefault('EVENT_LOG_DIR', os.path.join(workdir, 'events'))
+        # Le banc mesure le serveur, pas la limitation de débit (RATE_LIMITS=... pour la tester)
+        os.environ.setdefault('RATE_LIMITS', 'off')
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from sqlalchemy import event
+        import app as game_app
+        self.app = game_app.init_app_state(init_database=True)
+        self.socketio = game_app.socketio
+        self.recorder = Recorder()
+        self.timed = self.recorder.timed
+        self.stalled = 0
+        with self.app.app_context():
+            event.listen(game_app.db.engine, 'before_cursor_execute', self.recorder.on_sql)
+        self.store = game_app.store
+        self.args = args
+
+    def run(self):
+        args = self.args
+        rooms = list(ROOM_SCRIPTS)[:args.players]
+        # La résolution de la salle Air renvoie tout le monde au code final (Flore n'est pas débloquée)
+        validator = min(len(rooms), 3) - 1
+        run_id = int(time.time())
+        players = []
+        for game_index in range(args.games):
+            code = f'bench-{run_id}-{game_index}'
+            for index, room in enumerate(rooms):
+                players.append(Player(self, code, f'joueur{index}', room, validates=index == validator))
+
+        pool = eventlet.GreenPool(len(players))
+        start = time.perf_counter()
+        for player in players:
+            pool.spawn(player.play, args)
+            eventlet.sleep(args.ramp_up / max(1, len(players)))
+        pool.waitall()
+        duration = time.perf_counter() - start
+        self.store.flush()
+
+        report = self.recorder.report(duration)
+        report['config'] = vars(args)
+        report['stalled_players'] = self.stalled
+        return report
+
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.init_app_state()
+created = time.perf_counter()
+app.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({'import': imported - start, 'init_app_state': created - imported,
+                  'first_request': served - created, 'total': served - start}))
+"""
+
+
+def startup_report(runs):
+    """Temps de démarrage à froid d'un worker, mesuré dans `runs` processus neufs"""
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, RATE_LIMITS='off')
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(workdir, 'bench.db'))
+    env.setdefault('EVENT_LOG_DIR', os.path.join(workdir, 'events'))
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Schéma créé une fois, comme avant le lancement de workers
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   cwd=here, env=env, check=True, capture_output=True)
+    phases = defaultdict(list)
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        for phase, seconds in json.loads(output.splitlines()[-1]).items():
+            phases[phase].append(seconds * 1000)
+    return {'runs': runs, 'phases': {
+        phase: {'p50_ms': round(sorted(values)[len(values) // 2], 2),
+                'max_ms': round(max(values), 2)}
+        for phase, values in phases.items()
+    }}
+
+
+def print_report(report):
+    print(f"{report['operations_total']} opérations en {report['duration_s']} s "
+          f"({report['throughput_ops_s']} op/s), {report['sql_total']} requêtes SQL "
+          f"dont {report['sql_background']} en arrière-plan, {report['stalled_players']} joueur(s) bloqué(s)")
+    print(f"{'opération':<32}{'nb':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'sql/op':>8}")
+    for name, stats in report['operations'].items():
+        print(f"{name:<32}{stats['count']:>7}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+              f"{stats['p99_ms']:>9.2f}{stats['max_ms']:>9.2f}{stats['sql_per_op']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Banc de charge (sessions de joueurs simulées)')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--players', type=int, default=4, choices=range(1, 5))
+    parser.add_argument('--rounds', type=int, default=1, help='répétitions du script de chaque salle')
+    parser.add_argument('--chat', type=int, default=3, help='messages envoyés par joueur')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--chat-poll-interval', type=float, default=2.0)
+    parser.add_argument('--think-time', type=float, default=0.05)
+    parser.add_argument('--ramp-up', type=float, default=1.0, help='durée (s) de démarrage des joueurs')
+    parser.add_argument('--unlock-timeout', type=float, default=60.0)
+    parser.add_argument('--json', help='fichier de sortie JSON (- pour la sortie standard)')
+    parser.add_argument('--startup', type=int, metavar='RUNS',
+                        help='mesure seulement le démarrage à froid d\'un worker sur RUNS processus')
+    args = parser.parse_args()
+
+    report = startup_report(args.startup) if args.startup else Bench(args).run()
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    if args.startup:
+        print(f"Démarrage à froid ({report['runs']} processus)")
+        for phase, stats in report['phases'].items():
+            print(f"{phase:<16}{stats['p50_ms']:>9.2f} ms (p50){stats['max_ms']:>9.2f} ms (max)")
+    else:
+        print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
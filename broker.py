@@ -0,0 +1,192 @@
+"""Bus pub/sub entre workers: broker TCP local, clients et gestionnaire Socket.IO
+
+Le broker est un substitut local (une machine) à Redis: chaque trame est une
+ligne JSON. Un client envoie `{"op": "sub", "channel": ...}` ou
+`{"op": "pub", "channel": ..., "data": ...}`; le broker relaie
+`{"channel": ..., "data": ...}` à tous les abonnés du canal. Une trame
+invalide est ignorée, des deux côtés, sans couper la connexion.
+
+Avec Redis, le client redis est chargé avec des sockets verts
+(`eventlet.import_patched`): l'app n'étant pas monkey-patchée, un client
+bloquant figerait tout le worker pendant l'attente des messages.
+
+    python broker.py --host 127.0.0.1 --port 5555
+"""
+import argparse
+import json
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import eventlet
+from eventlet.queue import LightQueue
+from eventlet.semaphore import Semaphore
+from socketio import PubSubManager
+
+
+def encode_frame(message):
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+
+def decode_frame(line):
+    """Trame décodée (dict avec un canal), ou None si elle est invalide: la ligne est ignorée"""
+    try:
+        message = json.loads(line)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict) or 'channel' not in message:
+        print(f'Trame invalide ignorée: {line[:200]!r}')
+        return None
+    return message
+
+
+def parse_url(url):
+    parsed = urlparse(url)
+    return parsed.hostname or '127.0.0.1', parsed.port or 5555
+
+
+# ==================== BROKER ====================
+
+class Broker:
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+
+    def serve(self, host='127.0.0.1', port=5555):
+        server = eventlet.listen((host, port))
+        print(f'Broker en écoute sur {host}:{port}')
+        while True:
+            sock, _ = server.accept()
+            eventlet.spawn_n(self._handle, sock)
+
+    def _handle(self, sock):
+        # Une file par connexion: un seul greenlet écrit sur le socket (pas de trames entrelacées)
+        outbox = LightQueue()
+        writer = eventlet.spawn(self._write, sock, outbox)
+        channels = set()
+        try:
+            for line in sock.makefile('rb'):
+                # Une trame invalide est ignorée sans couper la connexion
+                message = decode_frame(line)
+                if message is None:
+                    continue
+                if message.get('op') == 'sub':
+                    channels.add(message['channel'])
+                    self.subscribers[message['channel']].add(outbox)
+                elif message.get('op') == 'pub':
+                    frame = encode_frame({'channel': message['channel'], 'data': message.get('data')})
+                    for queue in list(self.subscribers.get(message['channel'], ())):
+                        queue.put(frame)
+        except OSError:
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers[channel].discard(outbox)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+            writer.kill()
+            sock.close()
+
+    def _write(self, sock, outbox):
+        try:
+            while True:
+                sock.sendall(outbox.get())
+        except OSError:
+            pass
+
+
+# ==================== CLIENTS ====================
+
+class BrokerClient:
+    """Client du broker local (`broker://host:port`)"""
+
+    def __init__(self, url):
+        self.address = parse_url(url)
+        self._pub_sock = None
+        self._pub_lock = Semaphore()
+
+    def publish(self, channel, data):
+        frame = encode_frame({'op': 'pub', 'channel': channel, 'data': data})
+        with self._pub_lock:
+            for attempt in range(2):
+                try:
+                    if self._pub_sock is None:
+                        self._pub_sock = eventlet.connect(self.address)
+                    self._pub_sock.sendall(frame)
+                    return
+                except OSError:
+                    self._pub_sock = None
+                    if attempt:
+                        raise
+
+    def listen(self, channels):
+        """Générateur des `(channel, data)` reçus; se reconnecte en cas de coupure"""
+        while True:
+            try:
+                sock = eventlet.connect(self.address)
+                for channel in channels:
+                    sock.sendall(encode_frame({'op': 'sub', 'channel': channel}))
+                for line in sock.makefile('rb'):
+                    # Une trame invalide ne doit pas arrêter la réception des autres
+                    message = decode_frame(line)
+                    if message is not None:
+                        yield message['channel'], message.get('data')
+            except OSError:
+                pass
+            eventlet.sleep(1)
+
+
+class RedisBus:
+    """Même interface que BrokerClient, adossée à Redis (dépendance optionnelle)"""
+
+    def __init__(self, url):
+        redis = eventlet.import_patched('redis')
+        self.redis = redis.Redis.from_url(url)
+
+    def publish(self, channel, data):
+        self.redis.publish(channel, json.dumps(data))
+
+    def listen(self, channels):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*channels)
+        for message in pubsub.listen():
+            try:
+                data = json.loads(message['data'])
+            except ValueError:
+                print(f'Message invalide ignoré: {message["data"][:200]!r}')
+                continue
+            yield message['channel'].decode(), data
+
+
+def create_bus(url):
+    """Bus de contrôle entre workers correspondant à l'URL de file de messages"""
+    if url.startswith('broker://'):
+        return BrokerClient(url)
+    if url.startswith(('redis://', 'rediss://')):
+        return RedisBus(url)
+    raise ValueError(f'File de messages non supportée: {url}')
+
+
+class BusManager(PubSubManager):
+    """Gestionnaire Socket.IO multi-processus passant par le bus (broker local ou Redis)
+
+    Remplace le RedisManager de python-socketio, qui exige un hub monkey-patché.
+    """
+    name = 'bus'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.client = create_bus(url)
+
+    def _publish(self, data):
+        self.client.publish(self.channel, data)
+
+    def _listen(self):
+        for _, data in self.client.listen([self.channel]):
+            yield data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Broker pub/sub local pour les workers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    args = parser.parse_args()
+    Broker().serve(args.host, args.port)
@@ -0,0 +1,132 @@
+"""Tampon circulaire des derniers messages de chat de chaque partie, et écriture groupée"""
+from collections import deque
+import time
+
+import eventlet
+from eventlet.event import Event
+from eventlet.queue import LightQueue, Empty
+
+
+class ChatBuffer:
+    """Derniers messages d'une partie (dicts triés par id) et réveil des long-polls"""
+
+    def __init__(self, messages, size, complete):
+        self.messages = deque(messages, maxlen=size)
+        # `complete`: le tampon contient tout l'historique de la partie
+        self.complete = complete
+        self._event = Event()
+
+    def append(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.complete = False
+        self.messages.append(message)
+        self.wake()
+
+    def wake(self):
+        event, self._event = self._event, Event()
+        event.send()
+
+    def read_since(self, last_id):
+        """Retourne `(messages, couvert)`; `couvert` est faux si des messages
+        plus anciens que le tampon peuvent manquer (lecture en BDD nécessaire)"""
+        if not self.messages:
+            return [], self.complete
+        covered = self.complete or last_id >= self.messages[0]['id']
+        if last_id >= self.messages[-1]['id']:
+            return [], True
+        return [m for m in self.messages if m['id'] > last_id], covered
+
+    @property
+    def oldest_id(self):
+        return self.messages[0]['id'] if self.messages else None
+
+    def wait(self, timeout):
+        """Bloque le greenlet jusqu'au prochain message ou l'expiration du délai"""
+        with eventlet.Timeout(timeout, False):
+            self._event.wait()
+
+
+class ChatHub:
+    """Tampons par partie; `loader(game_id, limit)` lit les derniers messages en BDD"""
+
+    def __init__(self, loader, size=200):
+        self.loader = loader
+        self.size = size
+        self.buffers = {}
+
+    def peek(self, game_id):
+        """Tampon de la partie s'il est déjà chargé (sans accès BDD)"""
+        return self.buffers.get(game_id)
+
+    def get(self, game_id):
+        buffer = self.buffers.get(game_id)
+        if buffer is None:
+            messages = self.loader(game_id, self.size + 1)
+            complete = len(messages) <= self.size
+            buffer = ChatBuffer(messages[-self.size:], self.size, complete)
+            self.buffers[game_id] = buffer
+        return buffer
+
+    def evict(self, game_id):
+        buffer = self.buffers.pop(game_id, None)
+        if buffer is not None:
+            buffer.wake()
+
+
+class ChatWriter:
+    """Greenlet d'écriture groupée (group commit) des messages de chat
+
+    Les demandes arrivant dans une fenêtre de `window` secondes sont insérées
+    en une seule transaction par `inserter(batch)`, qui reçoit une liste de
+    `(game_id, entries)` et retourne, dans le même ordre, les messages créés.
+    `on_committed(game_id, messages)` est appelé ensuite dans l'ordre de la
+    file, ce qui conserve l'ordre des messages de chaque partie.
+    """
+
+    def __init__(self, inserter, on_committed, window=0.005, max_batch=500):
+        self.inserter = inserter
+        self.on_committed = on_committed
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = LightQueue()
+        self._greenlet = None
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = eventlet.spawn(self._run)
+
+    def submit(self, game_id, entries):
+        """Met en file des messages `(username, texte)` et attend leur commit; retourne leurs dicts"""
+        self.start()
+        done = Event()
+        self.queue.put((game_id, entries, done))
+        return done.wait()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.inserter([(game_id, entries) for game_id, entries, _ in batch])
+            except Exception as exc:
+                for _, _, done in batch:
+                    done.send_exception(exc)
+                continue
+            for (game_id, _, done), messages in zip(batch, results):
+                try:
+                    self.on_committed(game_id, messages)
+                except Exception as exc:
+                    print(f'Erreur diffusion chat: {exc}')
+                done.send(messages)
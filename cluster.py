@@ -0,0 +1,67 @@
+"""Lance en local un broker et N workers (un port par worker)
+
+    python cluster.py --workers 4 --port 5000
+
+Les workers écoutent sur les ports 5000..5000+N-1 et partagent la BDD et le
+broker (broker://127.0.0.1:5555). Un balanceur doit router de façon collante
+sur le cookie `game_worker` posé au login, par exemple avec nginx:
+
+    map $cookie_game_worker $game_backend {
+        default 127.0.0.1:5000;
+        1       127.0.0.1:5001;
+        ...
+    }
+    location / {
+        proxy_pass http://$game_backend;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+    }
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+WORKER_COMMAND = 'from app import init_app_state, socketio; socketio.run(init_app_state(), host={host!r}, port={port})'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Broker + workers en local')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--broker-port', type=int, default=5555)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Fichiers statiques, schéma et migrations préparés une seule fois, avant de lancer les workers
+    subprocess.run([sys.executable, 'assets.py'], cwd=here, check=True)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=here, check=True)
+
+    processes = [subprocess.Popen(
+        [sys.executable, 'broker.py', '--host', '127.0.0.1', '--port', str(args.broker_port)],
+        cwd=here
+    )]
+    for index in range(args.workers):
+        env = dict(os.environ,
+                   MESSAGE_QUEUE=f'broker://127.0.0.1:{args.broker_port}',
+                   WORKER_COUNT=str(args.workers),
+                   WORKER_INDEX=str(index))
+        port = args.port + index
+        command = WORKER_COMMAND.format(host=args.host, port=port)
+        processes.append(subprocess.Popen([sys.executable, '-c', command], cwd=here, env=env))
+        print(f'Worker {index} sur {args.host}:{port}')
+
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Tableau de bord des animateurs: résumé de toutes les parties, poussé à cadence fixe
+
+Chaque changement publié (publish_state) marque sa partie en O(1); toutes les
+`interval` secondes, un greenlet résume les seules parties marquées et les
+envoie en un message groupé. Le coût par période dépend du nombre de parties
+modifiées, pas du nombre d'actions par seconde qu'elles reçoivent.
+"""
+import time
+
+import eventlet
+
+
+class DashboardAggregator:
+    """Parties modifiées depuis le dernier envoi, résumées par `summarize` et envoyées par `send`
+
+    `summarize(game_ids)` retourne `{game_id: résumé}`, avec None pour une partie
+    disparue (reset); `send(payload)` diffuse `{'games', 'removed', 'sent_at'}`.
+    """
+
+    def __init__(self, summarize, send, interval=0.5):
+        self.summarize = summarize
+        self.send = send
+        self.interval = interval
+        self._dirty = set()
+        self._greenlet = None
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = eventlet.spawn(self._run)
+
+    def mark(self, game_id):
+        # Sans effet tant que le tableau de bord n'est pas démarré (désactivé)
+        if self._greenlet is not None:
+            self._dirty.add(game_id)
+
+    def mark_all(self, game_ids):
+        """Renvoi complet au prochain envoi (connexion d'un animateur)"""
+        if self._greenlet is not None:
+            self._dirty.update(game_ids)
+
+    def __len__(self):
+        return len(self._dirty)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            # Cadence fixe; après un retard (hub bloqué), repart de maintenant sans rattrapage
+            now = time.monotonic()
+            next_tick = max(next_tick + self.interval, now)
+            eventlet.sleep(next_tick - now)
+            if not self._dirty:
+                continue
+            game_ids, self._dirty = sorted(self._dirty), set()
+            try:
+                summaries = self.summarize(game_ids)
+                self.send({
+                    'games': [summary for summary in summaries.values() if summary is not None],
+                    'removed': [game_id for game_id, summary in summaries.items() if summary is None],
+                    'sent_at': time.time()
+                })
+            except Exception as exc:
+                print(f'Erreur tableau de bord: {exc}')
@@ -0,0 +1,252 @@
+"""Journal d'événements des parties: ajout seul, fsync groupé, snapshots, relecture
+
+Chaque worker écrit ses propres segments `<préfixe>-<premier seq>.log`, une
+ligne JSON compacte par événement: `[seq, timestamp, game_id, type, données]`.
+Les événements `seed` (état complet d'une partie créée ou réinitialisée) et
+`state` (valeurs absolues des clés modifiées) suffisent à reconstruire l'état;
+les autres (`action`, `chat`, `select_room`...) gardent l'historique.
+
+Périodiquement, l'état de toutes les parties en mémoire est écrit dans
+`<préfixe>-snapshot-<seq>.json` et un nouveau segment commence: au démarrage,
+seuls le dernier snapshot et les segments suivants sont relus. Les anciens
+segments sont conservés pour l'historique.
+
+    python event_log.py replay 3 --dir instance/events
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+import eventlet
+from eventlet import tpool
+from eventlet.queue import LightQueue, Empty
+
+SEGMENT_PATTERN = re.compile(r'^(?P<prefix>.+)-(?P<seq>\d{12})\.log$')
+SNAPSHOT_PATTERN = re.compile(r'^(?P<prefix>.+)-snapshot-(?P<seq>\d{12})\.json$')
+
+
+def encode_event(seq, game_id, kind, data):
+    return json.dumps([seq, round(time.time(), 3), game_id, kind, data],
+                      separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def read_segment(path):
+    """Événements d'un segment; une dernière ligne tronquée (crash) est ignorée"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def list_files(directory, pattern, prefix=None):
+    """`[(seq, chemin)]` triés, pour un préfixe de worker ou tous"""
+    files = []
+    for path in glob.glob(os.path.join(directory, '*')):
+        match = pattern.match(os.path.basename(path))
+        if match and (prefix is None or match.group('prefix') == prefix):
+            files.append((int(match.group('seq')), path))
+    return sorted(files)
+
+
+def apply_event(game, kind, data):
+    """Applique un événement d'état à `{'states', 'rooms', 'info'}`; retourne l'état"""
+    if kind == 'seed':
+        return {'states': dict(data['states']), 'rooms': dict(data['rooms']), 'info': dict(data['info'])}
+    if kind == 'state':
+        game = game or {'states': {}, 'rooms': {}, 'info': {}}
+        for part in ('states', 'rooms', 'info'):
+            game[part].update(data.get(part, {}))
+    return game
+
+
+class EventLog:
+    """Écrivain du journal d'un worker (greenlet dédié, fsync par lot dans un thread)
+
+    `snapshotter()` retourne `{game_id: {'states', 'rooms', 'info'}}` pour les
+    parties en mémoire; il est appelé toutes les `snapshot_interval` secondes.
+    """
+
+    def __init__(self, directory, prefix, snapshotter=None, fsync_interval=0.05,
+                 snapshot_interval=300.0, max_batch=1000):
+        self.directory = directory
+        self.prefix = prefix
+        self.snapshotter = snapshotter
+        self.fsync_interval = fsync_interval
+        self.snapshot_interval = snapshot_interval
+        self.max_batch = max_batch
+        self.seq = 0
+        self.synced_seq = 0
+        self.queue = LightQueue()
+        self._file = None
+        self._greenlet = None
+        self._next_snapshot = time.monotonic() + snapshot_interval
+
+    def recover(self):
+        """`(snapshot, événements postérieurs)` de ce worker; fixe le prochain numéro"""
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = {'seq': 0, 'games': {}}
+        snapshots = list_files(self.directory, SNAPSHOT_PATTERN, self.prefix)
+        if snapshots:
+            with open(snapshots[-1][1], encoding='utf-8') as f:
+                snapshot = json.load(f)
+            snapshot['games'] = {int(gid): game for gid, game in snapshot['games'].items()}
+        events = []
+        for first_seq, path in list_files(self.directory, SEGMENT_PATTERN, self.prefix):
+            for event in read_segment(path):
+                self.seq = max(self.seq, event[0])
+                if event[0] > snapshot['seq']:
+                    events.append(event)
+        self.seq = max(self.seq, snapshot['seq'])
+        return snapshot, events
+
+    def start(self):
+        if self._greenlet is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._open_segment()
+            self._greenlet = eventlet.spawn(self._run)
+
+    def append(self, game_id, kind, data):
+        """Ajoute un événement (non bloquant); il est durable au prochain fsync"""
+        self.start()
+        self.seq += 1
+        self.queue.put(encode_event(self.seq, game_id, kind, data))
+        return self.seq
+
+    def sync(self):
+        """Attend que les événements déjà ajoutés soient écrits et fsyncés
+
+        Appelé avant de valider un flush de la BDD: celle-ci ne doit jamais être
+        en avance sur le journal, sinon la relecture après un crash y réécrirait
+        des valeurs plus anciennes. Lève l'erreur d'écriture éventuelle.
+        """
+        if self._greenlet is None or self.seq <= self.synced_seq:
+            return
+        done = eventlet.Event()
+        self.queue.put(('sync', self.seq, done))
+        done.wait()
+
+    def close(self):
+        if self._greenlet is not None:
+            self._greenlet.kill()
+            self._greenlet = None
+        lines, waiters = [], []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            if isinstance(item, str):
+                lines.append(item)
+            elif item[0] == 'sync':
+                waiters.append(item[2])
+        if self._file is not None:
+            self._write(lines)
+            self._file.close()
+            self._file = None
+        for done in waiters:
+            done.send()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f'{self.prefix}-{self.seq + 1:012d}.log')
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _write(self, lines):
+        if lines:
+            self._file.write(''.join(lines))
+        self._file.flush()
+        # fsync dans un thread: ne bloque pas le hub eventlet
+        tpool.execute(os.fsync, self._file.fileno())
+
+    def _collect(self, timeout):
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except Empty:
+            return []
+        deadline = time.monotonic() + self.fsync_interval
+        while len(batch) < self.max_batch and not isinstance(batch[-1], tuple):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            timeout = max(0.0, self._next_snapshot - time.monotonic()) if self.snapshotter else None
+            batch = self._collect(timeout)
+            marker = batch.pop() if batch and isinstance(batch[-1], tuple) else None
+            try:
+                if batch or marker:
+                    self._write(batch)
+                if marker and marker[0] == 'snapshot':
+                    self._write_snapshot(*marker[1:])
+            except Exception as exc:
+                print(f'Erreur journal d\'événements: {exc}')
+                if marker and marker[0] == 'sync':
+                    marker[2].send_exception(exc)
+                continue
+            if marker and marker[0] == 'sync':
+                self.synced_seq = max(self.synced_seq, marker[1])
+                marker[2].send()
+            try:
+                if self.snapshotter and time.monotonic() >= self._next_snapshot:
+                    self._next_snapshot = time.monotonic() + self.snapshot_interval
+                    # Marqueur en file: tous les événements <= seq sont écrits avant le snapshot
+                    self.queue.put(('snapshot', self.seq, self.snapshotter()))
+            except Exception as exc:
+                print(f'Erreur journal d\'événements: {exc}')
+
+    def _write_snapshot(self, seq, games):
+        path = os.path.join(self.directory, f'{self.prefix}-snapshot-{seq:012d}.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'seq': seq, 'ts': round(time.time(), 3), 'games': games}, f, separators=(',', ':'))
+            f.flush()
+            tpool.execute(os.fsync, f.fileno())
+        os.replace(path + '.tmp', path)
+        self._file.close()
+        self._open_segment()
+
+
+def game_events(directory, game_id):
+    """Tous les événements d'une partie, tous workers confondus, dans l'ordre chronologique"""
+    events = []
+    for _, path in list_files(directory, SEGMENT_PATTERN):
+        events.extend(e for e in read_segment(path) if e[2] == game_id)
+    events.sort(key=lambda e: (e[1], e[0]))
+    return events
+
+
+def replay(directory, game_id):
+    """Rejoue hors ligne une partie: génère `(événement, état après l'événement)`"""
+    game = None
+    for event in game_events(directory, game_id):
+        game = apply_event(game, event[3], event[4])
+        yield event, game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relecture du journal d'événements")
+    sub = parser.add_subparsers(dest='command', required=True)
+    replay_parser = sub.add_parser('replay', help="affiche la chronologie d'une partie")
+    replay_parser.add_argument('game_id', type=int)
+    replay_parser.add_argument('--dir', default=os.path.join('instance', 'events'))
+    args = parser.parse_args()
+
+    game = None
+    for (seq, ts, _, kind, data), game in replay(args.dir, args.game_id):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+        print(f'{stamp} #{seq} {kind} {json.dumps(data, ensure_ascii=False)}')
+    if game is not None:
+        print('État final:', json.dumps(game, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Exports en flux (NDJSON ou CSV) des parties, du chat et de l'historique des actions
+
+Jeux de données:
+
+- `games`: une ligne par partie (code, création, démarrage, résultat...)
+- `chat`: messages des joueurs
+- `actions`: actions des joueurs et leur résultat (journal d'événements)
+- `gauges`: valeurs successives des jauges, pour tracer les courbes (journal)
+- `events`: journal brut
+
+Les lectures BDD passent par des curseurs serveur (`yield_per`) et le journal
+est lu ligne à ligne: la mémoire reste constante quel que soit le volume.
+
+`games` et `chat` couvrent aussi les générations retirées par un reset, dont
+les lignes ne sont plus en BDD: elles sont relues dans les archives
+(archive.py) et fusionnées, dans l'ordre des ids, avec celles de la BDD. Le
+code d'une génération retirée est `#<id>`.
+
+    python export.py actions --format csv --game 3 --since 2026-10-01 > actions.csv
+"""
+import argparse
+import csv
+import heapq
+import io
+import itertools
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from archive import list_archives, read_archive
+from event_log import SEGMENT_PATTERN, list_files, read_segment
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+GAME_INFO_COLUMNS = ['game_started', 'game_end_time', 'game_result', 'code_validator']
+COLUMNS = {
+    'games': ['game_id', 'code', 'created_at'] + GAME_INFO_COLUMNS,
+    'chat': ['game_id', 'id', 'timestamp', 'username', 'message'],
+    'actions': ['timestamp', 'game_id', 'seq', 'user', 'room', 'action', 'correct', 'value',
+                'feedback', 'error', 'completed', 'payload'],
+    'gauges': ['timestamp', 'game_id', 'seq', 'key', 'value'],
+    'events': ['timestamp', 'game_id', 'seq', 'kind', 'data'],
+}
+YIELD_PER = 1000
+
+
+def parse_datetime(value):
+    """Date ou date-heure ISO, ramenée en UTC naïf (comme la BDD et le journal), ou None
+
+    Sans décalage, la valeur est prise comme de l'UTC.
+    """
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def parse_game_ids(values):
+    """Ids de partie (entiers positifs); ValueError au premier id invalide"""
+    game_ids = []
+    for value in values:
+        if not value.isdecimal():
+            raise ValueError(f'Id de partie invalide: {value!r}')
+        game_ids.append(int(value))
+    return game_ids
+
+
+def event_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
+def archived_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def merge_unique(archived, live, key):
+    """Fusionne deux flux triés sur `key`, l'archive d'abord
+
+    Pendant la purge d'une génération, ses lignes sont à la fois archivées et
+    encore en BDD: elles ne sont émises qu'une fois.
+    """
+    last = None
+    for row in heapq.merge(archived, live, key=key):
+        if key(row) != last:
+            last = key(row)
+            yield row
+
+
+class Filters:
+    def __init__(self, game_ids=None, since=None, until=None):
+        self.game_ids = set(game_ids) if game_ids else None
+        self.since = since
+        self.until = until
+
+    def apply(self, query, game_column, time_column):
+        if self.game_ids is not None:
+            query = query.where(game_column.in_(self.game_ids))
+        if self.since is not None:
+            query = query.where(time_column >= self.since)
+        if self.until is not None:
+            query = query.where(time_column < self.until)
+        return query
+
+    def accepts(self, game_id, moment):
+        # Date absente: exclue dès qu'une borne est donnée, comme en SQL
+        return ((self.game_ids is None or game_id in self.game_ids)
+                and (self.since is None or (moment is not None and moment >= self.since))
+                and (self.until is None or (moment is not None and moment < self.until)))
+
+
+class Exporter:
+    """Générateurs de lignes (dicts) par jeu de données; `session` est une session SQLAlchemy"""
+
+    def __init__(self, session, metadata, event_dir, archive_dir=None):
+        self.session = session
+        self.tables = metadata.tables
+        self.event_dir = event_dir
+        self.archive_dir = archive_dir
+
+    def rows(self, dataset, filters):
+        return getattr(self, f'_{dataset}')(filters)
+
+    def _stream(self, query):
+        return self.session.execute(query.execution_options(yield_per=YIELD_PER))
+
+    def _archives(self, filters):
+        """Archives des générations purgées retenues par le filtre de parties"""
+        if not self.archive_dir:
+            return []
+        return [(game_id, path) for game_id, path in list_archives(self.archive_dir)
+                if filters.game_ids is None or game_id in filters.game_ids]
+
+    @staticmethod
+    def _game_row(game_id, code, created_at, values):
+        return dict({'game_id': game_id, 'code': code, 'created_at': created_at},
+                    **{key: values.get(key) for key in GAME_INFO_COLUMNS})
+
+    def _games(self, filters):
+        return merge_unique(self._archived_games(filters), self._live_games(filters),
+                            key=lambda row: row['game_id'])
+
+    def _live_games(self, filters):
+        game, info = self.tables['game'], self.tables['game_info']
+        query = filters.apply(
+            select(game.c.id, game.c.code, game.c.created_at, info.c.key, info.c.value)
+            .outerjoin(info, info.c.game_id == game.c.id)
+            .order_by(game.c.id),
+            game.c.id, game.c.created_at)
+        # Lignes triées par partie: regroupement sans tout charger
+        for game_id, rows in itertools.groupby(self._stream(query), key=lambda r: r.id):
+            rows = list(rows)
+            values = {r.key: r.value for r in rows if r.key in GAME_INFO_COLUMNS}
+            yield self._game_row(game_id, rows[0].code, rows[0].created_at, values)
+
+    def _archived_games(self, filters):
+        for game_id, path in self._archives(filters):
+            game, values = None, {}
+            # `game` puis `game_info` en tête d'archive: inutile de lire le reste
+            for table, row in read_archive(path):
+                if table == 'game':
+                    game = row
+                elif table == 'game_info':
+                    values[row['key']] = row['value']
+                else:
+                    break
+            created_at = archived_time(game and game['created_at'])
+            if game is not None and filters.accepts(game_id, created_at):
+                yield self._game_row(game_id, game['code'], created_at, values)
+
+    def _chat(self, filters):
+        return merge_unique(self._archived_chat(filters), self._live_chat(filters),
+                            key=lambda row: (row['game_id'], row['id']))
+
+    def _live_chat(self, filters):
+        chat = self.tables['chat_message']
+        query = filters.apply(
+            select(chat.c.game_id, chat.c.id, chat.c.timestamp, chat.c.username, chat.c.message)
+            .order_by(chat.c.game_id, chat.c.id),
+            chat.c.game_id, chat.c.timestamp)
+        for row in self._stream(query):
+            yield dict(row._mapping)
+
+    def _archived_chat(self, filters):
+        for game_id, path in self._archives(filters):
+            for table, row in read_archive(path):
+                if table != 'chat_message':
+                    continue
+                moment = archived_time(row['timestamp'])
+                if filters.accepts(game_id, moment):
+                    yield {'game_id': game_id, 'id': row['id'], 'timestamp': moment,
+                           'username': row['username'], 'message': row['message']}
+
+    def _log(self, filters, kinds=None):
+        for _, path in list_files(self.event_dir, SEGMENT_PATTERN):
+            for seq, ts, game_id, kind, data in read_segment(path):
+                if (kinds is None or kind in kinds) and filters.accepts(game_id, event_time(ts)):
+                    yield event_time(ts), game_id, seq, kind, data
+
+    def _actions(self, filters):
+        for moment, game_id, seq, _, event in self._log(filters, {'action'}):
+            data = event.get('data') or {}
+            outcome = event.get('outcome') or {}
+            yield {
+                'timestamp': moment, 'game_id': game_id, 'seq': seq,
+                'user': event.get('user'), 'room': event.get('room'),
+                'action': data.get('action'), 'correct': data.get('correct'), 'value': data.get('value'),
+                'feedback': outcome.get('feedback'), 'error': outcome.get('error'),
+                'completed': outcome.get('completed'),
+                'payload': json.dumps(data, ensure_ascii=False),
+            }
+
+    def _gauges(self, filters):
+        for moment, game_id, seq, _, data in self._log(filters, {'seed', 'state'}):
+            for key, value in data.get('states', {}).items():
+                yield {'timestamp': moment, 'game_id': game_id, 'seq': seq, 'key': key, 'value': value}
+
+    def _events(self, filters):
+        for moment, game_id, seq, kind, data in self._log(filters):
+            yield {'timestamp': moment, 'game_id': game_id, 'seq': seq, 'kind': kind,
+                   'data': json.dumps(data, ensure_ascii=False)}
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_ndjson(rows):
+    for row in rows:
+        yield json.dumps({k: _plain(v) for k, v in row.items()}, ensure_ascii=False) + '\n'
+
+
+def encode_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(['' if row.get(c) is None else _plain(row.get(c)) for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode(dataset, fmt, rows):
+    """Morceaux de texte du flux dans le format demandé"""
+    if fmt == 'csv':
+        return encode_csv(rows, COLUMNS[dataset])
+    return encode_ndjson(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export en flux des parties, du chat et des actions')
+    parser.add_argument('dataset', choices=sorted(COLUMNS))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson')
+    parser.add_argument('--game', type=int, action='append', help='id de partie (répétable)')
+    parser.add_argument('--since', type=parse_datetime, help='date ISO (UTC) incluse')
+    parser.add_argument('--until', type=parse_datetime, help='date ISO (UTC) exclue')
+    parser.add_argument('--output', help='fichier de sortie (sortie standard par défaut)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db
+    filters = Filters(args.game, args.since, args.until)
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        with app.app_context():
+            exporter = Exporter(db.session, db.metadata, app.config['EVENT_LOG_DIR'], app.config['ARCHIVE_DIR'])
+            for chunk in encode(args.dataset, args.format, exporter.rows(args.dataset, filters)):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Identité des joueurs: cache mémoire des lignes User, indexé par id (porté par la session)
+
+Les handlers n'interrogent plus la table User à chaque requête: `get(user_id)`
+sert l'entrée en cache, rechargée par `load(user_id)` au premier accès ou une
+fois passée sa durée de vie `ttl`. Les écritures d'une partie se font sur son
+worker, qui reporte chaque modification validée (`update`) ou oublie les
+entrées concernées (`invalidate_game`); la durée de vie borne l'écart avec la
+BDD pour le reste (joueur créé ou supprimé ailleurs).
+"""
+from collections import OrderedDict
+import time
+
+
+class Identity:
+    __slots__ = ('user_id', 'game_id', 'username', 'room', 'is_ready', 'expires')
+
+    def __init__(self, user_id, game_id, username, room=None, is_ready=False):
+        self.user_id = user_id
+        self.game_id = game_id
+        self.username = username
+        self.room = room
+        self.is_ready = is_ready
+        self.expires = 0.0
+
+
+class IdentityCache:
+    """LRU borné à `max_size` entrées, chacune valable `ttl` secondes"""
+
+    def __init__(self, load, max_size=4096, ttl=300.0, clock=time.monotonic):
+        self.load = load
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()   # {user_id: Identity}, du moins au plus récemment utilisé
+
+    def get(self, user_id):
+        """Identité du joueur, ou None s'il n'existe pas (les absences ne sont pas mises en cache)"""
+        if user_id is None:
+            return None
+        identity = self._entries.get(user_id)
+        if identity is not None and identity.expires > self.clock():
+            self._entries.move_to_end(user_id)
+            return identity
+        identity = self.load(user_id)
+        if identity is None:
+            self._entries.pop(user_id, None)
+            return None
+        return self.put(identity)
+
+    def put(self, identity):
+        identity.expires = self.clock() + self.ttl
+        self._entries[identity.user_id] = identity
+        self._entries.move_to_end(identity.user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return identity
+
+    def update(self, user_id, **fields):
+        """Reporte une écriture validée en BDD (salle, état prêt) sur l'entrée en cache"""
+        identity = self._entries.get(user_id)
+        if identity is not None:
+            for field, value in fields.items():
+                setattr(identity, field, value)
+        return identity
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def invalidate_game(self, game_id, username=None):
+        """Oublie les joueurs d'une partie, ou l'un d'eux (parcours complet: resets et évictions)"""
+        stale = [user_id for user_id, identity in self._entries.items()
+                 if identity.game_id == game_id and username in (None, identity.username)]
+        for user_id in stale:
+            del self._entries[user_id]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,200 @@
+"""Métriques au format texte Prometheus: latences HTTP/Socket.IO, requêtes SQL, jauges
+
+Les mesures sont faites en mémoire, par worker, avec un coût de quelques
+recherches de dict par requête. Les requêtes SQL sont attribuées à la requête
+HTTP ou à l'événement Socket.IO du greenlet qui les exécute.
+"""
+from bisect import bisect_left
+import time
+
+import eventlet
+from flask import request
+from flask_socketio import SocketIO
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # labels -> [compteurs par seau (+Inf en dernier), somme]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        names = self.labels + ('le',)
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield self.name + '_bucket' + _labels(names, labels + (bound,)), cumulative
+            yield self.name + '_sum' + _labels(self.labels, labels), total
+            yield self.name + '_count' + _labels(self.labels, labels), cumulative
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}  # labels -> total
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, total in sorted(self.series.items()):
+            yield self.name + _labels(self.labels, labels), total
+
+
+class Gauge:
+    """Jauge calculée à la lecture par `fn()`"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def samples(self):
+        yield self.name, self.fn()
+
+
+class SampledGauge(Gauge):
+    """Jauge coûteuse à calculer: `fn()` est réévalué au plus une fois toutes les `interval` secondes"""
+
+    def __init__(self, name, help, fn, interval=60.0, clock=time.monotonic):
+        super().__init__(name, help, fn)
+        self.interval = interval
+        self.clock = clock
+        self._value = None
+        self._expires = float('-inf')
+
+    def samples(self):
+        now = self.clock()
+        if now >= self._expires:
+            self._value = self.fn()
+            self._expires = now + self.interval
+        yield self.name, self._value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, value in metric.samples():
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+http_latency = registry.add(Histogram(
+    'http_request_duration_seconds', 'Durée des requêtes HTTP', ('route', 'method', 'status')))
+event_latency = registry.add(Histogram(
+    'socketio_event_duration_seconds', 'Durée des handlers Socket.IO', ('event',)))
+sql_per_operation = registry.add(Histogram(
+    'sql_statements_per_operation', 'Requêtes SQL par requête HTTP ou événement Socket.IO',
+    ('kind', 'name'), COUNT_BUCKETS))
+sql_latency = registry.add(Histogram(
+    'sql_statement_duration_seconds', 'Durée des requêtes SQL', ('origin',), SQL_BUCKETS))
+
+# Opération en cours par greenlet: [kind, name, nb de requêtes SQL]
+_scopes = {}
+
+
+def begin_scope(kind, name):
+    _scopes[eventlet.getcurrent()] = [kind, name, 0]
+
+
+def end_scope():
+    scope = _scopes.pop(eventlet.getcurrent(), None)
+    if scope is not None:
+        sql_per_operation.observe((scope[0], scope[1]), scope[2])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_start'].pop()
+    scope = _scopes.get(eventlet.getcurrent())
+    if scope is not None:
+        scope[2] += 1
+    sql_latency.observe(('request' if scope else 'background',), elapsed)
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def instrument_app(app):
+    """Mesure toutes les routes; à appeler avant les autres `before_request`"""
+
+    @app.before_request
+    def _start_request_timer():
+        request.metrics_start = time.perf_counter()
+        begin_scope('http', request.url_rule.rule if request.url_rule else 'inconnue')
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(request, 'metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'inconnue'
+            http_latency.observe((route, request.method, response.status_code), time.perf_counter() - start)
+            end_scope()
+        return response
+
+    @app.teardown_request
+    def _drop_request_scope(exc):
+        # Requête interrompue par une exception (after_request non appelé); les
+        # événements Socket.IO passent aussi ici et gardent leur propre scope
+        scope = _scopes.get(eventlet.getcurrent())
+        if scope is not None and scope[0] == 'http':
+            del _scopes[eventlet.getcurrent()]
+
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO dont chaque handler d'événement est chronométré"""
+
+    def _handle_event(self, handler, message, namespace, sid, *args):
+        begin_scope('socketio', message)
+        start = time.perf_counter()
+        try:
+            return super()._handle_event(handler, message, namespace, sid, *args)
+        finally:
+            event_latency.observe((message,), time.perf_counter() - start)
+            end_scope()
@@ -0,0 +1,168 @@
+"""Couche de persistance: options du moteur, réglages SQLite, index et copie vers une autre BDD
+
+Le moteur est choisi par DATABASE_URL (SQLite par défaut, instance/database.db).
+Pour SQLite, chaque connexion passe en WAL (les lectures du polling ne bloquent
+plus les écritures) avec un busy_timeout. Le pool ne fait jamais attendre:
+le hub eventlet n'étant pas monkey-patché, une attente de connexion bloquerait
+tout le worker; les connexions au-delà de `pool_size` sont fermées au retour.
+
+Passage à une BDD serveur: la source doit être au schéma courant (`init-db`
+applique les migrations), puis le schéma de la cible est créé et les lignes
+sont copiées:
+
+    flask --app app init-db
+    DATABASE_URL=postgresql://jeu@localhost/jeu python persistence.py copy sqlite:///instance/database.db
+
+Les bases SQLite créées par l'app sont en auto_vacuum=INCREMENTAL: l'espace des
+parties purgées (archive.py) est rendu au fil de l'eau. Une base existante se
+convertit une fois, app arrêtée:
+
+    python persistence.py vacuum
+"""
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, func, inspect, select, text
+
+DEFAULT_DATABASE_URL = 'sqlite:///database.db'
+COPY_CHUNK_SIZE = 1000
+
+
+def is_sqlite(url):
+    return url.startswith('sqlite')
+
+
+def engine_options(url, pool_size=10, busy_timeout_ms=5000):
+    """Options SQLALCHEMY_ENGINE_OPTIONS adaptées à l'URL"""
+    options = {'pool_size': pool_size, 'max_overflow': -1}
+    if is_sqlite(url):
+        if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+            return {}
+        options['connect_args'] = {'timeout': busy_timeout_ms / 1000, 'check_same_thread': False}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    return options
+
+
+def configure_engine(engine, busy_timeout_ms=5000):
+    """Réglages appliqués à chaque nouvelle connexion SQLite"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Sans effet sur une base existante (cf. `python persistence.py vacuum`)
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.close()
+
+
+@contextmanager
+def schema_transaction(engine):
+    """Transaction de création du schéma; deux `init-db` concurrents passent l'un après l'autre"""
+    with engine.begin() as connection:
+        if engine.dialect.name == 'sqlite':
+            # pysqlite n'ouvre la transaction qu'à la première écriture: sans ce verrou,
+            # les vérifications d'existence de create_all se croisent
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        elif engine.dialect.name == 'postgresql':
+            connection.exec_driver_sql('SELECT pg_advisory_xact_lock(1)')
+        yield connection
+
+
+def ensure_indexes(metadata, engine):
+    """Crée les index déclarés absents d'une base existante (create_all ne touche pas aux tables présentes)"""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def incremental_vacuum(engine, pages=1000):
+    """Rend au système jusqu'à `pages` pages libres (SQLite en auto_vacuum=INCREMENTAL uniquement)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.connect() as connection:
+        if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2:
+            # executescript va au bout de la pragma (execute() ne libère qu'une page)
+            connection.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+
+
+def enable_incremental_vacuum(engine):
+    """Passe une base SQLite existante en auto_vacuum=INCREMENTAL (VACUUM complet, app arrêtée)"""
+    with engine.connect() as connection:
+        connection.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.exec_driver_sql('VACUUM')
+
+
+def copy_database(metadata, source_url, target_engine, force=False):
+    """Copie toutes les lignes de `source_url` vers la BDD cible (schéma déjà créé)
+
+    La cible ne doit contenir que la partie par défaut créée au démarrage (sans
+    joueurs ni messages), sauf avec `force`; ses tables sont vidées avant la copie.
+    """
+    source_engine = create_engine(source_url)
+    if not inspect(source_engine).has_table('game'):
+        raise RuntimeError('BDD source à l\'ancien schéma: lancer l\'app une fois dessus pour la migrer')
+    tables = metadata.sorted_tables
+    with source_engine.connect() as source, target_engine.begin() as target:
+        if not force:
+            def count(name):
+                return target.execute(select(func.count()).select_from(metadata.tables[name])).scalar()
+            if count('game') > 1 or count('user') or count('chat_message'):
+                raise RuntimeError('La BDD cible contient déjà des parties (utiliser --force)')
+        for table in reversed(tables):
+            target.execute(table.delete())
+        for table in tables:
+            rows = source.execute(select(table)).mappings()
+            copied = 0
+            while True:
+                chunk = [dict(row) for row in rows.fetchmany(COPY_CHUNK_SIZE)]
+                if not chunk:
+                    break
+                target.execute(table.insert(), chunk)
+                copied += len(chunk)
+            print(f'{table.name}: {copied} ligne(s)')
+            if target_engine.dialect.name == 'postgresql' and 'id' in table.c:
+                target.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                    f'COALESCE((SELECT MAX(id) FROM "{table.name}"), 0) + 1, false)'
+                ))
+    source_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Outils de persistance')
+    sub = parser.add_subparsers(dest='command', required=True)
+    copy = sub.add_parser('copy', help='copie une BDD existante vers DATABASE_URL')
+    copy.add_argument('source', help='URL source, ex. sqlite:///instance/database.db')
+    copy.add_argument('--force', action='store_true', help='écrase une cible déjà remplie')
+    vacuum = sub.add_parser('vacuum', help='active la récupération incrémentale d\'espace (SQLite)')
+    vacuum.add_argument('url', nargs='?', help='URL de la base (défaut: DATABASE_URL ou instance/database.db)')
+    args = parser.parse_args()
+
+    if args.command == 'vacuum':
+        url = args.url or os.environ.get('DATABASE_URL', 'sqlite:///instance/database.db')
+        if not is_sqlite(url):
+            parser.error('vacuum ne concerne que SQLite')
+        engine = create_engine(url)
+        enable_incremental_vacuum(engine)
+        engine.dispose()
+        return
+    if 'DATABASE_URL' not in os.environ:
+        parser.error('DATABASE_URL (BDD cible) doit être défini')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import app, db, init_db
+    # Schéma et index sur la cible
+    init_db()
+    with app.app_context():
+        copy_database(db.metadata, args.source, db.engine, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Présence des joueurs: sockets connectés, heartbeats et éviction des joueurs partis"""
+from collections import OrderedDict
+import time
+
+import eventlet
+
+
+class Player:
+    __slots__ = ('game_id', 'username', 'room', 'is_ready', 'sids', 'last_seen')
+
+    def __init__(self, game_id, username, room=None, is_ready=False):
+        self.game_id = game_id
+        self.username = username
+        self.room = room
+        self.is_ready = is_ready
+        self.sids = set()
+        self.last_seen = time.monotonic()
+
+    def to_dict(self):
+        return {'username': self.username, 'room': self.room, 'is_ready': self.is_ready}
+
+
+class PresenceTracker:
+    """Joueurs présents des parties de ce worker, tenus à jour par Socket.IO
+
+    `_players` est ordonné par dernier signe de vie (connexion, heartbeat,
+    déconnexion): un signe déplace l'entrée en fin en O(1) et le balayage
+    n'examine que la tête. Un joueur muet depuis `grace` secondes (onglet
+    fermé, ou socket zombie sans heartbeat) est retiré puis `on_evict(player)`
+    est lancé dans son propre greenlet.
+    """
+
+    def __init__(self, on_evict, grace=60.0, sweep_interval=5.0):
+        self.on_evict = on_evict
+        self.grace = grace
+        self.sweep_interval = sweep_interval
+        self._players = OrderedDict()   # {(game_id, username): Player}
+        self._games = {}                # {game_id: {username: Player}} (ordre d'arrivée)
+        self._sockets = {}              # {sid: Player}
+        self._ready = {}                # {game_id: nb de joueurs prêts avec une salle}
+        self._greenlet = None
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = eventlet.spawn(self._run)
+
+    def join(self, game_id, username, room=None, is_ready=False):
+        """Ajoute un joueur (connexion, ou rechargement au démarrage); retourne sa présence"""
+        player = self._players.get((game_id, username))
+        if player is None:
+            player = self._players[(game_id, username)] = Player(game_id, username, room, is_ready)
+            self._games.setdefault(game_id, {})[username] = player
+            self._count_ready(player, 1)
+        else:
+            self._touch(player)
+        self.start()
+        return player
+
+    def leave(self, game_id, username):
+        player = self._players.pop((game_id, username), None)
+        if player is not None:
+            self._forget(player)
+        return player
+
+    def drop_game(self, game_id):
+        for username in list(self._games.get(game_id, ())):
+            self.leave(game_id, username)
+
+    def update(self, game_id, username, **fields):
+        """Reporte la salle / l'état prêt d'un joueur (miroir de la table User)"""
+        player = self._players.get((game_id, username))
+        if player is not None:
+            self._count_ready(player, -1)
+            for field, value in fields.items():
+                setattr(player, field, value)
+            self._count_ready(player, 1)
+        return player
+
+    def ready_count(self, game_id):
+        """Joueurs prêts (avec une salle) de la partie, tenu à jour à chaque modification"""
+        return self._ready.get(game_id, 0)
+
+    def get(self, game_id, username):
+        return self._players.get((game_id, username))
+
+    def players(self, game_id):
+        return list(self._games.get(game_id, {}).values())
+
+    def connect(self, sid, player):
+        player.sids.add(sid)
+        self._sockets[sid] = player
+        self._touch(player)
+
+    def heartbeat(self, sid):
+        """Retourne le joueur du socket, ou None s'il a été évincé entre-temps"""
+        player = self._sockets.get(sid)
+        if player is not None:
+            self._touch(player)
+        return player
+
+    def disconnect(self, sid):
+        player = self._sockets.pop(sid, None)
+        if player is not None:
+            player.sids.discard(sid)
+            # Le délai de grâce court à partir de la déconnexion (changement de page...)
+            self._touch(player)
+        return player
+
+    def __len__(self):
+        return len(self._players)
+
+    def _touch(self, player):
+        player.last_seen = time.monotonic()
+        key = (player.game_id, player.username)
+        if key in self._players:
+            self._players.move_to_end(key)
+
+    def _count_ready(self, player, sign):
+        if player.is_ready and player.room:
+            count = self._ready.get(player.game_id, 0) + sign
+            if count:
+                self._ready[player.game_id] = count
+            else:
+                self._ready.pop(player.game_id, None)
+
+    def _forget(self, player):
+        self._count_ready(player, -1)
+        game = self._games.get(player.game_id)
+        if game is not None:
+            game.pop(player.username, None)
+            if not game:
+                del self._games[player.game_id]
+        for sid in player.sids:
+            self._sockets.pop(sid, None)
+
+    def _run(self):
+        while True:
+            eventlet.sleep(self.sweep_interval)
+            limit = time.monotonic() - self.grace
+            while self._players:
+                key, player = next(iter(self._players.items()))
+                if player.last_seen > limit:
+                    break
+                del self._players[key]
+                self._forget(player)
+                eventlet.spawn_n(self._evict, player)
+
+    def _evict(self, player):
+        try:
+            self.on_evict(player)
+        except Exception as exc:
+            print(f'Erreur éviction {player.username}: {exc}')
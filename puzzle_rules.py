@@ -0,0 +1,202 @@
+"""Règles des énigmes: table déclarative (salle, action) compilée au démarrage
+
+Chaque règle choisit une branche à partir des données de l'action et des
+jauges (`branch(data, states)`), puis la branche déclare:
+
+- `deltas`: variations des jauges, bornées à `clamp` (GAUGE_RANGE par défaut)
+- `feedback` / `error`: message (gabarit str.format sur les données, ou fonction)
+- `complete_if`: prédicat sur les jauges après application (ou `complete: True`)
+
+La partie `completion` décrit les effets quand la salle est résolue: messages
+système, diffusion, déblocage de la salle suivante, redirection vers le code
+final, vérification de victoire.
+"""
+
+GAUGE_RANGE = (0, 100)
+
+ENERGY_HINTS = [
+    "🎉 Bravo !⚡ L'énigme de la salle Énergie a été résolue🔋 Le réseau électrique est stabilisé ⚙️",
+    " 💡 Indice 1 : — À l’EPSI, ce n’est pas qu’une salle de classe 🏫 — c’est un espace où l’on apprend 📚, crée 💻, expérimente 🔬 et collabore 🤝.",
+]
+WATER_HINTS = [
+    "🌊🎉 Bravo ! L'énigme de la salle Eau a été résolue ! 💧 L’eau est maintenant purifiée. 💦✨",
+    " 💡 Indice 2 : 🎯 Chaque année, ces défis d’innovation 💡 rassemblent les étudiants 👩‍💻👨‍💻 autour de projets concrets 🔧, dans un esprit d’équipe 🤝 et de passion pour le code 🧠💻",
+]
+AIR_HINTS = [
+    "🎯🎉 Bravo ! 🌬️ L'énigme de la salle Air a été résolue ! 🍃 La qualité de l'air est maintenant rétablie 🌿✨",
+    " 💡 Indice 3 : ✨ Et cette fois, tout se joue dans une année symbolique 🗓️ : celle où la créativité 🎨 et la technologie 🤖 se rencontrent — 2025 🚀",
+    # AJOUT: Message de redirection
+    "🔐 Tous les joueurs sont redirigés vers la validation du CODE FINAL ! Utilisez vos 3 indices pour le trouver ! 🔑",
+]
+
+
+def _correct(data, states):
+    return 'correct' if data.get('correct', False) else 'wrong'
+
+
+def _has_value(data, states):
+    return 'set' if data.get('value') is not None else None
+
+
+def _chemical_checks(data):
+    return abs(data['ph'] - 7.0) < 0.5, abs(data['o2'] - 8.0) < 0.5
+
+
+def _chemical_branch(data, states):
+    if data.get('ph') is None or data.get('o2') is None:
+        return 'missing'
+    return 'correct' if all(_chemical_checks(data)) else 'wrong'
+
+
+def _chemical_feedback(data):
+    ph_correct, o2_correct = _chemical_checks(data)
+    message = 'Déséquilibre: '
+    if not ph_correct:
+        message += 'pH incorrect '
+    if not o2_correct:
+        message += 'O₂ incorrect'
+    return message
+
+
+RULES = {
+    ('Energie', 'connect_cables'): {
+        'branch': _correct,
+        'branches': {
+            'correct': {
+                'deltas': {'energy_level': +10, 'air_co2': -5},
+                'feedback': 'Réseau stable!',
+                'complete_if': lambda s: s['energy_level'] >= 60,
+            },
+            'wrong': {
+                'deltas': {'energy_level': -5},
+                'feedback': 'Connexion incorrecte.',
+            },
+        },
+        'completion': {'chat': ENERGY_HINTS, 'unlock_next': True},
+    },
+    ('Eau', 'sort_waste'): {
+        'branch': _correct,
+        'branches': {
+            'correct': {'deltas': {'water_pollution': -5}, 'feedback': 'Bon tri ! Pureté augmentée.'},
+            'wrong': {'deltas': {'water_pollution': +3}, 'feedback': 'Mauvais tri. Pollution accrue.'},
+        },
+    },
+    ('Eau', 'adjust_ph'): {
+        'branch': _has_value,
+        'branches': {'set': {'feedback': 'pH ajusté à {value:.1f}'}},
+    },
+    ('Eau', 'adjust_o2'): {
+        'branch': _has_value,
+        'branches': {'set': {'feedback': 'O₂ ajusté à {value:.1f} mg/L'}},
+    },
+    ('Eau', 'validate_chemical'): {
+        'branch': _chemical_branch,
+        'branches': {
+            'missing': {'error': 'Valeurs manquantes'},
+            'correct': {
+                'deltas': {'water_pollution': -20, 'flora_health': +10, 'air_o2': +5},
+                'feedback': 'Équilibre chimique atteint !',
+            },
+            'wrong': {
+                'deltas': {'water_pollution': +5},
+                'feedback': _chemical_feedback,
+            },
+        },
+    },
+    ('Eau', 'complete_water'): {
+        'branch': lambda data, states: 'clean' if states['water_pollution'] <= 10 else 'polluted',
+        'branches': {
+            'clean': {'complete': True},
+            'polluted': {'error': 'Pollution encore trop élevée'},
+        },
+        'completion': {'chat': WATER_HINTS, 'unlock_next': True},
+    },
+    ('Air', 'identify_pollution_source'): {
+        'branch': lambda data, states: 'correct' if data.get('correct', False) else None,
+        'branches': {
+            'correct': {
+                'deltas': {'air_co2': -30, 'air_o2': +20, 'flora_health': +15},
+                'feedback': '✅ Source identifiée ! Filtres activés.',
+                'complete_if': lambda s: s['air_co2'] <= 30 and s['air_o2'] >= 70,
+            },
+        },
+        'completion': {'chat': AIR_HINTS, 'broadcast': True, 'redirect_to_final': True},
+    },
+    ('Flore', 'select_plant'): {
+        'branch': lambda data, states: 'good' if data.get('plant') in ['oxygen_plant', 'purifying_plant'] else None,
+        'branches': {
+            'good': {
+                'deltas': {'flora_health': +10, 'air_o2': +5},
+                'feedback': 'Plante {plant} choisie!',
+                'complete_if': lambda s: s['flora_health'] >= 80,
+            },
+        },
+        'completion': {'check_victory': True},
+    },
+}
+
+
+class Outcome:
+    """Résultat d'une action: messages et effets de complétion"""
+    __slots__ = ('feedback', 'error', 'completed', 'completion')
+
+    def __init__(self, feedback=None, error=None, completed=False, completion=None):
+        self.feedback = feedback
+        self.error = error
+        self.completed = completed
+        self.completion = completion
+
+
+NOTHING = Outcome()
+
+
+def _message(template):
+    if template is None or callable(template):
+        return template
+    return lambda data: template.format(**data)
+
+
+def _compile_branch(branch, completion, gauges):
+    deltas = tuple(branch.get('deltas', {}).items())
+    for key, _ in deltas:
+        if key not in gauges:
+            raise ValueError(f'Jauge inconnue dans les règles: {key}')
+    low, high = branch.get('clamp', GAUGE_RANGE)
+    feedback = _message(branch.get('feedback'))
+    error = _message(branch.get('error'))
+    always_complete = branch.get('complete', False)
+    complete_if = branch.get('complete_if')
+
+    def apply(live, data):
+        if error is not None:
+            return Outcome(error=error(data))
+        if deltas:
+            live.apply_deltas(deltas, low, high)
+        completed = always_complete or (complete_if is not None and complete_if(live.states))
+        return Outcome(
+            feedback=feedback(data) if feedback else None,
+            completed=completed,
+            completion=completion if completed else None,
+        )
+
+    return apply
+
+
+def compile_rules(rules, gauges):
+    """Compile la table en fonctions `dispatch(live, data) -> Outcome` par (salle, action)
+
+    Les jauges sont modifiées via `live.apply_deltas` (lecture/écriture atomique).
+    """
+    dispatch = {}
+    for key, rule in rules.items():
+        completion = rule.get('completion', {})
+        branches = {name: _compile_branch(branch, completion, gauges)
+                    for name, branch in rule['branches'].items()}
+        select = rule['branch']
+
+        def run(live, data, select=select, branches=branches):
+            branch = branches.get(select(data, live.states))
+            return branch(live, data) if branch else NOTHING
+
+        dispatch[key] = run
+    return dispatch
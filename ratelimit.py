@@ -0,0 +1,141 @@
+"""Limitation de débit par seaux à jetons, par joueur et par partie
+
+Chaque limite nommée (`action`, `chat`...) a un seau par joueur et/ou par
+partie: `(jetons par seconde, capacité)`. Une limite `action:<type>` remplace
+`action` pour ce type d'action. Une limite `coalesce` porte sur des appels
+idempotents (réglages à valeur absolue, rattrapage d'état): au-delà du débit,
+seul le dernier est gardé et rejoué dès qu'un jeton est disponible.
+
+Surcharge par variable d'environnement (JSON fusionné par nom, `null` retire
+une limite, `off` les désactive toutes):
+
+    RATE_LIMITS='{"chat": {"user": [0.5, 3]}, "sync_state": null}'
+"""
+import json
+import time
+from collections import namedtuple
+
+import eventlet
+
+DEFAULT_LIMITS = {
+    'action': {'user': (8, 16), 'game': (30, 60)},
+    'action:adjust_ph': {'user': (4, 8), 'coalesce': True},
+    'action:adjust_o2': {'user': (4, 8), 'coalesce': True},
+    'select_room': {'user': (2, 6)},
+    'player_ready': {'user': (2, 6)},
+    'sync_state': {'user': (2, 10), 'coalesce': True},
+    'chat': {'user': (1, 5), 'game': (4, 12)},
+    'validate_final_code': {'user': (0.5, 5), 'game': (2, 10)},
+}
+SCOPES = ('user', 'game')
+# Les seaux pleins (inactifs) sont oubliés toutes les PRUNE_EVERY vérifications
+PRUNE_EVERY = 1024
+
+Throttle = namedtuple('Throttle', 'limit scope retry_after coalesce notify')
+
+
+def load_limits(value=None):
+    """Limites par défaut, surchargées par le JSON de RATE_LIMITS"""
+    if value == 'off':
+        return {}
+    limits = dict(DEFAULT_LIMITS)
+    for name, limit in json.loads(value or '{}').items():
+        if limit is None:
+            limits.pop(name, None)
+        else:
+            limits[name] = {key: tuple(v) if key in SCOPES else v for key, v in limit.items()}
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'stamp', 'quiet_until')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+        # Fin de la période pendant laquelle un refus n'est plus signalé au client
+        self.quiet_until = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return self.tokens
+
+    def wait_time(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """Seaux à jetons en mémoire (par worker, où vivent les sockets de la partie)"""
+
+    def __init__(self, limits, clock=time.monotonic):
+        self.limits = limits
+        self.clock = clock
+        self._buckets = {}   # {(limite, portée, id): TokenBucket}
+        self._pending = {}   # {clé: (fn, args)} appels coalescés en attente
+        self._checks = 0
+
+    def rule(self, name, kind=None):
+        """`(nom de la limite, limite)` applicable, ou `(None, None)`"""
+        if kind is not None and f'{name}:{kind}' in self.limits:
+            name = f'{name}:{kind}'
+        return name, self.limits.get(name)
+
+    def check(self, name, game_id, username, kind=None):
+        """Consomme un jeton de chaque seau; retourne None si autorisé, sinon un `Throttle`
+
+        Les seaux du joueur et de la partie sont débités ensemble ou pas du tout.
+        """
+        name, limit = self.rule(name, kind)
+        if limit is None:
+            return None
+        now = self.clock()
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self.prune(now)
+
+        buckets = []
+        for scope, owner in (('user', (game_id, username)), ('game', game_id)):
+            if scope in limit:
+                key = (name, scope, owner)
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(*limit[scope], now)
+                buckets.append((scope, bucket))
+
+        for scope, bucket in buckets:
+            if bucket.refill(now) < 1:
+                # Un seul signalement par épisode de dépassement (sur le seau en cause)
+                notify = now >= bucket.quiet_until
+                retry_after = bucket.wait_time()
+                if notify:
+                    bucket.quiet_until = now + retry_after
+                return Throttle(name, scope, retry_after, bool(limit.get('coalesce')), notify)
+        for _, bucket in buckets:
+            bucket.tokens -= 1
+        return None
+
+    def defer(self, key, delay, fn, *args):
+        """Garde seulement le dernier appel `fn(*args)` de `key` et le lance après `delay`"""
+        scheduled = key in self._pending
+        self._pending[key] = (fn, args)
+        if not scheduled:
+            eventlet.spawn_after(delay, self._run_deferred, key)
+
+    def prune(self, now=None):
+        now = self.clock() if now is None else now
+        full = [key for key, bucket in self._buckets.items() if bucket.refill(now) >= bucket.capacity]
+        for key in full:
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _run_deferred(self, key):
+        fn, args = self._pending.pop(key)
+        try:
+            fn(*args)
+        except Exception as exc:
+            print(f'Erreur appel différé {key}: {exc}')
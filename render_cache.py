@@ -0,0 +1,39 @@
+"""Cache de rendu: squelettes de pages pré-rendus dont seules quelques valeurs varient"""
+import re
+
+from flask import render_template
+from markupsafe import escape
+
+MARKER = '\ue000{}\ue000'
+MARKER_PATTERN = re.compile('\ue000(\\w+)\ue000')
+
+
+class SkeletonCache:
+    """Rend un template une fois avec des marqueurs à la place des valeurs variables,
+    puis, à chaque requête, n'insère que ces valeurs (échappées comme le ferait Jinja)
+
+    Réservé aux templates qui affichent ces valeurs telles quelles (`{{ username }}`),
+    sans filtre ni condition dessus. En mode auto-reload, un template modifié sur
+    disque est re-rendu.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.skeletons = {}
+
+    def precompile(self):
+        """Compile tous les templates (cache Jinja) pour ne pas le faire à la première visite"""
+        for name in self.app.jinja_env.list_templates():
+            self.app.jinja_env.get_template(name)
+
+    def render(self, template_name, **values):
+        key = (template_name, tuple(sorted(values)))
+        entry = self.skeletons.get(key)
+        if entry is None or (self.app.jinja_env.auto_reload and not entry[0].is_up_to_date):
+            template = self.app.jinja_env.get_template(template_name)
+            html = render_template(template_name, **{name: MARKER.format(name) for name in values})
+            entry = self.skeletons[key] = (template, MARKER_PATTERN.split(html))
+        parts = entry[1]
+        escaped = {name: str(escape(value)) for name, value in values.items()}
+        # split() alterne texte littéral (indices pairs) et noms de variables (impairs)
+        return ''.join(escaped[part] if i % 2 else part for i, part in enumerate(parts))
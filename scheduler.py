@@ -0,0 +1,84 @@
+"""Ordonnanceur central des échéances de parties (un seul greenlet, tas de deadlines)"""
+import heapq
+import itertools
+import time
+
+import eventlet
+from eventlet.event import Event
+
+
+class DeadlineScheduler:
+    """Gère des milliers d'échéances `key -> timestamp` avec un seul greenlet
+
+    Les annulations sont paresseuses: une entrée du tas n'est valable que si
+    elle correspond encore à `_deadlines[key]`. A l'expiration, `on_expire(key)`
+    est lancé dans son propre greenlet.
+    """
+
+    def __init__(self, on_expire):
+        self.on_expire = on_expire
+        self._heap = []
+        self._deadlines = {}
+        self._seq = itertools.count()
+        self._wakeup = Event()
+        self._greenlet = None
+
+    def start(self):
+        if self._greenlet is None:
+            self._greenlet = eventlet.spawn(self._run)
+
+    def schedule(self, key, deadline):
+        """Arme (ou réarme) l'échéance `key` au timestamp `deadline`"""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        self._wake()
+        self.start()
+
+    def extend(self, key, seconds):
+        """Décale de `seconds` une échéance armée; retourne la nouvelle, ou None si `key` n'est pas armée
+
+        L'ancienne entrée du tas devient invalide (annulation paresseuse).
+        """
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return None
+        self.schedule(key, deadline + seconds)
+        return deadline + seconds
+
+    def cancel(self, key):
+        return self._deadlines.pop(key, None) is not None
+
+    def deadline(self, key):
+        return self._deadlines.get(key)
+
+    def is_scheduled(self, key):
+        return key in self._deadlines
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def _wake(self):
+        event, self._wakeup = self._wakeup, Event()
+        event.send()
+
+    def _run(self):
+        while True:
+            heap = self._heap
+            while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+                heapq.heappop(heap)
+
+            timeout = heap[0][0] - time.time() if heap else None
+            if timeout is None or timeout > 0:
+                with eventlet.Timeout(timeout, False):
+                    self._wakeup.wait()
+                continue
+
+            _, _, key = heapq.heappop(heap)
+            del self._deadlines[key]
+            eventlet.spawn_n(self._expire, key)
+
+    def _expire(self, key):
+        try:
+            self.on_expire(key)
+        except Exception as exc:
+            print(f'Erreur échéance {key}: {exc}')
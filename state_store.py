@@ -0,0 +1,281 @@
+"""État de jeu en mémoire (source de vérité) avec persistance différée en BDD"""
+from collections import deque
+import itertools
+import time
+
+import eventlet
+
+# Nombre de deltas conservés par partie pour le rattrapage après reconnexion
+DELTA_HISTORY_SIZE = 64
+# Seuil de victoire: toutes les jauges doivent être au moins à cette valeur
+GAUGE_THRESHOLD = 50
+
+_epochs = itertools.count(int(time.time() * 1000))
+
+
+class RoomState:
+    __slots__ = ('room_name', 'is_completed', 'is_locked', 'assigned_player')
+
+    def __init__(self, room_name, is_completed=False, is_locked=True, assigned_player=None):
+        self.room_name = room_name
+        self.is_completed = is_completed
+        self.is_locked = is_locked
+        self.assigned_player = assigned_player
+
+
+class LiveGame:
+    """État vivant d'une partie: jauges, salles et infos, avec suivi des clés modifiées
+
+    Deux suivis coexistent: `dirty_*` (à écrire en BDD) et `changed_*`
+    (à diffuser aux clients, cf. `take_changes`/`record_delta`). Les compteurs
+    `completed_rooms` et `low_gauges` sont tenus à jour à chaque écriture: les
+    conditions de victoire se lisent en O(1).
+    """
+    __slots__ = ('game_id', 'states', 'rooms', 'info',
+                 'dirty_states', 'dirty_rooms', 'dirty_info',
+                 'changed_states', 'changed_rooms', 'changed_info', 'players_changed',
+                 'epoch', 'version', 'history', 'write_seq', 'snapshot_cache',
+                 'lobby_seq', 'lobby_cache', 'completed_rooms', 'low_gauges', 'last_access')
+
+    def __init__(self, game_id, states, rooms, info):
+        self.game_id = game_id
+        self.states = states    # {key: float}
+        self.rooms = rooms      # {room_name: RoomState} (ordre des salles conservé)
+        self.info = info        # {key: str}
+        self.dirty_states = set()
+        self.dirty_rooms = set()
+        self.dirty_info = set()
+        self.changed_states = set()
+        self.changed_rooms = set()
+        self.changed_info = set()
+        self.players_changed = False
+        # `epoch` distingue deux chargements successifs (redémarrage, reset)
+        self.epoch = next(_epochs)
+        self.version = 0
+        self.history = deque(maxlen=DELTA_HISTORY_SIZE)
+        # Incrémenté à chaque écriture: invalide les caches dérivés (`snapshot_cache`)
+        self.write_seq = 0
+        self.snapshot_cache = None
+        # Incrémenté quand joueurs ou salles changent: invalide les pages de lobby (`lobby_cache`)
+        self.lobby_seq = 0
+        self.lobby_cache = None
+        self.completed_rooms = sum(1 for room in rooms.values() if room.is_completed)
+        self.low_gauges = sum(1 for value in states.values() if value < GAUGE_THRESHOLD)
+        # Horodatage (monotone) du dernier `StateStore.get`: base de l'éviction des parties inactives
+        self.last_access = time.monotonic()
+
+    @property
+    def all_rooms_completed(self):
+        return self.completed_rooms == len(self.rooms)
+
+    @property
+    def gauges_ok(self):
+        return self.low_gauges == 0
+
+    @property
+    def is_dirty(self):
+        return bool(self.dirty_states or self.dirty_rooms or self.dirty_info)
+
+    def get_state(self, key):
+        return self.states[key]
+
+    def set_state(self, key, value):
+        previous = self.states.get(key)
+        self.states[key] = value
+        self.low_gauges += (value < GAUGE_THRESHOLD) - (previous is not None and previous < GAUGE_THRESHOLD)
+        self.dirty_states.add(key)
+        self.changed_states.add(key)
+        self.write_seq += 1
+        return value
+
+    def apply_deltas(self, deltas, low=0, high=100):
+        """Applique des paires `(key, delta)` bornées à [low, high] sans point de yield
+
+        `deltas` est un itérable de paires (les règles compilées passent un tuple
+        figé); pour un dict, passer `deltas.items()`.
+
+        Lecture et écriture se font dans le même pas du greenlet: deux joueurs
+        agissant en même temps ne peuvent pas perdre de mise à jour. Retourne
+        les nouvelles valeurs.
+        """
+        values = {}
+        for key, delta in deltas:
+            values[key] = self.set_state(key, min(high, max(low, self.states[key] + delta)))
+        return values
+
+    def get_room(self, room_name):
+        return self.rooms.get(room_name)
+
+    def update_room(self, room_name, **fields):
+        room = self.rooms[room_name]
+        was_completed = room.is_completed
+        for field, value in fields.items():
+            setattr(room, field, value)
+        self.completed_rooms += bool(room.is_completed) - bool(was_completed)
+        self.dirty_rooms.add(room_name)
+        self.changed_rooms.add(room_name)
+        self.write_seq += 1
+        self.lobby_seq += 1
+        return room
+
+    def get_info(self, key, default=None):
+        return self.info.get(key, default)
+
+    def set_info(self, key, value):
+        self.info[key] = value
+        self.dirty_info.add(key)
+        self.changed_info.add(key)
+        self.write_seq += 1
+
+    def mark_players_changed(self):
+        self.players_changed = True
+        self.write_seq += 1
+        self.lobby_seq += 1
+
+    def take_changes(self):
+        """Extrait (et réinitialise) les clés modifiées depuis la dernière diffusion"""
+        changes = (self.changed_states, self.changed_rooms,
+                   self.changed_info, self.players_changed)
+        self.changed_states = set()
+        self.changed_rooms = set()
+        self.changed_info = set()
+        self.players_changed = False
+        return changes
+
+    def record_delta(self, delta):
+        """Numérote un delta et le conserve pour le rattrapage"""
+        self.version += 1
+        delta['epoch'] = self.epoch
+        delta['version'] = self.version
+        self.history.append(delta)
+        return delta
+
+    def deltas_since(self, epoch, version):
+        """Deltas postérieurs à `version`, ou None si un état complet est nécessaire"""
+        if epoch != self.epoch or version > self.version:
+            return None
+        if version == self.version:
+            return []
+        if not self.history or self.history[0]['version'] > version + 1:
+            return None
+        return [d for d in self.history if d['version'] > version]
+
+    def take_dirty(self):
+        """Extrait (et réinitialise) les valeurs modifiées depuis le dernier flush
+
+        Les clés pas encore diffusées (`changed_*`) ne sont pas encore dans le
+        journal d'événements: elles restent sales jusqu'au flush suivant, pour
+        que la BDD ne soit jamais en avance sur le journal.
+        """
+        states = self.dirty_states - self.changed_states
+        rooms = self.dirty_rooms - self.changed_rooms
+        info = self.dirty_info - self.changed_info
+        changes = (
+            {key: self.states[key] for key in states},
+            {name: (self.rooms[name].is_completed,
+                    self.rooms[name].is_locked,
+                    self.rooms[name].assigned_player) for name in rooms},
+            {key: self.info[key] for key in info},
+        )
+        self.dirty_states -= states
+        self.dirty_rooms -= rooms
+        self.dirty_info -= info
+        return changes
+
+
+class StateStore:
+    """Cache des parties actives; un greenlet écrit les modifications par lots
+
+    `loader(game_id)` retourne un LiveGame lu depuis la BDD, et
+    `flusher(batch)` persiste en une transaction une liste de
+    `(game_id, states, rooms, info)`.
+
+    Après chaque flush réussi, les parties sans écriture en attente sont
+    déchargées si elles sont terminées depuis `finished_timeout` secondes ou
+    inactives depuis `idle_timeout` secondes (sans `get`), sauf si
+    `pinned(game_id)` les retient; `on_evict(game_id)` est appelé pour chacune.
+    Le prochain `get` les recharge depuis la BDD.
+    """
+
+    def __init__(self, loader, flusher, flush_interval=1.0, idle_timeout=600.0,
+                 finished_timeout=60.0, pinned=None, on_evict=None):
+        self.loader = loader
+        self.flusher = flusher
+        self.flush_interval = flush_interval
+        self.idle_timeout = idle_timeout
+        self.finished_timeout = finished_timeout
+        self.pinned = pinned
+        self.on_evict = on_evict
+        self.games = {}
+        self._flush_greenlet = None
+
+    def get(self, game_id):
+        game = self.games.get(game_id)
+        if game is None:
+            game = self.loader(game_id)
+            self.games[game_id] = game
+        game.last_access = time.monotonic()
+        return game
+
+    def evict(self, game_id):
+        """Oublie une partie (les modifications non persistées sont abandonnées)"""
+        self.games.pop(game_id, None)
+
+    def flush(self):
+        batch = []
+        for game in list(self.games.values()):
+            if game.is_dirty:
+                changes = game.take_dirty()
+                if any(changes):
+                    batch.append((game.game_id,) + changes)
+        if batch:
+            try:
+                self.flusher(batch)
+            except Exception:
+                # Échec d'écriture: on remet les clés en sale pour le prochain flush
+                for game_id, states, rooms, info in batch:
+                    game = self.games.get(game_id)
+                    if game is not None:
+                        game.dirty_states.update(states)
+                        game.dirty_rooms.update(rooms)
+                        game.dirty_info.update(info)
+                raise
+        return len(batch)
+
+    def evict_idle(self, now=None):
+        """Décharge les parties propres terminées ou inactives; retourne leurs ids"""
+        now = time.monotonic() if now is None else now
+        stale = []
+        for game_id, game in self.games.items():
+            if game.is_dirty:
+                continue
+            timeout = self.finished_timeout if game.info.get('game_result') else self.idle_timeout
+            if now - game.last_access < timeout:
+                continue
+            if self.pinned is not None and self.pinned(game_id):
+                continue
+            stale.append(game_id)
+        for game_id in stale:
+            del self.games[game_id]
+            if self.on_evict is not None:
+                self.on_evict(game_id)
+        return stale
+
+    def start(self):
+        if self._flush_greenlet is None:
+            self._flush_greenlet = eventlet.spawn(self._flush_loop)
+
+    def stop(self):
+        if self._flush_greenlet is not None:
+            self._flush_greenlet.kill()
+            self._flush_greenlet = None
+        self.flush()
+
+    def _flush_loop(self):
+        while True:
+            eventlet.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self.evict_idle()
+            except Exception as exc:
+                print(f'Erreur flush état de jeu: {exc}')
@@ -17,7 +17,8 @@ let isTextToSpeechEnabled = false;
 
 // NOUVEAU: Variables pour le chat
 let lastMessageId = 0;
-let chatPollingInterval = null;
+let chatLongPolling = false;
+const CHAT_LONG_POLL_WAIT = 25;
 
 // Démarrer le polling des messages au chargement
 document.addEventListener('DOMContentLoaded', () => {
@@ -41,34 +42,73 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 });
 
-// NOUVEAU: Démarrer le polling des messages toutes les secondes
+// NOUVEAU: Démarrer la réception des messages
+// Les messages sont poussés via Socket.IO; le long-poll ne sert que si le socket est déconnecté
 function startChatPolling() {
-    // Charger les messages existants
-    loadNewMessages();
+    if (!document.getElementById('messages')) return;
     
-    // Polling toutes les secondes
-    chatPollingInterval = setInterval(() => {
+    if (socket.connected) {
         loadNewMessages();
-    }, 1000);
+    } else {
+        startChatLongPoll();
+    }
+}
+
+async function startChatLongPoll() {
+    if (chatLongPolling || !document.getElementById('messages')) return;
+    chatLongPolling = true;
+    
+    while (chatLongPolling) {
+        const ok = await loadNewMessages(CHAT_LONG_POLL_WAIT);
+        if (!ok) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
 }
 
-// NOUVEAU: Charger les nouveaux messages
-async function loadNewMessages() {
+function stopChatLongPoll() {
+    chatLongPolling = false;
+}
+
+// NOUVEAU: Charger les nouveaux messages (wait > 0: la requête attend le prochain message)
+async function loadNewMessages(wait = 0) {
     try {
-        const response = await fetch(`/api/chat/messages?last_id=${lastMessageId}`);
+        const response = await fetch(`/api/chat/messages?last_id=${lastMessageId}&wait=${wait}`);
         const data = await response.json();
         
         if (data.messages && data.messages.length > 0) {
-            data.messages.forEach(msg => {
-                displayMessage(msg);
-                lastMessageId = Math.max(lastMessageId, msg.id);
-            });
+            data.messages.forEach(receiveMessage);
+        }
+        // Session terminée ou partie réinitialisée: inutile de réessayer
+        if (response.status === 401 || response.status === 410) {
+            stopChatLongPoll();
         }
+        return response.ok;
     } catch (error) {
         console.error('Erreur chargement messages:', error);
+        return false;
     }
 }
 
+function receiveMessage(msg) {
+    displayMessage(msg);
+    lastMessageId = Math.max(lastMessageId, msg.id);
+}
+
+socket.on('chat_message', receiveMessage);
+
+socket.on('connect', () => {
+    stopChatLongPoll();
+    // Rattraper les messages manqués pendant la déconnexion
+    if (document.getElementById('messages')) {
+        loadNewMessages();
+    }
+});
+
+socket.on('disconnect', () => {
+    startChatLongPoll();
+});
+
 // NOUVEAU: Afficher un message dans le chat
 function displayMessage(msg) {
     const msgDiv = document.getElementById('messages');
@@ -126,9 +166,8 @@ async function sendMessage() {
         
         if (data.success) {
             input.value = '';
-            // Le message sera affiché par le polling automatiquement
-            // Forcer un chargement immédiat pour un retour instantané
-            loadNewMessages();
+            // Le message est aussi poussé via Socket.IO; affichage immédiat pour un retour instantané
+            receiveMessage(data.message);
         } else {
             showNotification(data.error || 'Erreur envoi message', 'error');
         }
@@ -399,10 +438,34 @@ function createConfetti(count = 50) {
 
 // ==================== ACTIONS DU JEU ====================
 
+// Les actions rapprochées (clics répétés) sont regroupées pendant ACTION_BATCH_DELAY_MS
+// et envoyées en un seul événement 'actions'; 0 pour envoyer chaque action immédiatement
+const ACTION_BATCH_DELAY_MS = 20;
+let actionBuffer = [];
+let actionFlushTimer = null;
+
 function sendAction(action, data = {}) {
     data.action = action;
     console.log('Envoi action:', action, data);
-    socket.emit('action', data);
+    if (ACTION_BATCH_DELAY_MS <= 0) {
+        socket.emit('action', data);
+        return;
+    }
+    actionBuffer.push(data);
+    if (!actionFlushTimer) {
+        actionFlushTimer = setTimeout(flushActions, ACTION_BATCH_DELAY_MS);
+    }
+}
+
+function flushActions() {
+    const actions = actionBuffer;
+    actionBuffer = [];
+    actionFlushTimer = null;
+    if (actions.length === 1) {
+        socket.emit('action', actions[0]);
+    } else if (actions.length > 1) {
+        socket.emit('actions', { actions });
+    }
 }
 
 // ==================== RECONNAISSANCE VOCALE ====================
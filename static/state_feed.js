@@ -0,0 +1,118 @@
+// Flux d'état poussé par le serveur via Socket.IO (remplace le polling de /api/poll_status)
+// Le serveur envoie des 'state_delta' numérotés; à chaque (re)connexion, le client
+// envoie sa version et reçoit soit les deltas manqués, soit un état complet.
+
+// Signe de vie pour la présence côté serveur: un joueur muet trop longtemps est retiré
+const HEARTBEAT_INTERVAL_MS = 15000;
+// Rattrapage sans réponse (socket coupé, appel perdu): le verrou est relâché et la demande relancée
+const SYNC_TIMEOUT_MS = 5000;
+
+function startHeartbeat(socket) {
+    return setInterval(() => {
+        if (socket.connected) socket.emit('heartbeat');
+    }, HEARTBEAT_INTERVAL_MS);
+}
+
+function createStateFeed(socket, onChange) {
+    const state = {
+        epoch: null,
+        version: 0,
+        players: [],
+        rooms: [],
+        game_states: {},
+        game_started: 'false',
+        remaining_time: 0,
+        game_result: null
+    };
+    let remainingReceivedAt = Date.now();
+    let syncing = false;
+    let syncTimer = null;
+
+    function mergeRooms(rooms) {
+        rooms.forEach(room => {
+            const index = state.rooms.findIndex(r => r.name === room.name);
+            if (index >= 0) {
+                state.rooms[index] = room;
+            } else {
+                state.rooms.push(room);
+            }
+        });
+    }
+
+    function applyDelta(delta) {
+        if (delta.game_states) Object.assign(state.game_states, delta.game_states);
+        if (delta.rooms) mergeRooms(delta.rooms);
+        if (delta.players) state.players = delta.players;
+        if ('game_started' in delta) state.game_started = delta.game_started;
+        if ('game_result' in delta) state.game_result = delta.game_result;
+        if ('remaining_time' in delta) {
+            state.remaining_time = delta.remaining_time;
+            remainingReceivedAt = Date.now();
+        }
+        state.epoch = delta.epoch;
+        state.version = delta.version;
+    }
+
+    function requestSync() {
+        syncing = true;
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(() => {
+            syncing = false;
+            if (socket.connected) requestSync();
+        }, SYNC_TIMEOUT_MS);
+        socket.emit('sync_state', { epoch: state.epoch, version: state.version });
+    }
+
+    socket.on('connect', requestSync);
+    startHeartbeat(socket);
+    if (socket.connected) {
+        requestSync();
+    }
+
+    socket.on('state_sync', (data) => {
+        if (data.snapshot) {
+            Object.assign(state, data.snapshot);
+            state.rooms = data.snapshot.rooms.slice();
+            state.game_states = Object.assign({}, data.snapshot.game_states);
+            remainingReceivedAt = Date.now();
+        }
+        data.deltas.forEach(applyDelta);
+        clearTimeout(syncTimer);
+        syncing = false;
+        onChange(state, data.snapshot || {});
+    });
+
+    socket.on('error', (data) => {
+        // Rattrapage refusé par la limitation de débit: nouvelle demande une fois le délai écoulé
+        if (!syncing || !data || !data.rate_limited) return;
+        clearTimeout(syncTimer);
+        syncing = false;
+        syncTimer = setTimeout(requestSync, Math.max(1, data.retry_after || 0) * 1000);
+    });
+
+    socket.on('state_delta', (delta) => {
+        if (syncing) return;
+        if (delta.epoch !== state.epoch || delta.version !== state.version + 1) {
+            // Delta manqué ou partie rechargée: on demande un rattrapage
+            requestSync();
+            return;
+        }
+        applyDelta(delta);
+        onChange(state, delta);
+    });
+
+    return {
+        state,
+        remainingTime() {
+            if (!state.remaining_time) return 0;
+            const elapsed = Math.floor((Date.now() - remainingReceivedAt) / 1000);
+            return Math.max(0, state.remaining_time - elapsed);
+        },
+        canAccessGame(username) {
+            const player = state.players.find(p => p.username === username);
+            if (!player || !player.room || !player.is_ready) return false;
+            const room = state.rooms.find(r => r.name === player.room);
+            return Boolean(room && !room.is_locked);
+        }
+    };
+}
@@ -0,0 +1,85 @@
+"""Fixtures communes: modules importés depuis la racine du dépôt, horloge pilotée, app de test
+
+Les composants purs se testent sans Flask ni BDD. Les tests de l'app importent le
+module `app` une seule fois (c'est un singleton), configuré par variables
+d'environnement sur une BDD et des dossiers temporaires; chaque test joue dans
+ses propres parties (codes uniques).
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Horloge monotone pilotée par le test"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+EXPORT_TOKEN = 'test-token'
+
+
+@pytest.fixture(scope='session')
+def game_app(tmp_path_factory):
+    """Module `app` démarré sur une BDD SQLite et des dossiers temporaires"""
+    root = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{root / "game.db"}',
+        'EVENT_LOG_DIR': str(root / 'events'),
+        'ARCHIVE_DIR': str(root / 'archive'),
+        'ARCHIVE_DELAY': '0',
+        'ARCHIVE_PAUSE': '0',
+        'RATE_LIMITS': 'off',
+        'EXPORT_TOKEN': EXPORT_TOKEN,
+    })
+    import app
+    app.init_app_state(init_database=True)
+    return app
+
+
+@pytest.fixture
+def game_code():
+    return f't-{uuid.uuid4().hex[:8]}'
+
+
+@pytest.fixture
+def login(game_app):
+    """`login(pseudo, code)`: client HTTP connecté à la partie `code`"""
+    def login(username, code):
+        client = game_app.app.test_client()
+        response = client.post('/login', data={'username': username, 'game': code})
+        assert response.status_code == 302, response.data
+        return client
+    return login
+
+
+@pytest.fixture
+def connect(game_app):
+    """`connect(client)`: socket Socket.IO de test partageant la session du client HTTP"""
+    sockets = []
+
+    def connect(client):
+        socket = game_app.socketio.test_client(game_app.app, flask_test_client=client)
+        sockets.append(socket)
+        return socket
+
+    yield connect
+    for socket in sockets:
+        if socket.is_connected():
+            socket.disconnect()
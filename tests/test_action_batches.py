@@ -0,0 +1,62 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def water_socket(game_app, login, connect, game_code):
+    """Socket d'un joueur installé dans la salle Eau"""
+    client = login('alice', game_code)
+    connect(client).emit('select_room', {'room': 'Eau'})
+    client.get('/game')
+    socket = connect(client)
+    socket.get_received()
+    return socket
+
+
+def test_aggregate_messages_counts_repeats(game_app):
+    assert game_app.aggregate_messages(['Bon tri', 'Bon tri', 'Mauvais tri']) == 'Bon tri (×2) / Mauvais tri'
+
+
+def test_batch_publishes_one_delta_and_aggregated_feedback(water_socket):
+    ack = water_socket.emit('actions', {'actions': [{'action': 'sort_waste', 'correct': True}] * 3}, callback=True)
+    assert [result['feedback'] for result in ack['results']] == ['Bon tri ! Pureté augmentée.'] * 3
+    received = water_socket.get_received()
+    deltas = [m['args'][0] for m in received if m['name'] == 'state_delta']
+    assert len(deltas) == 1 and deltas[0]['game_states']['water_pollution'] == 30.0 - 15
+    assert [m['args'][0] for m in received if m['name'] == 'feedback'] == [
+        {'message': 'Bon tri ! Pureté augmentée. (×3)'}]
+
+
+def test_invalid_batch_is_refused(water_socket):
+    water_socket.emit('actions', {'actions': []})
+    assert water_socket.get_received()[0]['args'][0] == {'message': "Lot d'actions invalide (1 à 50)"}
+
+
+def test_malformed_action_does_not_stop_the_batch(water_socket):
+    ack = water_socket.emit('actions', {'actions': [
+        {'action': 'adjust_ph', 'value': 'neutre'},
+        'adjust_ph',
+        {'action': 'adjust_ph', 'value': 7.1},
+    ]}, callback=True)
+    assert [result['error'] for result in ack['results']] == ['Action invalide', 'Action invalide', None]
+    assert ack['results'][2]['feedback'] == 'pH ajusté à 7.1'
+
+
+def test_unexpected_error_is_logged_and_reported_per_action(game_app, water_socket, monkeypatch, caplog):
+    apply_action = game_app.apply_action
+
+    def flaky(live, room, username, action):
+        if action.get('correct') is None:
+            raise RuntimeError('panne')
+        return apply_action(live, room, username, action)
+    monkeypatch.setattr(game_app, 'apply_action', flaky)
+    with caplog.at_level(logging.ERROR):
+        ack = water_socket.emit('actions', {'actions': [
+            {'action': 'adjust_ph', 'value': 7.0},
+            {'action': 'sort_waste', 'correct': True},
+        ]}, callback=True)
+    assert [result['error'] for result in ack['results']] == ['Erreur interne', None]
+    assert "Erreur action 'adjust_ph' de alice" in caplog.text and 'RuntimeError: panne' in caplog.text
+    # L'action réussie du lot est tout de même publiée
+    assert any(m['name'] == 'state_delta' for m in water_socket.get_received())
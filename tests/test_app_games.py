@@ -0,0 +1,57 @@
+"""Parties multiples: chaque session, état et diffusion est limité à sa partie"""
+
+
+def player_names(client):
+    return [p['username'] for p in client.get('/api/poll_status').get_json()['players']]
+
+
+def test_same_username_allowed_in_different_games(login, game_code):
+    login('alice', game_code)
+    login('alice', game_code + '-b')
+
+
+def test_same_username_refused_in_same_game(game_app, login, game_code):
+    login('alice', game_code)
+    response = game_app.app.test_client().post('/login', data={'username': 'alice', 'game': game_code})
+    assert response.status_code == 200
+    assert 'déjà pris' in response.get_data(as_text=True)
+
+
+def test_players_and_rooms_are_scoped_by_game(login, connect, game_code):
+    first = login('alice', game_code)
+    login('bob', game_code)
+    other = login('carol', game_code + '-b')
+    assert player_names(first) == ['alice', 'bob']
+    assert player_names(other) == ['carol']
+
+    connect(first).emit('select_room', {'room': 'Energie'})
+    rooms = {r['name']: r['assigned_player'] for r in first.get('/api/poll_status').get_json()['rooms']}
+    assert rooms['Energie'] == 'alice'
+    rooms = {r['name']: r['assigned_player'] for r in other.get('/api/poll_status').get_json()['rooms']}
+    assert rooms['Energie'] is None
+
+
+def test_chat_is_scoped_by_game(login, game_code):
+    first = login('alice', game_code)
+    other = login('carol', game_code + '-b')
+    assert first.post('/api/chat/send', json={'message': 'bonjour'}).status_code == 200
+    assert [m['message'] for m in first.get('/api/chat/messages').get_json()['messages']] == ['bonjour']
+    assert other.get('/api/chat/messages').get_json()['messages'] == []
+
+
+def test_state_deltas_are_broadcast_to_own_game_only(login, connect, game_code):
+    first, second = login('alice', game_code), login('bob', game_code)
+    other = login('carol', game_code + '-b')
+    sockets = [connect(client) for client in (first, second, other)]
+    for socket in sockets:
+        socket.get_received()
+    sockets[0].emit('select_room', {'room': 'Eau'})
+    received = [[m['name'] for m in socket.get_received()] for socket in sockets]
+    assert 'state_delta' in received[1]
+    assert 'state_delta' not in received[2]
+
+
+def test_pages_require_login(game_app):
+    client = game_app.app.test_client()
+    assert client.get('/lobby').status_code == 302
+    assert client.get('/api/poll_status').status_code == 401
@@ -0,0 +1,76 @@
+import json
+import os
+
+import eventlet
+
+from archive import archive_path, list_archives, read_archive
+from conftest import EXPORT_TOKEN
+from export import merge_unique
+
+AUTH = {'Authorization': f'Bearer {EXPORT_TOKEN}'}
+
+
+def wait_archived(game_app, game_id):
+    """Attend la fin de l'archivage et de la purge en arrière-plan"""
+    path = archive_path(game_app.app.config['ARCHIVE_DIR'], game_id)
+    with eventlet.Timeout(5):
+        while len(game_app.archiver) or not os.path.exists(path):
+            eventlet.sleep(0.01)
+    return path
+
+
+def reset(game_app, login, code):
+    client = login('alice', code)
+    client.post('/api/chat/send', json={'message': 'avant reset'})
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=code).one().id
+    assert client.post('/reset_game').status_code == 200
+    return game_id, wait_archived(game_app, game_id)
+
+
+def test_list_archives_ignores_unfinished_files(tmp_path):
+    for name in ('game-12.ndjson.gz', 'game-3.ndjson.gz', 'game-4.ndjson.gz.tmp', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+    assert list_archives(str(tmp_path)) == [(3, str(tmp_path / 'game-3.ndjson.gz')),
+                                            (12, str(tmp_path / 'game-12.ndjson.gz'))]
+    assert list_archives(str(tmp_path / 'absent')) == []
+
+
+def test_merge_unique_emits_rows_still_in_db_once():
+    archived = [{'id': 1, 'src': 'archive'}, {'id': 2, 'src': 'archive'}]
+    live = [{'id': 2, 'src': 'db'}, {'id': 5, 'src': 'db'}]
+    rows = list(merge_unique(iter(archived), iter(live), key=lambda row: row['id']))
+    assert [(row['id'], row['src']) for row in rows] == [(1, 'archive'), (2, 'archive'), (5, 'db')]
+
+
+def test_reset_archives_then_purges_old_generation(game_app, login, game_code):
+    game_id, path = reset(game_app, login, game_code)
+    tables = [table for table, _ in read_archive(path)]
+    assert tables[0] == 'game' and {'game_info', 'room_status', 'game_state', 'user', 'chat_message'} <= set(tables)
+    with game_app.app.app_context():
+        assert game_app.db.session.get(game_app.Game, game_id) is None
+        assert game_app.ChatMessage.query.filter_by(game_id=game_id).count() == 0
+        # Le code désigne la nouvelle génération
+        assert game_app.Game.query.filter_by(code=game_code).one().id != game_id
+
+
+def test_exports_include_archived_generations(game_app, login, game_code):
+    game_id, _ = reset(game_app, login, game_code)
+    login('alice', game_code).post('/api/chat/send', json={'message': 'après reset'})
+    client = game_app.app.test_client()
+
+    def export(dataset, **params):
+        response = client.get(f'/api/export/{dataset}', query_string=params, headers=AUTH)
+        assert response.status_code == 200
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    chat = [(row['game_id'], row['message']) for row in export('chat') if row['username'] == 'alice']
+    old_messages = [message for gid, message in chat if gid == game_id]
+    assert old_messages == ['avant reset'] and 'après reset' in [message for _, message in chat]
+    assert [row['game_id'] for row in export('chat')] == sorted(row['game_id'] for row in export('chat'))
+
+    [old_game] = export('games', game=game_id)
+    assert old_game['code'] == f'#{game_id}' and old_game['game_started'] == 'false'
+    # Les bornes de date s'appliquent aussi aux lignes archivées
+    assert export('chat', game=game_id, since=old_game['created_at'])[0]['message'] == 'avant reset'
+    assert export('chat', game=game_id, until=old_game['created_at']) == []
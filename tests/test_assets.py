@@ -0,0 +1,60 @@
+import gzip
+import json
+
+from flask import Flask, render_template_string
+
+import assets
+
+
+def make_static(tmp_path):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'beep.mp3').write_bytes(b'\x00ID3' + bytes(range(256)) * 4)
+    (static / 'style.css').write_text('body { background: url(/static/beep.mp3) url(/static/absent.png); }\n' * 20)
+    return static
+
+
+def test_build_hashes_rewrites_and_compresses(tmp_path):
+    static = make_static(tmp_path)
+    manifest = assets.build(str(static))
+    build = static / assets.BUILD_DIRNAME
+    assert json.loads((build / assets.MANIFEST_NAME).read_text()) == manifest
+    css = (build / manifest['style.css']).read_text()
+    assert f'/assets/{manifest["beep.mp3"]}' in css and '/static/absent.png' in css
+    assert gzip.decompress((build / (manifest['style.css'] + '.gz')).read_bytes()).decode() == css
+    assert not (build / (manifest['beep.mp3'] + '.gz')).exists()
+    # Même contenu, même nom: les constructions sont reproductibles
+    assert assets.build(str(static)) == manifest
+
+
+def make_app(static):
+    app = Flask(__name__, static_folder=str(static))
+    return app, assets.AssetPipeline(app)
+
+
+def test_pipeline_serves_variants_with_immutable_cache(tmp_path):
+    static = make_static(tmp_path)
+    manifest = assets.build(str(static))
+    app, pipeline = make_app(static)
+    client = app.test_client()
+
+    hashed = manifest['style.css']
+    response = client.get(f'/assets/{hashed}', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip' and response.headers['Vary'] == 'Accept-Encoding'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'Content-Encoding' not in client.get(f'/assets/{hashed}').headers
+
+    partial = client.get(f'/assets/{manifest["beep.mp3"]}', headers={'Range': 'bytes=0-3'})
+    assert partial.status_code == 206 and partial.data == b'\x00ID3'
+    assert client.get('/assets/style.css').status_code == 404
+
+
+def test_asset_url_falls_back_to_static_without_build(tmp_path):
+    static = make_static(tmp_path)
+    app, pipeline = make_app(static)
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('style.css') }}") == '/static/style.css'
+        assets.build(str(static))
+        pipeline.load()
+        assert render_template_string("{{ asset_url('style.css') }}") == f'/assets/{pipeline.manifest["style.css"]}'
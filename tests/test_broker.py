@@ -0,0 +1,86 @@
+import socket
+
+import eventlet
+import pytest
+
+from broker import Broker, BrokerClient, create_bus, decode_frame, encode_frame
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def broker_url():
+    port = free_port()
+    server = eventlet.spawn(Broker().serve, '127.0.0.1', port)
+    eventlet.sleep(0.01)
+    yield f'broker://127.0.0.1:{port}'
+    server.kill()
+
+
+def receive(client, channels, count, received):
+    for message in client.listen(channels):
+        received.append(message)
+        if len(received) == count:
+            return
+
+
+def test_decode_frame_rejects_malformed_lines():
+    assert decode_frame(encode_frame({'channel': 'c', 'data': 1})) == {'channel': 'c', 'data': 1}
+    assert decode_frame(b'{"channel": "c", "da') is None
+    assert decode_frame(b'[1, 2]') is None
+    assert decode_frame(b'{"data": 1}') is None
+
+
+def test_publish_reaches_subscribers_of_the_channel(broker_url):
+    received = []
+    listener = eventlet.spawn(receive, BrokerClient(broker_url), ['a'], 2, received)
+    eventlet.sleep(0.05)
+    publisher = BrokerClient(broker_url)
+    publisher.publish('b', {'n': 0})
+    publisher.publish('a', {'n': 1})
+    publisher.publish('a', {'n': 2})
+    with eventlet.Timeout(2):
+        listener.wait()
+    assert received == [('a', {'n': 1}), ('a', {'n': 2})]
+
+
+def test_broker_skips_malformed_frames_and_keeps_the_connection(broker_url):
+    received = []
+    listener = eventlet.spawn(receive, BrokerClient(broker_url), ['a'], 1, received)
+    eventlet.sleep(0.05)
+    sock = eventlet.connect(BrokerClient(broker_url).address)
+    sock.sendall(b'{"op": "pub", "chan\n')
+    sock.sendall(encode_frame({'op': 'pub', 'channel': 'a', 'data': 'ok'}))
+    with eventlet.Timeout(2):
+        listener.wait()
+    assert received == [('a', 'ok')]
+    sock.close()
+
+
+def test_client_skips_malformed_frames_and_keeps_listening():
+    port = free_port()
+    server = eventlet.listen(('127.0.0.1', port))
+
+    def serve():
+        sock, _ = server.accept()
+        sock.makefile('rb').readline()
+        sock.sendall(b'not json\n' + b'{"channel": "a", "data": 1}\n')
+        eventlet.sleep(1)
+
+    eventlet.spawn(serve)
+    received = []
+    listener = eventlet.spawn(receive, BrokerClient(f'broker://127.0.0.1:{port}'), ['a'], 1, received)
+    with eventlet.Timeout(2):
+        listener.wait()
+    assert received == [('a', 1)]
+    server.close()
+
+
+def test_create_bus_rejects_unknown_scheme():
+    assert isinstance(create_bus('broker://127.0.0.1:5555'), BrokerClient)
+    with pytest.raises(ValueError):
+        create_bus('amqp://localhost')
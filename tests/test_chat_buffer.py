@@ -0,0 +1,88 @@
+import eventlet
+
+from chat_buffer import ChatBuffer, ChatHub
+
+
+def message(message_id):
+    return {'id': message_id, 'username': 'a', 'message': f'm{message_id}'}
+
+
+def test_read_since_returns_newer_messages():
+    buffer = ChatBuffer([message(i) for i in (1, 2, 3)], size=5, complete=True)
+    assert buffer.read_since(1) == ([message(2), message(3)], True)
+    assert buffer.read_since(3) == ([], True)
+
+
+def test_read_since_older_than_buffer_is_not_covered():
+    buffer = ChatBuffer([message(i) for i in (5, 6)], size=2, complete=False)
+    messages, covered = buffer.read_since(2)
+    assert messages == [message(5), message(6)] and not covered
+    assert buffer.read_since(5) == ([message(6)], True)
+    assert buffer.oldest_id == 5
+
+
+def test_overflow_drops_oldest_and_completeness():
+    buffer = ChatBuffer([], size=2, complete=True)
+    assert buffer.read_since(0) == ([], True)
+    for i in (1, 2, 3):
+        buffer.append(message(i))
+    assert [m['id'] for m in buffer.messages] == [2, 3]
+    assert not buffer.read_since(0)[1]
+
+
+def test_wait_is_woken_by_append():
+    buffer = ChatBuffer([], size=5, complete=True)
+    eventlet.spawn_after(0.01, buffer.append, message(1))
+    waiter = eventlet.spawn(buffer.wait, 5)
+    with eventlet.Timeout(1):
+        waiter.wait()
+    assert buffer.read_since(0)[0] == [message(1)]
+
+
+def test_hub_loads_once_and_evict_wakes_waiters():
+    loads = []
+
+    def loader(game_id, limit):
+        loads.append((game_id, limit))
+        return [message(i) for i in range(1, 5)]
+
+    hub = ChatHub(loader, size=3)
+    assert hub.peek(1) is None
+    buffer = hub.get(1)
+    assert hub.get(1) is buffer and hub.peek(1) is buffer
+    assert loads == [(1, 4)]
+    # 4 messages pour un tampon de 3: l'historique n'est pas complet
+    assert [m['id'] for m in buffer.messages] == [2, 3, 4] and not buffer.complete
+
+    waiter = eventlet.spawn(buffer.wait, 5)
+    eventlet.sleep(0)
+    hub.evict(1)
+    with eventlet.Timeout(1):
+        waiter.wait()
+    assert hub.peek(1) is None
+
+
+# ---- Long-poll HTTP ----
+
+def test_long_poll_is_woken_by_new_message(login, game_code):
+    first, second = login('alice', game_code), login('bob', game_code)
+    waiter = eventlet.spawn(second.get, '/api/chat/messages?last_id=0&wait=5')
+    eventlet.sleep(0.05)
+    first.post('/api/chat/send', json={'message': 'bonjour'})
+    with eventlet.Timeout(2):
+        response = waiter.wait()
+    assert [m['message'] for m in response.get_json()['messages']] == ['bonjour']
+
+
+def test_long_poll_parked_during_reset_does_not_recreate_buffer(game_app, login, game_code):
+    first, second = login('alice', game_code), login('bob', game_code)
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    waiter = eventlet.spawn(second.get, '/api/chat/messages?last_id=0&wait=5')
+    eventlet.sleep(0.05)
+    assert game_id in game_app.chat_hub.buffers
+    assert first.post('/reset_game').status_code == 200
+    with eventlet.Timeout(2):
+        response = waiter.wait()
+    assert response.status_code == 410
+    assert game_id not in game_app.chat_hub.buffers
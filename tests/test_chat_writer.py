@@ -0,0 +1,51 @@
+import eventlet
+import pytest
+
+from chat_buffer import ChatWriter
+
+
+def test_writer_groups_concurrent_submissions():
+    batches, committed = [], []
+    next_id = iter(range(1, 100))
+
+    def inserter(batch):
+        batches.append(batch)
+        return [[{'id': next(next_id), 'username': user, 'message': text} for user, text in entries]
+                for _, entries in batch]
+
+    writer = ChatWriter(inserter, lambda game_id, messages: committed.append(game_id), window=0.02)
+    pile = eventlet.GreenPile()
+    pile.spawn(writer.submit, 1, [('a', 'x')])
+    pile.spawn(writer.submit, 2, [('b', 'y'), ('b', 'z')])
+    results = list(pile)
+    assert len(batches) == 1
+    assert [[m['id'] for m in messages] for messages in results] == [[1], [2, 3]]
+    assert committed == [1, 2]
+
+
+def test_writer_propagates_insert_errors():
+    def inserter(batch):
+        raise RuntimeError('BDD indisponible')
+
+    writer = ChatWriter(inserter, lambda game_id, messages: None, window=0)
+    with pytest.raises(RuntimeError):
+        writer.submit(1, [('a', 'x')])
+
+
+def test_app_groups_concurrent_chat_messages(game_app, login, game_code):
+    clients = [login(name, game_code) for name in ('alice', 'bob', 'carol')]
+    batches = []
+    inserter = game_app.chat_writer.inserter
+    game_app.chat_writer.inserter = lambda batch: batches.append(len(batch)) or inserter(batch)
+    try:
+        pile = eventlet.GreenPile()
+        for index, client in enumerate(clients):
+            pile.spawn(client.post, '/api/chat/send', json={'message': f'm{index}'})
+        responses = list(pile)
+    finally:
+        game_app.chat_writer.inserter = inserter
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert sum(batches) == 3 and len(batches) < 3
+    messages = clients[0].get('/api/chat/messages').get_json()['messages']
+    assert sorted(m['message'] for m in messages) == ['m0', 'm1', 'm2']
+    assert [m['id'] for m in messages] == sorted(m['id'] for m in messages)
@@ -0,0 +1,49 @@
+from state_store import GAUGE_THRESHOLD, LiveGame, RoomState
+
+
+def make_game(**states):
+    rooms = {'Energie': RoomState('Energie', is_locked=False), 'Eau': RoomState('Eau')}
+    return LiveGame(1, dict(states or {'energy_level': 60.0, 'air_o2': 60.0}), rooms, {})
+
+
+def test_counters_are_computed_on_load():
+    rooms = {'Energie': RoomState('Energie', is_completed=True), 'Eau': RoomState('Eau')}
+    game = LiveGame(1, {'energy_level': 10.0, 'air_o2': 30.0, 'flora_health': 80.0}, rooms, {})
+    assert game.completed_rooms == 1 and game.low_gauges == 2
+
+
+def test_update_room_tracks_completed_rooms():
+    game = make_game()
+    game.update_room('Energie', is_completed=True)
+    game.update_room('Energie', is_completed=True)
+    assert game.completed_rooms == 1 and not game.all_rooms_completed
+    game.update_room('Eau', is_completed=True)
+    assert game.all_rooms_completed
+    game.update_room('Eau', is_completed=False)
+    assert game.completed_rooms == 1
+
+
+def test_set_state_tracks_low_gauges_across_threshold():
+    game = make_game()
+    assert game.gauges_ok
+    game.set_state('energy_level', GAUGE_THRESHOLD - 1)
+    game.set_state('energy_level', GAUGE_THRESHOLD - 5)
+    assert game.low_gauges == 1
+    game.set_state('energy_level', GAUGE_THRESHOLD)
+    assert game.gauges_ok
+    # Nouvelle jauge: comptée sans valeur précédente
+    game.set_state('water_quality', 0.0)
+    assert game.low_gauges == 1
+
+
+def test_check_victory_reads_counters(game_app, login, game_code):
+    login('alice', game_code)
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    live = game_app.store.get(game_id)
+    for name in live.rooms:
+        live.update_room(name, is_completed=True)
+    for key in live.states:
+        live.set_state(key, 100.0)
+    game_app.check_victory(game_id)
+    assert live.get_info('game_result') == 'victory'
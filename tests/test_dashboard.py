@@ -0,0 +1,84 @@
+import eventlet
+import pytest
+
+from dashboard import DashboardAggregator
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+        self.payloads = []
+        self.fail = False
+
+    def summarize(self, game_ids):
+        self.calls.append(game_ids)
+        if self.fail:
+            raise RuntimeError('BDD indisponible')
+        return {game_id: None if game_id < 0 else {'game_id': game_id} for game_id in game_ids}
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def make_aggregator(recorder):
+    return DashboardAggregator(recorder.summarize, recorder.payloads.append, interval=0.01)
+
+
+def test_marks_are_ignored_until_started(recorder):
+    aggregator = make_aggregator(recorder)
+    aggregator.mark(1)
+    aggregator.mark_all([2, 3])
+    assert len(aggregator) == 0
+
+
+def test_marked_games_are_sent_once_per_tick(recorder):
+    aggregator = make_aggregator(recorder)
+    aggregator.start()
+    for _ in range(100):
+        aggregator.mark(2)
+        aggregator.mark(1)
+    aggregator.mark(-5)
+    eventlet.sleep(0.05)
+    assert recorder.calls == [[-5, 1, 2]]
+    [payload] = recorder.payloads
+    assert payload['games'] == [{'game_id': 1}, {'game_id': 2}] and payload['removed'] == [-5]
+    assert len(aggregator) == 0
+
+
+def test_summary_error_does_not_stop_the_loop(recorder):
+    aggregator = make_aggregator(recorder)
+    aggregator.start()
+    recorder.fail = True
+    aggregator.mark(1)
+    eventlet.sleep(0.05)
+    recorder.fail = False
+    aggregator.mark(2)
+    eventlet.sleep(0.05)
+    assert recorder.calls == [[1], [2]] and len(recorder.payloads) == 1
+
+
+def test_operator_receives_game_summaries(game_app, login, game_code, monkeypatch):
+    monkeypatch.setitem(game_app.app.config, 'OPERATOR_TOKEN', 'op-token')
+    client = game_app.app.test_client()
+    assert client.get('/operator?token=wrong').status_code == 403
+    assert client.get('/operator?token=op-token').status_code == 200
+    refused = game_app.socketio.test_client(game_app.app, namespace='/operator', auth={'token': 'wrong'})
+    assert not refused.is_connected('/operator')
+
+    game_app.dashboard.start()
+    login('alice', game_code)
+    operator = game_app.socketio.test_client(game_app.app, namespace='/operator', auth={'token': 'op-token'})
+    try:
+        with eventlet.Timeout(5):
+            while True:
+                eventlet.sleep(0.05)
+                games = [game for message in operator.get_received('/operator')
+                         if message['name'] == 'games_update' for game in message['args'][0]['games']]
+                summary = next((game for game in games if game['code'] == game_code), None)
+                if summary is not None:
+                    break
+        assert summary['game_started'] == 'false' and len(summary['rooms']) == 4
+    finally:
+        operator.disconnect(namespace='/operator')
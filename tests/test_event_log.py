@@ -0,0 +1,137 @@
+import copy
+import time
+
+import eventlet
+import pytest
+
+from event_log import EventLog, apply_event, replay
+
+
+def seed(energy=50.0):
+    return {'states': {'energy_level': energy, 'air_o2': 60.0},
+            'rooms': {'Energie': [False, False, None], 'Eau': [False, True, None]},
+            'info': {'game_started': 'false', 'game_end_time': ''}}
+
+
+# Chronologie de deux parties: (partie, type, données); seuls `seed` et `state` portent l'état
+TIMELINE = [
+    (1, 'seed', seed()),
+    (2, 'seed', seed(40.0)),
+    (1, 'select_room', {'user': 'a', 'room': 'Energie'}),
+    (1, 'state', {'states': {'energy_level': 60.0}, 'rooms': {'Energie': [True, False, 'a']}}),
+    (2, 'state', {'info': {'game_started': 'true'}}),
+    (1, 'chat', {'id': 1, 'user': 'a', 'message': 'salut'}),
+    (1, 'state', {'rooms': {'Eau': [False, False, None]}, 'info': {'game_result': 'victory'}}),
+    (2, 'state', {'states': {'air_o2': 75.0}}),
+]
+
+
+def expected_states(timeline):
+    """État attendu de chaque partie, calculé en mémoire comme le fait le serveur"""
+    games = {}
+    for game_id, kind, data in timeline:
+        games[game_id] = apply_event(games.get(game_id), kind, copy.deepcopy(data))
+    return games
+
+
+def write_log(directory, timeline, **options):
+    log = EventLog(str(directory), 'w0', **options)
+    log.recover()
+    for game_id, kind, data in timeline:
+        log.append(game_id, kind, data)
+    return log
+
+
+def test_apply_event_seed_then_state():
+    game = apply_event(None, 'seed', seed())
+    game = apply_event(game, 'state', {'states': {'energy_level': 70.0}, 'info': {'game_result': 'defeat'}})
+    assert game['states'] == {'energy_level': 70.0, 'air_o2': 60.0}
+    assert game['info']['game_result'] == 'defeat'
+    # Les autres événements ne touchent pas l'état
+    assert apply_event(game, 'chat', {'message': 'x'}) is game
+
+
+def test_replay_matches_live_state(tmp_path):
+    write_log(tmp_path, TIMELINE).close()
+    expected = expected_states(TIMELINE)
+    for game_id in (1, 2):
+        events = list(replay(str(tmp_path), game_id))
+        assert [event[3] for event, _ in events] == [kind for gid, kind, _ in TIMELINE if gid == game_id]
+        assert events[-1][1] == expected[game_id]
+
+
+def test_recover_returns_events_and_continues_numbering(tmp_path):
+    write_log(tmp_path, TIMELINE).close()
+    log = EventLog(str(tmp_path), 'w0')
+    snapshot, events = log.recover()
+    assert snapshot == {'seq': 0, 'games': {}}
+    assert [event[0] for event in events] == list(range(1, len(TIMELINE) + 1))
+    assert log.seq == len(TIMELINE)
+    # Un autre worker ne relit pas ces segments
+    assert EventLog(str(tmp_path), 'w1').recover()[1] == []
+
+
+def test_snapshot_plus_later_events_equals_full_replay(tmp_path):
+    live = {}
+
+    def snapshotter():
+        return copy.deepcopy(live)
+
+    head, tail = TIMELINE[:5], TIMELINE[5:]
+    log = write_log(tmp_path, [], snapshotter=snapshotter, fsync_interval=0.01, snapshot_interval=0.05)
+    for game_id, kind, data in head:
+        live[game_id] = apply_event(live.get(game_id), kind, copy.deepcopy(data))
+        log.append(game_id, kind, data)
+    eventlet.sleep(0.2)
+    for game_id, kind, data in tail:
+        live[game_id] = apply_event(live.get(game_id), kind, copy.deepcopy(data))
+        log.append(game_id, kind, data)
+    log.snapshotter = None
+    log.close()
+
+    snapshot, events = EventLog(str(tmp_path), 'w0').recover()
+    assert snapshot['seq'] >= len(head)
+    games = dict(snapshot['games'])
+    for seq, ts, game_id, kind, data in events:
+        games[game_id] = apply_event(games.get(game_id), kind, data)
+    assert games == expected_states(TIMELINE)
+    # La relecture complète (tous les segments) donne le même état
+    assert {game_id: list(replay(str(tmp_path), game_id))[-1][1] for game_id in (1, 2)} == games
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    write_log(tmp_path, TIMELINE).close()
+    segment = next(tmp_path.glob('w0-*.log'))
+    with open(segment, 'a', encoding='utf-8') as f:
+        f.write('[99,1.0,1,"state",{"sta')
+    snapshot, events = EventLog(str(tmp_path), 'w0').recover()
+    assert len(events) == len(TIMELINE)
+
+
+def test_sync_waits_for_appended_events_without_batch_delay(tmp_path):
+    log = write_log(tmp_path, TIMELINE[:3], fsync_interval=5.0)
+    started = time.monotonic()
+    log.sync()
+    assert time.monotonic() - started < 1.0
+    assert log.synced_seq == 3
+    assert len(EventLog(str(tmp_path), 'w0').recover()[1]) == 3
+    # Rien de nouveau: pas d'aller-retour par le greenlet
+    log.sync()
+    log.close()
+
+
+def test_sync_raises_write_errors(tmp_path, monkeypatch):
+    log = write_log(tmp_path, TIMELINE[:1])
+    write = log._write
+
+    def failing_write(lines):
+        raise OSError('disque plein')
+    monkeypatch.setattr(log, '_write', failing_write)
+    with pytest.raises(OSError):
+        log.sync()
+    assert log.synced_seq == 0
+    monkeypatch.setattr(log, '_write', write)
+    log.append(1, 'chat', {'message': 'x'})
+    log.sync()
+    log.close()
+    assert [event[3] for event in EventLog(str(tmp_path), 'w0').recover()[1]] == ['chat']
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import EXPORT_TOKEN
+from export import Filters, parse_datetime, parse_game_ids
+
+AUTH = {'Authorization': f'Bearer {EXPORT_TOKEN}'}
+
+
+def test_parse_datetime_converts_offsets_to_naive_utc():
+    assert parse_datetime('2026-10-01T12:00:00+02:00') == datetime(2026, 10, 1, 10, 0)
+    assert parse_datetime('2026-10-01T12:00:00Z') == datetime(2026, 10, 1, 12, 0)
+    assert parse_datetime('2026-10-01') == datetime(2026, 10, 1)
+    assert parse_datetime('') is None
+    with pytest.raises(ValueError):
+        parse_datetime('hier')
+
+
+def test_parse_game_ids_rejects_non_numeric_ids():
+    assert parse_game_ids(['3', '12']) == [3, 12]
+    for bad in (['x'], ['-1'], ['3', '']):
+        with pytest.raises(ValueError):
+            parse_game_ids(bad)
+
+
+def test_filters_accept_half_open_range():
+    filters = Filters([1], datetime(2026, 10, 1), datetime(2026, 10, 2))
+    assert filters.accepts(1, datetime(2026, 10, 1))
+    assert not filters.accepts(1, datetime(2026, 10, 2))
+    assert not filters.accepts(2, datetime(2026, 10, 1, 12))
+
+
+def export(client, dataset, **params):
+    response = client.get(f'/api/export/{dataset}', query_string=params, headers=AUTH)
+    assert response.status_code == 200, response.data
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def game_id(game_app, code):
+    with game_app.app.app_context():
+        return game_app.Game.query.filter_by(code=code).one().id
+
+
+def test_export_requires_token_and_valid_parameters(game_app):
+    client = game_app.app.test_client()
+    assert client.get('/api/export/chat').status_code == 403
+    assert client.get('/api/export/chat?token=wrong').status_code == 403
+    assert client.get('/api/export/users', headers=AUTH).status_code == 404
+    assert client.get('/api/export/chat?format=xml', headers=AUTH).status_code == 400
+    # Un id invalide ne doit pas élargir l'export à toutes les parties
+    assert client.get('/api/export/chat?game=x', headers=AUTH).status_code == 400
+    assert client.get('/api/export/chat?since=hier', headers=AUTH).status_code == 400
+
+
+def test_chat_export_filters_by_game_and_offset_dates(game_app, login):
+    first_code, second_code = 't-export-a', 't-export-b'
+    login('alice', first_code).post('/api/chat/send', json={'message': 'bonjour'})
+    login('bob', second_code).post('/api/chat/send', json={'message': 'salut'})
+    first = game_id(game_app, first_code)
+    client = game_app.app.test_client()
+
+    rows = export(client, 'chat', game=first)
+    assert [(row['game_id'], row['username'], row['message']) for row in rows] == [(first, 'alice', 'bonjour')]
+
+    # Même instant exprimé avec un décalage: la borne est convertie en UTC
+    sent = datetime.fromisoformat(rows[0]['timestamp'])
+    local = (sent + timedelta(hours=2)).isoformat() + '+02:00'
+    assert export(client, 'chat', game=first, since=local) == rows
+    assert export(client, 'chat', game=first, until=local) == []
+
+
+def test_games_csv_export(game_app, login):
+    login('alice', 't-export-csv')
+    csv = game_app.app.test_client().get(
+        '/api/export/games', query_string={'format': 'csv', 'game': game_id(game_app, 't-export-csv')},
+        headers=AUTH)
+    assert csv.headers['Content-Disposition'] == 'attachment; filename=games.csv'
+    header, line = csv.get_data(as_text=True).splitlines()
+    assert header.split(',')[:3] == ['game_id', 'code', 'created_at']
+    assert ',t-export-csv,' in line
+
+
+def test_actions_export_reads_the_event_log(game_app, login, connect, game_code):
+    client = login('alice', game_code)
+    connect(client).emit('select_room', {'room': 'Energie'})
+    client.get('/game')
+    connect(client).emit('action', {'action': 'connect_cables', 'correct': True})
+    game_app.event_log.sync()
+    rows = export(game_app.app.test_client(), 'actions', game=game_id(game_app, game_code))
+    assert [(row['user'], row['room'], row['action'], row['feedback']) for row in rows] == [
+        ('alice', 'Energie', 'connect_cables', 'Réseau stable!')]
@@ -0,0 +1,38 @@
+from state_store import GAUGE_THRESHOLD, LiveGame, RoomState
+
+
+def make_game(**states):
+    rooms = {'Energie': RoomState('Energie', is_locked=False)}
+    return LiveGame(1, dict(states), rooms, {})
+
+
+def test_apply_deltas_clamps_and_tracks_counters():
+    game = make_game(energy_level=95.0, air_o2=10.0)
+    assert game.low_gauges == 1 and not game.gauges_ok
+    values = game.apply_deltas((('energy_level', +10), ('air_o2', +GAUGE_THRESHOLD)))
+    assert values == {'energy_level': 100, 'air_o2': 10.0 + GAUGE_THRESHOLD}
+    assert game.gauges_ok
+    game.apply_deltas((('energy_level', -200),))
+    assert game.states['energy_level'] == 0 and game.low_gauges == 1
+
+
+def test_apply_deltas_accepts_dict_items_and_custom_bounds():
+    game = make_game(energy_level=50.0)
+    values = game.apply_deltas({'energy_level': +40}.items(), low=10, high=80)
+    assert values == {'energy_level': 80}
+    assert 'energy_level' in game.dirty_states and 'energy_level' in game.changed_states
+
+
+def test_concurrent_actions_do_not_lose_updates(login, connect, game_code):
+    """Deux salles qui touchent la même jauge (air_co2): chaque variation compte"""
+    sockets = []
+    for username, room in (('alice', 'Energie'), ('bob', 'Air')):
+        client = login(username, game_code)
+        connect(client).emit('select_room', {'room': room})
+        client.get('/game')
+        sockets.append(connect(client))
+    sockets[0].emit('action', {'action': 'connect_cables', 'correct': True})
+    sockets[1].emit('action', {'action': 'identify_pollution_source', 'correct': True})
+    deltas = [m['args'][0] for m in sockets[0].get_received() if m['name'] == 'state_delta']
+    co2 = [d['game_states']['air_co2'] for d in deltas if 'air_co2' in d.get('game_states', {})]
+    assert co2[-1] == 40.0 - 5 - 30
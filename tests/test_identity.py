@@ -0,0 +1,92 @@
+import pytest
+
+from identity import Identity, IdentityCache
+
+
+class Users:
+    def __init__(self):
+        self.rows = {1: (10, 'a'), 2: (10, 'b'), 3: (20, 'a')}
+        self.loads = []
+
+    def load(self, user_id):
+        self.loads.append(user_id)
+        row = self.rows.get(user_id)
+        return Identity(user_id, *row) if row else None
+
+
+@pytest.fixture
+def users():
+    return Users()
+
+
+def test_get_is_served_from_cache(users, clock):
+    cache = IdentityCache(users.load, clock=clock)
+    assert cache.get(1).username == 'a'
+    assert cache.get(1) is cache.get(1)
+    assert users.loads == [1]
+    assert cache.get(None) is None
+
+
+def test_entries_expire_after_ttl(users, clock):
+    cache = IdentityCache(users.load, ttl=10, clock=clock)
+    cache.get(1)
+    clock.advance(9)
+    cache.get(1)
+    clock.advance(2)
+    cache.get(1)
+    assert users.loads == [1, 1]
+
+
+def test_missing_users_are_not_cached(users, clock):
+    cache = IdentityCache(users.load, clock=clock)
+    assert cache.get(99) is None
+    assert cache.get(99) is None
+    assert users.loads == [99, 99] and len(cache) == 0
+    # Joueur supprimé en BDD (éviction): l'entrée expirée disparaît au rechargement
+    cache = IdentityCache(users.load, ttl=1, clock=clock)
+    cache.get(1)
+    del users.rows[1]
+    clock.advance(2)
+    assert cache.get(1) is None and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_dropped(users, clock):
+    cache = IdentityCache(users.load, max_size=2, clock=clock)
+    cache.get(1)
+    cache.get(2)
+    cache.get(1)
+    cache.get(3)
+    assert len(cache) == 2
+    cache.get(1)
+    cache.get(2)
+    assert users.loads == [1, 2, 3, 2]
+
+
+def test_update_reports_committed_writes(users, clock):
+    cache = IdentityCache(users.load, clock=clock)
+    cache.get(1)
+    cache.update(1, room='Eau', is_ready=True)
+    assert (cache.get(1).room, cache.get(1).is_ready) == ('Eau', True)
+    assert cache.update(42, room='Eau') is None
+
+
+def test_invalidate_game_or_single_player(users, clock):
+    cache = IdentityCache(users.load, clock=clock)
+    for user_id in (1, 2, 3):
+        cache.get(user_id)
+    cache.invalidate_game(10, 'a')
+    assert len(cache) == 2
+    cache.invalidate_game(10)
+    assert len(cache) == 1
+    cache.invalidate(3)
+    assert len(cache) == 0
+
+
+def test_app_requests_reuse_cached_identity(game_app, login, game_code, monkeypatch):
+    client = login('alice', game_code)
+    loads = []
+    load = game_app.identities.load
+    monkeypatch.setattr(game_app.identities, 'load', lambda user_id: loads.append(user_id) or load(user_id))
+    for _ in range(3):
+        assert client.get('/api/poll_status').status_code == 200
+    assert len(loads) <= 1
@@ -0,0 +1,49 @@
+from conftest import EXPORT_TOKEN
+from metrics import Counter, Histogram, Registry, SampledGauge
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency', 'Durée', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(('/game',), value)
+    samples = dict(histogram.samples())
+    assert samples['latency_bucket{route="/game",le="0.1"}'] == 2
+    assert samples['latency_bucket{route="/game",le="1.0"}'] == 3
+    assert samples['latency_bucket{route="/game",le="+Inf"}'] == 4
+    assert samples['latency_count{route="/game"}'] == 4
+    assert samples['latency_sum{route="/game"}'] == 3.65
+
+
+def test_counter_escapes_label_values():
+    counter = Counter('refused', 'Refus', ('key',))
+    counter.inc(('a"b',))
+    counter.inc(('a"b',), 2)
+    assert dict(counter.samples()) == {'refused{key="a\\"b"}': 3}
+
+
+def test_sampled_gauge_recomputes_once_per_interval(clock):
+    calls = []
+    gauge = SampledGauge('greenlets', 'Greenlets', lambda: calls.append(1) or len(calls),
+                         interval=10, clock=clock)
+    assert list(gauge.samples()) == [('greenlets', 1)]
+    clock.advance(5)
+    assert list(gauge.samples()) == [('greenlets', 1)]
+    clock.advance(5)
+    assert list(gauge.samples()) == [('greenlets', 2)]
+
+
+def test_registry_renders_help_and_type():
+    registry = Registry()
+    registry.add(Counter('hits', 'Appels')).inc(())
+    assert registry.render() == '# HELP hits Appels\n# TYPE hits counter\nhits 1\n'
+
+
+def test_metrics_endpoint_requires_token(game_app):
+    client = game_app.app.test_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics?token=wrong').status_code == 403
+    response = client.get('/metrics', headers={'Authorization': f'Bearer {EXPORT_TOKEN}'})
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'games_active ' in body
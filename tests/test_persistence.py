@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table, create_engine, inspect, select
+
+import persistence
+
+
+def make_metadata():
+    metadata = MetaData()
+    Table('game', metadata, Column('id', Integer, primary_key=True), Column('code', String(20)))
+    Table('user', metadata, Column('id', Integer, primary_key=True),
+          Column('game_id', Integer, ForeignKey('game.id')), Column('username', String(80)),
+          Index('ix_user_game', 'game_id'))
+    Table('chat_message', metadata, Column('id', Integer, primary_key=True),
+          Column('game_id', Integer, ForeignKey('game.id')), Column('message', String(200)))
+    return metadata
+
+
+def sqlite_engine(tmp_path, name):
+    url = f'sqlite:///{tmp_path / name}'
+    engine = create_engine(url, **persistence.engine_options(url))
+    persistence.configure_engine(engine)
+    return engine
+
+
+def test_engine_options_per_backend():
+    sqlite = persistence.engine_options('sqlite:///instance/database.db', busy_timeout_ms=2000)
+    assert sqlite['max_overflow'] == -1
+    assert sqlite['connect_args'] == {'timeout': 2.0, 'check_same_thread': False}
+    assert persistence.engine_options('sqlite://') == {}
+    postgres = persistence.engine_options('postgresql://jeu@localhost/jeu', pool_size=4)
+    assert postgres['pool_size'] == 4 and postgres['pool_pre_ping'] and 'connect_args' not in postgres
+
+
+def test_sqlite_connections_use_wal_and_incremental_vacuum(tmp_path):
+    engine = sqlite_engine(tmp_path, 'pragmas.db')
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        assert connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() == 2
+        assert connection.exec_driver_sql('PRAGMA busy_timeout').scalar() == 5000
+    engine.dispose()
+
+
+def test_ensure_indexes_adds_missing_index_to_existing_table(tmp_path):
+    engine = sqlite_engine(tmp_path, 'indexes.db')
+    metadata = make_metadata()
+    with persistence.schema_transaction(engine) as connection:
+        metadata.create_all(connection)
+        connection.exec_driver_sql('DROP INDEX ix_user_game')
+    with persistence.schema_transaction(engine) as connection:
+        persistence.ensure_indexes(metadata, connection)
+        persistence.ensure_indexes(metadata, connection)
+    assert [index['name'] for index in inspect(engine).get_indexes('user')] == ['ix_user_game']
+    engine.dispose()
+
+
+def test_copy_database_refuses_filled_target_unless_forced(tmp_path):
+    metadata = make_metadata()
+    source = sqlite_engine(tmp_path, 'source.db')
+    target = sqlite_engine(tmp_path, 'target.db')
+    for engine in (source, target):
+        metadata.create_all(engine)
+    with source.begin() as connection:
+        connection.execute(metadata.tables['game'].insert(), [{'id': 1, 'code': 'a'}, {'id': 2, 'code': 'b'}])
+        connection.execute(metadata.tables['user'].insert(), [{'id': 1, 'game_id': 2, 'username': 'alice'}])
+    persistence.copy_database(metadata, str(source.url), target)
+    with target.connect() as connection:
+        assert connection.execute(select(metadata.tables['user'].c.username)).scalars().all() == ['alice']
+    with pytest.raises(RuntimeError):
+        persistence.copy_database(metadata, str(source.url), target)
+    persistence.copy_database(metadata, str(source.url), target, force=True)
+    with target.connect() as connection:
+        assert len(connection.execute(select(metadata.tables['game'])).all()) == 2
+    source.dispose()
+    target.dispose()
+
+
+def test_init_db_is_idempotent(game_app):
+    game_app.init_db()
+    game_app.init_db()
+    with game_app.app.app_context():
+        assert game_app.Game.query.filter_by(code=game_app.DEFAULT_GAME_CODE).count() == 1
@@ -0,0 +1,44 @@
+"""/api/poll_status: snapshot pré-sérialisé, ETag et 304"""
+
+
+def test_unchanged_state_answers_304(login, game_code):
+    client = login('alice', game_code)
+    first = client.get('/api/poll_status')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+    again = client.get('/api/poll_status', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.data == b''
+
+
+def test_state_change_invalidates_etag(login, connect, game_code):
+    client = login('alice', game_code)
+    etag = client.get('/api/poll_status').headers['ETag']
+    connect(client).emit('select_room', {'room': 'Energie'})
+    response = client.get('/api/poll_status', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    rooms = {r['name']: r['assigned_player'] for r in response.get_json()['rooms']}
+    assert rooms['Energie'] == 'alice'
+
+
+def test_etag_is_per_player(login, connect, game_code):
+    first, second = login('alice', game_code), login('bob', game_code)
+    socket = connect(first)
+    socket.emit('select_room', {'room': 'Energie'})
+    socket.emit('player_ready')
+    body = first.get('/api/poll_status')
+    other = second.get('/api/poll_status')
+    # Le corps partagé est le même, mais `can_access_game` est propre au joueur
+    assert body.get_json()['can_access_game'] is True
+    assert other.get_json()['can_access_game'] is False
+    assert body.headers['ETag'] != other.headers['ETag']
+    assert second.get('/api/poll_status', headers={'If-None-Match': body.headers['ETag']}).status_code == 200
+
+
+def test_snapshot_is_serialised_once_per_write(game_app, login, game_code):
+    client = login('alice', game_code)
+    client.get('/api/poll_status')
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    cached = game_app.store.get(game_id).snapshot_cache
+    client.get('/api/poll_status')
+    assert game_app.store.get(game_id).snapshot_cache is cached
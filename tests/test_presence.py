@@ -0,0 +1,79 @@
+import eventlet
+
+from presence import PresenceTracker
+
+
+def make_tracker(grace=60.0, sweep_interval=5.0):
+    evicted = []
+    return PresenceTracker(evicted.append, grace=grace, sweep_interval=sweep_interval), evicted
+
+
+def test_join_is_idempotent_and_lists_players_in_arrival_order():
+    tracker, _ = make_tracker()
+    first = tracker.join(1, 'a')
+    tracker.join(1, 'b')
+    assert tracker.join(1, 'a') is first
+    assert [p.username for p in tracker.players(1)] == ['a', 'b']
+    assert tracker.players(2) == [] and len(tracker) == 2
+
+
+def test_ready_count_follows_room_and_ready_state():
+    tracker, _ = make_tracker()
+    tracker.join(1, 'a', room='Eau', is_ready=True)
+    tracker.join(1, 'b', is_ready=True)
+    assert tracker.ready_count(1) == 1
+    tracker.update(1, 'b', room='Air')
+    assert tracker.ready_count(1) == 2
+    tracker.update(1, 'a', is_ready=False)
+    tracker.leave(1, 'b')
+    assert tracker.ready_count(1) == 0
+
+
+def test_sockets_are_attached_to_their_player():
+    tracker, _ = make_tracker()
+    player = tracker.join(1, 'a')
+    tracker.connect('sid1', player)
+    tracker.connect('sid2', player)
+    assert tracker.heartbeat('sid1') is player
+    assert tracker.disconnect('sid1') is player
+    assert player.sids == {'sid2'}
+    assert tracker.heartbeat('sid1') is None
+
+
+def test_drop_game_forgets_players_and_sockets():
+    tracker, _ = make_tracker()
+    tracker.connect('sid', tracker.join(1, 'a', room='Eau', is_ready=True))
+    tracker.join(1, 'b')
+    tracker.join(2, 'a')
+    tracker.drop_game(1)
+    assert tracker.players(1) == [] and tracker.ready_count(1) == 0
+    assert tracker.heartbeat('sid') is None
+    assert len(tracker) == 1
+
+
+def test_silent_players_are_evicted_after_grace():
+    tracker, evicted = make_tracker(grace=0.1, sweep_interval=0.02)
+    tracker.connect('sid-a', tracker.join(1, 'a'))
+    tracker.join(1, 'b')
+    for _ in range(8):
+        eventlet.sleep(0.03)
+        tracker.heartbeat('sid-a')
+    assert [p.username for p in evicted] == ['b']
+    assert [p.username for p in tracker.players(1)] == ['a']
+    eventlet.sleep(0.25)
+    assert [p.username for p in evicted] == ['b', 'a']
+    assert len(tracker) == 0 and tracker.heartbeat('sid-a') is None
+
+
+def test_evicted_player_must_log_in_again(game_app, login, connect, game_code):
+    client = login('alice', game_code)
+    connect(client).emit('select_room', {'room': 'Energie'})
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    player = game_app.presence.get(game_id, 'alice')
+    assert client.get('/api/poll_status').status_code == 200
+    # Ce que fait le balayage après le délai de grâce
+    game_app.presence.leave(game_id, 'alice')
+    game_app.evict_player(player)
+    assert client.get('/api/poll_status').status_code == 401
+    assert game_app.store.get(game_id).get_room('Energie').assigned_player is None
@@ -0,0 +1,91 @@
+import pytest
+
+from puzzle_rules import NOTHING, RULES, compile_rules
+from state_store import LiveGame, RoomState
+
+GAUGES = {'energy_level': 50.0, 'water_pollution': 30.0, 'air_co2': 40.0, 'air_o2': 60.0, 'flora_health': 60.0}
+DISPATCH = compile_rules(RULES, GAUGES)
+
+
+def make_game(**states):
+    rooms = {name: RoomState(name) for name in ('Energie', 'Eau', 'Air', 'Flore')}
+    return LiveGame(1, dict(GAUGES, **states), rooms, {})
+
+
+def run(game, room, action, **data):
+    return DISPATCH[(room, action)](game, dict(data, action=action))
+
+
+def test_correct_action_applies_deltas_and_completes():
+    game = make_game(energy_level=40.0)
+    outcome = run(game, 'Energie', 'connect_cables', correct=True)
+    assert outcome.feedback == 'Réseau stable!' and not outcome.completed
+    assert (game.states['energy_level'], game.states['air_co2']) == (50.0, 35.0)
+    outcome = run(game, 'Energie', 'connect_cables', correct=True)
+    assert outcome.completed and outcome.completion['unlock_next']
+
+
+def test_deltas_are_clamped_to_gauge_range():
+    game = make_game(water_pollution=2.0)
+    run(game, 'Eau', 'sort_waste', correct=True)
+    assert game.states['water_pollution'] == 0
+
+
+def test_error_branch_leaves_gauges_untouched():
+    game = make_game()
+    outcome = run(game, 'Eau', 'validate_chemical', ph=7.0)
+    assert outcome.error == 'Valeurs manquantes'
+    assert game.states == GAUGES and not game.is_dirty
+
+
+def test_message_templates_and_functions():
+    game = make_game()
+    assert run(game, 'Eau', 'adjust_ph', value=6.95).feedback == 'pH ajusté à 7.0'
+    assert run(game, 'Eau', 'validate_chemical', ph=5.0, o2=8.0).feedback == 'Déséquilibre: pH incorrect '
+    assert run(game, 'Flore', 'select_plant', plant='oxygen_plant').feedback == 'Plante oxygen_plant choisie!'
+
+
+def test_completion_depends_on_gauges():
+    assert run(make_game(water_pollution=20.0), 'Eau', 'complete_water').error == 'Pollution encore trop élevée'
+    outcome = run(make_game(water_pollution=10.0), 'Eau', 'complete_water')
+    assert outcome.completed and outcome.completion['unlock_next']
+
+
+def test_unmatched_branch_does_nothing():
+    game = make_game()
+    assert run(game, 'Air', 'identify_pollution_source', correct=False) is NOTHING
+    assert run(game, 'Flore', 'select_plant', plant='cactus') is NOTHING
+    assert not game.is_dirty
+
+
+def test_unknown_gauge_is_rejected_at_compile_time():
+    rules = {('Eau', 'x'): {'branch': lambda data, states: 'a',
+                            'branches': {'a': {'deltas': {'unknown': 1}}}}}
+    with pytest.raises(ValueError):
+        compile_rules(rules, GAUGES)
+
+
+# ---- Actions Socket.IO ----
+
+def enter_room(login, connect, game_code, room):
+    """Joueur dans sa salle: la session porte la salle après GET /game, d'où le second socket"""
+    client = login('alice', game_code)
+    connect(client).emit('select_room', {'room': room})
+    assert client.get('/game').status_code == 200
+    return connect(client)
+
+
+def test_action_runs_compiled_rule(game_app, login, connect, game_code):
+    socket = enter_room(login, connect, game_code, 'Energie')
+    socket.get_received()
+    socket.emit('action', {'action': 'connect_cables', 'correct': True})
+    received = {m['name']: m['args'][0] for m in socket.get_received()}
+    assert received['feedback'] == {'message': 'Réseau stable!'}
+    assert received['state_delta']['game_states']['energy_level'] == 60.0
+
+
+def test_action_outside_own_room_is_refused(login, connect, game_code):
+    socket = enter_room(login, connect, game_code, 'Energie')
+    socket.get_received()
+    socket.emit('action', {'action': 'sort_waste', 'correct': True})
+    assert [m['name'] for m in socket.get_received()] == []
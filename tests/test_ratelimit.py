@@ -0,0 +1,123 @@
+import eventlet
+import pytest
+
+from ratelimit import DEFAULT_LIMITS, RateLimiter, load_limits
+
+
+def test_bucket_allows_capacity_then_refuses(clock):
+    limiter = RateLimiter({'chat': {'user': (1, 3)}}, clock=clock)
+    assert [limiter.check('chat', 1, 'a') for _ in range(3)] == [None, None, None]
+    refused = limiter.check('chat', 1, 'a')
+    assert refused.limit == 'chat' and refused.scope == 'user'
+    assert refused.retry_after == pytest.approx(1.0)
+
+
+def test_bucket_refills_at_rate(clock):
+    limiter = RateLimiter({'chat': {'user': (2, 2)}}, clock=clock)
+    limiter.check('chat', 1, 'a')
+    limiter.check('chat', 1, 'a')
+    assert limiter.check('chat', 1, 'a') is not None
+    clock.advance(0.5)
+    assert limiter.check('chat', 1, 'a') is None
+    assert limiter.check('chat', 1, 'a') is not None
+
+
+def test_buckets_are_per_player(clock):
+    limiter = RateLimiter({'chat': {'user': (1, 1)}}, clock=clock)
+    assert limiter.check('chat', 1, 'a') is None
+    assert limiter.check('chat', 1, 'a') is not None
+    assert limiter.check('chat', 1, 'b') is None
+    assert limiter.check('chat', 2, 'a') is None
+
+
+def test_user_and_game_buckets_are_debited_together(clock):
+    limiter = RateLimiter({'chat': {'user': (1, 5), 'game': (1, 2)}}, clock=clock)
+    assert limiter.check('chat', 1, 'a') is None
+    assert limiter.check('chat', 1, 'b') is None
+    refused = limiter.check('chat', 1, 'a')
+    assert refused.scope == 'game'
+    # Refus par la partie: le seau du joueur n'a pas été débité
+    assert limiter._buckets[('chat', 'user', (1, 'a'))].tokens == pytest.approx(4)
+
+
+def test_refusal_is_notified_once_per_episode(clock):
+    limiter = RateLimiter({'chat': {'user': (1, 1)}}, clock=clock)
+    limiter.check('chat', 1, 'a')
+    assert limiter.check('chat', 1, 'a').notify
+    assert not limiter.check('chat', 1, 'a').notify
+    clock.advance(1.0)
+    limiter.check('chat', 1, 'a')
+    assert limiter.check('chat', 1, 'a').notify
+
+
+def test_kind_specific_limit_overrides_generic_one(clock):
+    limiter = RateLimiter({'action': {'user': (1, 1)},
+                           'action:adjust_ph': {'user': (1, 3), 'coalesce': True}}, clock=clock)
+    assert limiter.rule('action', 'adjust_ph')[0] == 'action:adjust_ph'
+    assert limiter.rule('action', 'connect_cables')[0] == 'action'
+    for _ in range(3):
+        assert limiter.check('action', 1, 'a', 'adjust_ph') is None
+    refused = limiter.check('action', 1, 'a', 'adjust_ph')
+    assert refused.limit == 'action:adjust_ph' and refused.coalesce
+    assert limiter.check('action', 1, 'a', 'connect_cables') is None
+    assert not limiter.check('action', 1, 'a', 'connect_cables').coalesce
+
+
+def test_unknown_limit_is_not_limited(clock):
+    assert RateLimiter({}, clock=clock).check('chat', 1, 'a') is None
+
+
+def test_prune_forgets_full_buckets(clock):
+    limiter = RateLimiter({'chat': {'user': (1, 2)}}, clock=clock)
+    limiter.check('chat', 1, 'a')
+    limiter.check('chat', 1, 'b')
+    clock.advance(10)
+    limiter.prune()
+    assert len(limiter) == 0
+
+
+def test_defer_coalesces_to_last_call():
+    limiter = RateLimiter({})
+    calls = []
+    for value in (1, 2, 3):
+        limiter.defer(('adjust_ph', 'sid'), 0.02, calls.append, value)
+    limiter.defer(('adjust_o2', 'sid'), 0.02, calls.append, 'o2')
+    eventlet.sleep(0.1)
+    assert sorted(calls, key=str) == [3, 'o2']
+    # La clé est libérée après exécution: un nouvel appel est de nouveau différé
+    limiter.defer(('adjust_ph', 'sid'), 0.01, calls.append, 4)
+    eventlet.sleep(0.05)
+    assert calls[-1] == 4
+
+
+def test_deferred_call_errors_do_not_propagate(capsys):
+    limiter = RateLimiter({})
+
+    def fail():
+        raise RuntimeError('boom')
+
+    limiter.defer('key', 0.01, fail)
+    eventlet.sleep(0.05)
+    assert 'boom' in capsys.readouterr().out
+
+
+def test_load_limits_overrides():
+    assert load_limits() == DEFAULT_LIMITS
+    assert load_limits('off') == {}
+    limits = load_limits('{"chat": {"user": [0.5, 3]}, "sync_state": null}')
+    assert limits['chat'] == {'user': (0.5, 3)}
+    assert 'sync_state' not in limits
+    assert limits['action'] == DEFAULT_LIMITS['action']
+
+
+def test_chat_over_limit_gets_429_with_retry_after(game_app, login, game_code, monkeypatch, clock):
+    monkeypatch.setattr(game_app, 'rate_limiter', RateLimiter({'chat': {'user': (1, 2)}}, clock=clock))
+    client = login('alice', game_code)
+    statuses = [client.post('/api/chat/send', json={'message': f'm{i}'}).status_code for i in range(3)]
+    assert statuses == [200, 200, 429]
+    refused = client.post('/api/chat/send', json={'message': 'encore'})
+    assert refused.headers['Retry-After'] == '1' and refused.get_json()['retry_after'] == 1.0
+    # Un autre joueur de la partie a son propre seau
+    assert login('bob', game_code).post('/api/chat/send', json={'message': 'salut'}).status_code == 200
+    clock.advance(1)
+    assert client.post('/api/chat/send', json={'message': 'm3'}).status_code == 200
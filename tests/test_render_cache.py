@@ -0,0 +1,35 @@
+import os
+
+from flask import Flask, render_template
+
+from render_cache import SkeletonCache
+
+
+def make_app(tmp_path, auto_reload=False):
+    templates = tmp_path / 'templates'
+    templates.mkdir(exist_ok=True)
+    (templates / 'room.html').write_text('<h1>Salle</h1><p>Bonjour {{ username }} ({{ username }})</p>')
+    app = Flask(__name__, template_folder=str(templates))
+    app.jinja_env.auto_reload = auto_reload
+    return app, templates
+
+
+def test_render_matches_jinja_and_escapes_values(tmp_path):
+    app, _ = make_app(tmp_path)
+    cache = SkeletonCache(app)
+    with app.test_request_context():
+        for username in ('alice', '<b>bob</b> & "co"'):
+            assert cache.render('room.html', username=username) == render_template('room.html', username=username)
+    assert len(cache.skeletons) == 1
+
+
+def test_modified_template_is_rerendered_in_auto_reload(tmp_path):
+    app, templates = make_app(tmp_path, auto_reload=True)
+    cache = SkeletonCache(app)
+    with app.test_request_context():
+        assert cache.render('room.html', username='alice').startswith('<h1>Salle</h1>')
+        path = templates / 'room.html'
+        path.write_text('<h1>Énergie</h1>{{ username }}')
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        assert cache.render('room.html', username='alice') == '<h1>Énergie</h1>alice'
@@ -0,0 +1,129 @@
+import time
+
+import eventlet
+
+from scheduler import DeadlineScheduler
+
+
+def make_scheduler():
+    expired = []
+    return DeadlineScheduler(expired.append), expired
+
+
+def test_deadline_expires_once():
+    scheduler, expired = make_scheduler()
+    scheduler.schedule(1, time.time() + 0.02)
+    assert scheduler.is_scheduled(1)
+    eventlet.sleep(0.1)
+    assert expired == [1]
+    assert not scheduler.is_scheduled(1) and len(scheduler) == 0
+
+
+def test_cancel_prevents_expiry():
+    scheduler, expired = make_scheduler()
+    scheduler.schedule(1, time.time() + 0.02)
+    scheduler.schedule(2, time.time() + 0.02)
+    assert scheduler.cancel(1)
+    assert not scheduler.cancel(1)
+    eventlet.sleep(0.1)
+    assert expired == [2]
+
+
+def test_reschedule_replaces_previous_deadline():
+    scheduler, expired = make_scheduler()
+    scheduler.schedule(1, time.time() + 0.02)
+    deadline = time.time() + 0.15
+    scheduler.schedule(1, deadline)
+    assert scheduler.deadline(1) == deadline
+    eventlet.sleep(0.08)
+    assert expired == []
+    eventlet.sleep(0.15)
+    assert expired == [1]
+
+
+def test_earlier_deadline_wakes_the_scheduler():
+    scheduler, expired = make_scheduler()
+    scheduler.schedule('late', time.time() + 10)
+    eventlet.sleep(0.01)
+    scheduler.schedule('soon', time.time() + 0.02)
+    eventlet.sleep(0.1)
+    assert expired == ['soon']
+    assert scheduler.is_scheduled('late')
+
+
+def test_expiry_order_and_errors():
+    expired = []
+
+    def on_expire(key):
+        if key == 'bad':
+            raise RuntimeError('boom')
+        expired.append(key)
+
+    scheduler = DeadlineScheduler(on_expire)
+    now = time.time()
+    scheduler.schedule('b', now + 0.04)
+    scheduler.schedule('bad', now + 0.01)
+    scheduler.schedule('a', now + 0.02)
+    eventlet.sleep(0.15)
+    # Une échéance en erreur n'arrête pas l'ordonnanceur
+    assert expired == ['a', 'b']
+
+
+def test_extend_moves_an_armed_deadline():
+    scheduler, expired = make_scheduler()
+    deadline = time.time() + 0.03
+    scheduler.schedule(1, deadline)
+    assert scheduler.extend(1, 0.1) == deadline + 0.1 == scheduler.deadline(1)
+    eventlet.sleep(0.07)
+    assert expired == [] and scheduler.is_scheduled(1)
+    eventlet.sleep(0.1)
+    assert expired == [1] and len(scheduler) == 0
+
+
+def test_extend_can_bring_a_deadline_forward():
+    scheduler, expired = make_scheduler()
+    scheduler.schedule(1, time.time() + 10)
+    eventlet.sleep(0.01)
+    scheduler.extend(1, -9.97)
+    eventlet.sleep(0.1)
+    assert expired == [1]
+
+
+def test_extend_ignores_unknown_or_cancelled_keys():
+    scheduler, expired = make_scheduler()
+    assert scheduler.extend(1, 5) is None
+    scheduler.schedule(2, time.time() + 0.02)
+    scheduler.cancel(2)
+    assert scheduler.extend(2, 5) is None
+    eventlet.sleep(0.05)
+    assert expired == [] and len(scheduler) == 0
+
+
+# ---- Échéance des parties ----
+
+def start_game(login, connect, game_code):
+    clients = [login(name, game_code) for name in ('alice', 'bob')]
+    for client, room in zip(clients, ('Energie', 'Eau')):
+        socket = connect(client)
+        socket.emit('select_room', {'room': room})
+        socket.emit('player_ready')
+    return clients
+
+
+def test_game_start_arms_deadline_and_victory_disarms_it(game_app, login, connect, game_code):
+    clients = start_game(login, connect, game_code)
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    assert game_app.scheduler.is_scheduled(game_id)
+    response = clients[0].post('/api/validate_final_code', json={'code': 'EPSI WORKSHOPS 2025'})
+    assert response.get_json()['success']
+    assert not game_app.scheduler.is_scheduled(game_id)
+
+
+def test_expired_deadline_sets_defeat_once(game_app, login, connect, game_code):
+    start_game(login, connect, game_code)
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+    game_app.scheduler.schedule(game_id, time.time() + 0.02)
+    eventlet.sleep(0.1)
+    assert game_app.store.get(game_id).get_info('game_result') == 'defeat'
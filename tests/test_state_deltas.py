@@ -0,0 +1,78 @@
+from state_store import DELTA_HISTORY_SIZE, LiveGame, RoomState
+
+
+def make_game(game_id=1):
+    rooms = {'Energie': RoomState('Energie', is_locked=False), 'Eau': RoomState('Eau')}
+    return LiveGame(game_id, {'energy_level': 50.0}, rooms, {'game_started': 'false'})
+
+
+def test_record_delta_numbers_versions():
+    game = make_game()
+    first = game.record_delta({'game_states': {'energy_level': 55}})
+    second = game.record_delta({'game_states': {'energy_level': 60}})
+    assert (first['epoch'], first['version']) == (game.epoch, 1)
+    assert second['version'] == 2 == game.version
+
+
+def test_deltas_since_up_to_date_returns_nothing():
+    game = make_game()
+    game.record_delta({})
+    assert game.deltas_since(game.epoch, 1) == []
+
+
+def test_deltas_since_returns_missing_deltas_in_order():
+    game = make_game()
+    for value in range(5):
+        game.record_delta({'value': value})
+    assert [d['version'] for d in game.deltas_since(game.epoch, 2)] == [3, 4, 5]
+    assert [d['value'] for d in game.deltas_since(game.epoch, 0)] == [0, 1, 2, 3, 4]
+
+
+def test_deltas_since_other_epoch_needs_full_state():
+    game = make_game()
+    game.record_delta({})
+    reloaded = make_game()
+    assert reloaded.epoch != game.epoch
+    assert reloaded.deltas_since(game.epoch, 1) is None
+
+
+def test_deltas_since_future_version_needs_full_state():
+    game = make_game()
+    game.record_delta({})
+    assert game.deltas_since(game.epoch, 2) is None
+
+
+def test_deltas_since_gap_beyond_history_needs_full_state():
+    game = make_game()
+    for _ in range(DELTA_HISTORY_SIZE + 3):
+        game.record_delta({})
+    assert game.deltas_since(game.epoch, 2) is None
+    oldest = game.version - DELTA_HISTORY_SIZE
+    assert len(game.deltas_since(game.epoch, oldest)) == DELTA_HISTORY_SIZE
+
+
+# ---- Rattrapage par Socket.IO ----
+
+def sync(socket, **data):
+    socket.get_received()
+    socket.emit('sync_state', data)
+    (message,) = [m for m in socket.get_received() if m['name'] == 'state_sync']
+    return message['args'][0]
+
+
+def test_sync_returns_missed_deltas_then_full_state(login, connect, game_code):
+    first, second = login('alice', game_code), login('bob', game_code)
+    socket, other = connect(first), connect(second)
+    other.get_received()
+    socket.emit('select_room', {'room': 'Energie'})
+    deltas = [m['args'][0] for m in other.get_received() if m['name'] == 'state_delta']
+    epoch, version = deltas[-1]['epoch'], deltas[-1]['version']
+
+    socket.emit('select_room', {'room': 'Eau'})
+    payload = sync(other, epoch=epoch, version=version)
+    assert payload['snapshot'] is None
+    assert [d['version'] for d in payload['deltas']] == [version + 1]
+
+    assert sync(other, epoch=epoch, version=version + 1)['deltas'] == []
+    payload = sync(other, epoch=epoch - 1, version=version)
+    assert payload['deltas'] == [] and payload['snapshot']['epoch'] == epoch
@@ -0,0 +1,136 @@
+import pytest
+
+from state_store import LiveGame, RoomState, StateStore
+
+
+def make_game(game_id=1, **states):
+    states = states or {'energy_level': 50.0, 'air_o2': 60.0}
+    rooms = {'Energie': RoomState('Energie', is_locked=False), 'Eau': RoomState('Eau')}
+    return LiveGame(game_id, dict(states), rooms, {'game_started': 'false'})
+
+
+def test_take_dirty_and_take_changes_reset_tracking():
+    game = make_game()
+    game.set_state('energy_level', 70.0)
+    game.update_room('Eau', is_locked=False)
+    game.set_info('game_started', 'true')
+    assert game.is_dirty
+    changed_states, changed_rooms, changed_info, players = game.take_changes()
+    assert (changed_states, changed_rooms, changed_info, players) == ({'energy_level'}, {'Eau'}, {'game_started'}, False)
+    assert game.take_changes() == (set(), set(), set(), False)
+    states, rooms, info = game.take_dirty()
+    assert states == {'energy_level': 70.0}
+    assert rooms == {'Eau': (False, False, None)}
+    assert info == {'game_started': 'true'}
+    assert not game.is_dirty
+
+
+def test_take_dirty_holds_back_unpublished_keys():
+    """Une clé pas encore diffusée (donc pas encore journalisée) n'est pas écrite en BDD"""
+    game = make_game()
+    game.set_state('energy_level', 70.0)
+    game.take_changes()
+    game.set_state('air_o2', 40.0)
+    assert game.take_dirty() == ({'energy_level': 70.0}, {}, {})
+    assert game.is_dirty
+    game.take_changes()
+    assert game.take_dirty() == ({'air_o2': 40.0}, {}, {})
+    assert not game.is_dirty
+
+
+class Database:
+    def __init__(self):
+        self.loads = []
+        self.batches = []
+        self.fail = False
+
+    def load(self, game_id):
+        self.loads.append(game_id)
+        return make_game(game_id)
+
+    def flush(self, batch):
+        if self.fail:
+            raise RuntimeError('BDD indisponible')
+        self.batches.append(batch)
+
+
+@pytest.fixture
+def database():
+    return Database()
+
+
+def test_get_loads_once(database):
+    store = StateStore(database.load, database.flush)
+    assert store.get(1) is store.get(1)
+    assert database.loads == [1]
+
+
+def test_flush_writes_only_dirty_games(database):
+    store = StateStore(database.load, database.flush)
+    store.get(1).set_state('energy_level', 80.0)
+    store.get(1).take_changes()
+    store.get(2)
+    assert store.flush() == 1
+    assert database.batches == [[(1, {'energy_level': 80.0}, {}, {})]]
+    assert store.flush() == 0
+
+
+def test_failed_flush_keeps_changes_dirty(database):
+    store = StateStore(database.load, database.flush)
+    store.get(1).set_state('energy_level', 80.0)
+    store.get(1).take_changes()
+    database.fail = True
+    with pytest.raises(RuntimeError):
+        store.flush()
+    assert store.get(1).is_dirty
+    database.fail = False
+    assert store.flush() == 1
+
+
+def test_evict_idle_unloads_idle_and_finished_games(database):
+    evicted = []
+    store = StateStore(database.load, database.flush, idle_timeout=600, finished_timeout=60,
+                       on_evict=evicted.append)
+    now = store.get(1).last_access
+    store.get(2).set_info('game_result', 'victory')
+    store.get(2).take_changes()
+    store.flush()
+    store.get(3)
+    assert store.evict_idle(now + 30) == []
+    assert store.evict_idle(now + 61) == [2]
+    assert store.evict_idle(now + 601) == [1, 3]
+    assert store.games == {} and evicted == [2, 1, 3]
+
+
+def test_evict_idle_keeps_dirty_and_pinned_games(database):
+    store = StateStore(database.load, database.flush, idle_timeout=10, pinned=lambda game_id: game_id == 2)
+    game = store.get(1)
+    now = game.last_access
+    game.set_state('energy_level', 80.0)
+    store.get(2)
+    assert store.evict_idle(now + 20) == []
+    store.flush()
+    assert store.evict_idle(now + 20) == []
+    game.take_changes()
+    store.flush()
+    assert store.evict_idle(now + 20) == [1]
+
+
+def test_evicted_game_is_reloaded_with_new_epoch(database):
+    store = StateStore(database.load, database.flush, idle_timeout=0)
+    first = store.get(1)
+    store.evict_idle(first.last_access + 1)
+    reloaded = store.get(1)
+    assert reloaded is not first and reloaded.epoch != first.epoch
+    assert database.loads == [1, 1]
+
+
+def test_app_writes_live_state_behind(game_app, login, connect, game_code):
+    client = login('alice', game_code)
+    connect(client).emit('select_room', {'room': 'Energie'})
+    with game_app.app.app_context():
+        game_id = game_app.Game.query.filter_by(code=game_code).one().id
+        game_app.store.flush()
+        row = game_app.RoomStatus.query.filter_by(game_id=game_id, room_name='Energie').one()
+        assert row.assigned_player == 'alice'
+        assert not game_app.store.get(game_id).is_dirty
@@ -0,0 +1,67 @@
+"""Partitionnement des parties entre workers: une requête arrivée sur le mauvais worker reçoit 421"""
+import pytest
+
+
+class RecordingBus:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, channel, data):
+        self.published.append((channel, data))
+
+
+@pytest.fixture
+def two_workers(game_app, monkeypatch):
+    """L'app de test joue le worker 0 sur 2; le bus de contrôle enregistre les notifications"""
+    monkeypatch.setitem(game_app.app.config, 'WORKER_COUNT', 2)
+    monkeypatch.setitem(game_app.app.config, 'WORKER_INDEX', 0)
+    monkeypatch.setattr(game_app, 'control_bus', RecordingBus())
+    return game_app
+
+
+def game_id(game_app, code):
+    with game_app.app.app_context():
+        return game_app.Game.query.filter_by(code=code).one().id
+
+
+def login_on_worker(game_app, login, game_code, worker):
+    """Client connecté à une partie appartenant au worker `worker` (ids attribués en séquence)"""
+    for attempt in range(2):
+        code = f'{game_code}-{attempt}'
+        client = login('alice', code)
+        if game_id(game_app, code) % 2 == worker:
+            return client, code
+    raise AssertionError('aucune partie pour ce worker')
+
+
+def test_request_for_foreign_game_is_misdirected(two_workers, login, game_code):
+    client, code = login_on_worker(two_workers, login, game_code, 1)
+    response = client.get('/api/poll_status')
+    assert response.status_code == 421
+    assert response.get_json() == {'error': 'Misdirected request', 'worker': 1}
+    assert 'game_worker=1' in response.headers['Set-Cookie']
+
+
+def test_login_to_foreign_game_notifies_its_worker(two_workers, login, game_code):
+    client, code = login_on_worker(two_workers, login, game_code, 1)
+    notified = [data for channel, data in two_workers.control_bus.published if channel == 'worker:1']
+    assert {'op': 'players_changed', 'game_id': game_id(two_workers, code), 'joined': 'alice'} in notified
+
+
+def test_request_for_own_game_is_served(two_workers, login, game_code):
+    client, code = login_on_worker(two_workers, login, game_code, 0)
+    assert client.get('/api/poll_status').status_code == 200
+
+
+def test_login_sets_routing_cookie_and_any_worker_routes_are_served(two_workers, game_code):
+    client = two_workers.app.test_client()
+    response = client.post('/login', data={'username': 'alice', 'game': game_code})
+    worker = game_id(two_workers, game_code) % 2
+    assert f'game_worker={worker}' in response.headers['Set-Cookie']
+    # Routes sans état en mémoire: servies quel que soit le worker
+    assert client.get('/login').status_code == 200
+
+
+def test_socket_for_foreign_game_is_refused(two_workers, login, connect, game_code):
+    client, code = login_on_worker(two_workers, login, game_code, 1)
+    assert not connect(client).is_connected()